@@ -0,0 +1,60 @@
+"""
+Benchmark of the batched single-diode model fit on synthetic JV curves.
+
+Run from the repository root:
+    python benchmarks/bench_diode_fit.py
+"""
+
+import time
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.diode_fit import (
+    BOLTZMANN_CONSTANT_EV,
+    fit_single_diode,
+    single_diode_current_density,
+)
+
+
+def synthetic_curves(curves, points=120, noise=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    parameters = np.stack(
+        [
+            rng.uniform(0.018, 0.024, curves),
+            np.log(rng.uniform(1e-13, 1e-10, curves)),
+            np.log(rng.uniform(1.2, 1.9, curves)),
+            np.log(rng.uniform(1, 8, curves)),
+            np.log(rng.uniform(500, 5000, curves)),
+        ],
+        axis=1,
+    )
+    voltage = np.tile(np.linspace(-0.1, 1.2, points), (curves, 1))
+    current_density = single_diode_current_density(voltage, parameters, BOLTZMANN_CONSTANT_EV * 298.15)
+    return voltage, current_density * 1000 + rng.normal(0, noise, voltage.shape)
+
+
+def bench_fit(curves=(1, 16, 256, 4096)):
+    print('Single-diode fit, batched')
+    for n in curves:
+        voltage, current_density = synthetic_curves(n)
+        start = time.perf_counter()
+        fit = fit_single_diode(voltage, current_density)
+        seconds = time.perf_counter() - start
+        print(
+            f'  {n:>6} curves: {n / seconds:8.1f} curves/s, {fit["converged"].mean() * 100:5.1f} % converged'
+        )
+
+
+def bench_fit_one_by_one(curves=256):
+    print('Single-diode fit, one curve per call')
+    voltage, current_density = synthetic_curves(curves)
+    start = time.perf_counter()
+    for i in range(curves):
+        fit_single_diode(voltage[i : i + 1], current_density[i : i + 1])
+    seconds = time.perf_counter() - start
+    print(f'  {curves:>6} curves: {curves / seconds:8.1f} curves/s')
+
+
+if __name__ == '__main__':
+    bench_fit()
+    bench_fit_one_by_one()
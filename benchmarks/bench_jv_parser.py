@@ -0,0 +1,69 @@
+"""
+Benchmarks for the JV file parsers on synthetic files.
+
+Run from the repository root:
+    python benchmarks/bench_jv_parser.py
+"""
+
+import os
+import timeit
+
+from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
+    get_jv_data_location_1,
+    get_jv_data_location_1_repetitions,
+    get_jv_data_location_2,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'data')
+
+
+def synthetic_location_1_file(repetitions):
+    with open(os.path.join(DATA_DIR, 'PERS_1_1_C-2.jv.IV'), encoding='utf-8') as f:
+        record = f.read().strip().split('\n')[-1].strip().split('\t')
+    lines = []
+    for i in range(repetitions):
+        record[0] = str(i + 1)
+        lines.append('\t'.join(record))
+    return '\n'.join(lines) + '\n'
+
+
+def bench_location_1_last_record(repetitions=(1, 100, 10000), number=20):
+    print('Location 1 last repetition')
+    for n in repetitions:
+        filedata = synthetic_location_1_file(n)
+        seconds = timeit.timeit(lambda: get_jv_data_location_1(filedata), number=number) / number
+        print(f'  {n:>6} repetitions ({len(filedata) / 1e6:7.1f} MB): {seconds * 1e3:8.3f} ms')
+
+
+def bench_location_1_repetitions(repetitions=(100, 10000), number=3):
+    print('Location 1 all repetitions')
+    for n in repetitions:
+        filedata = synthetic_location_1_file(n)
+        seconds = timeit.timeit(lambda: get_jv_data_location_1_repetitions(filedata), number=number) / number
+        print(f'  {n:>6} repetitions ({len(filedata) / 1e6:7.1f} MB): {seconds * 1e3:8.3f} ms')
+
+
+def synthetic_location_2_file(curves):
+    with open(os.path.join(DATA_DIR, 'PERS_1_1_C-1.jv.txt'), encoding='utf-8') as f:
+        header, curve_block = f.read().split('\n\n', 1)
+    header_lines = header.split('\n')
+    rows = [header_lines[0]] + [header_lines[1 + i % (len(header_lines) - 1)] for i in range(curves)]
+    curve_rows = []
+    for line in curve_block.strip().split('\n'):
+        fields = line.split('\t')
+        curve_rows.append('\t'.join([fields[0]] + [fields[1 + i % (len(fields) - 1)] for i in range(curves)]))
+    return '\n'.join(rows) + '\n\n' + '\n'.join(curve_rows) + '\n'
+
+
+def bench_location_2(curves=(12, 48, 192), number=5):
+    print('Location 2 txt')
+    for n in curves:
+        filedata = synthetic_location_2_file(n)
+        seconds = timeit.timeit(lambda: get_jv_data_location_2(filedata), number=number) / number
+        print(f'  {n:>6} curves: {seconds * 1e3:8.3f} ms')
+
+
+if __name__ == '__main__':
+    bench_location_1_last_record()
+    bench_location_1_repetitions()
+    bench_location_2()
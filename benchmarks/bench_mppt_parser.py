@@ -0,0 +1,64 @@
+"""
+Benchmark of the MPPT parser on synthetic multi-day Location 1 and Location 2 logs.
+
+Run from the repository root:
+    python benchmarks/bench_mppt_parser.py
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import read_mppt_file
+
+
+def write_location_1_file(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    voltage = 0.72 + rng.choice([-0.01, 0.0, 0.01], rows).cumsum() * 0.001
+    current_density = 16 + rng.normal(0, 0.1, rows)
+    data = np.column_stack([np.arange(rows) * 3.2, current_density, voltage, voltage * current_density])
+    with open(path, 'w') as f:
+        f.write('measurement started at:    23-7-2025 15:20:24\n')
+        np.savetxt(f, data, delimiter='\t', fmt='%.10g')
+
+
+def write_location_2_file(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    voltage = 0.85 + rng.choice([-0.01, 0.01], rows)
+    current_density = -16 + rng.normal(0, 0.1, rows)
+    data = np.column_stack(
+        [np.arange(rows) * 2.0, voltage, current_density * 1.5e-4, current_density, voltage * current_density]
+    )
+    header = 'Time (s)\tVoltage (V)\tCurrent (A)\tCurrent density (mA/cm2)\tPower (mW/cm2)'
+    np.savetxt(path, data, delimiter='\t', fmt='%.5f', header=header, comments='')
+
+
+def bench_file(path, name):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(path, encoding='utf-8') as f:
+        data = read_mppt_file(f, name)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rows = len(data['time_data'])
+    output = 4 * rows * 8
+    print(
+        f'  {name:<28} {rows:>9} rows: {seconds:6.2f} s, {rows / seconds / 1e6:5.2f} M rows/s, '
+        f'peak memory {peak / output:4.1f} x output arrays'
+    )
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        print('MPPT parser')
+        for rows in (100_000, 2_000_000):
+            path = os.path.join(directory, 'sample.MPP')
+            write_location_1_file(path, rows)
+            bench_file(path, 'PERS_1_1_1.MPP')
+            path = os.path.join(directory, 'sample.mpp.txt')
+            write_location_2_file(path, rows)
+            bench_file(path, 'PERS_1_1_1_20260204_093607.mpp.txt')
@@ -1,7 +1,28 @@
 from nomad.config.models.plugins import ParserEntryPoint
+from pydantic import Field
+
+# measurement files of the TFSC General parser, also used to find the files of a series
+MEASUREMENT_FILE_NAME_RE = r'^.+\.(IV|MPP|JV|iv|jv|mpp)(\..{1,4})?$'
 
 
 class TFSCGeneralParserEntryPoint(ParserEntryPoint):
+    stitch_mppt_files: bool = Field(
+        False,
+        description="""
+        Join the MPPT files of a sample whose names end in the start of the measurement,
+        `_YYYYMMDD_HHMMSS`, into one series entry instead of one entry per file.
+        """,
+    )
+    bundle_mppt_protocols: bool = Field(
+        False,
+        description="""
+        Bundle the JV sweeps before and after an MPPT and the MPPT itself into one protocol
+        entry, for files whose names end in the start of the measurement. Takes precedence over
+        stitch_mppt_files for the MPPT files of a protocol run, these are left out of the
+        series entry.
+        """,
+    )
+
     def load(self):
         from nomad_tfsc_general.parsers.tfsc_general_measurement_parser import (
             TFSCGeneralParser,
@@ -22,7 +43,7 @@ class TFSCGeneralExperimentParserEntryPoint(ParserEntryPoint):
 tfsc_general_parser = TFSCGeneralParserEntryPoint(
     name='TFSCGeneralParser',
     description='Parser for TFSC General files',
-    mainfile_name_re='^.+\.(IV|MPP|JV|iv|jv|mpp)(\..{1,4})?$',
+    mainfile_name_re=MEASUREMENT_FILE_NAME_RE,
     mainfile_mime_re='(application|text|image)/.*',
 )
 
@@ -18,6 +18,7 @@
 
 import datetime
 import os
+import re
 import sys
 
 from baseclasses.helper.utilities import (
@@ -41,10 +42,18 @@ from nomad.metainfo import (
 )
 from nomad.parsing import MatchingParser
 
+from nomad_tfsc_general.parsers import MEASUREMENT_FILE_NAME_RE
+from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import (
+    group_protocol_runs,
+    mppt_file_start,
+    mppt_series_id,
+)
 from nomad_tfsc_general.schema_packages.tfsc_general_package import (
     TFSC_General_EQEmeasurement,
     TFSC_General_JVmeasurement,
     TFSC_General_Measurement,
+    TFSC_General_MPPTProtocol,
+    TFSC_General_MPPTSeries,
     TFSC_General_SimpleMPPTracking,
 )
 
@@ -85,25 +94,150 @@ def update_general_process_entries(entry, entry_id, archive, logger):
     return new_entry
 
 
+MEASUREMENT_FILE_RE = re.compile(MEASUREMENT_FILE_NAME_RE)
+
+
+def is_jv_file(file_name):
+    # Check for .jv or .iv as extension (e.g., file.jv.txt, file.IV, file.iv.csv)
+    filename_lower = file_name.lower()
+    return (
+        '.jv.' in filename_lower
+        or filename_lower.endswith('.jv')
+        or '.iv.' in filename_lower
+        or filename_lower.endswith('.iv')
+    )
+
+
+def is_mppt_file(file_name):
+    filename_lower = file_name.lower()
+    return '.mpp.' in filename_lower or filename_lower.endswith('.mpp')
+
+
+def get_series_files(mainfile):
+    """
+    Returns the measurement files next to `mainfile` that belong to the same sample and carry
+    the start of the measurement in their names, see mppt_file_start.
+    """
+    search_id = mppt_series_id(mainfile)
+    return sorted(
+        file_name
+        for file_name in os.listdir(os.path.dirname(mainfile) or '.')
+        if MEASUREMENT_FILE_RE.match(file_name)
+        and mppt_file_start(file_name) is not None
+        and mppt_series_id(file_name) == search_id
+    )
+
+
+def get_protocol_runs(mainfile):
+    """
+    Returns the protocol runs of get_series_files as dicts of group_protocol_runs, MPPT files
+    without JV sweeps before or after them do not form a run.
+    """
+    files = get_series_files(mainfile)
+    runs = group_protocol_runs(
+        [file_name for file_name in files if is_jv_file(file_name)],
+        [file_name for file_name in files if is_mppt_file(file_name)],
+    )
+    return [run for run in runs if run['jv_before'] or run['jv_after']]
+
+
+def get_mppt_series_files(mainfile, exclude_protocol_runs=False):
+    """
+    Returns the MPPT files of get_series_files, without the ones of protocol runs if
+    `exclude_protocol_runs` is set, these are bundled into protocol entries instead.
+    """
+    excluded = {run['mppt'] for run in get_protocol_runs(mainfile)} if exclude_protocol_runs else set()
+    return [
+        file_name
+        for file_name in get_series_files(mainfile)
+        if is_mppt_file(file_name) and file_name not in excluded
+    ]
+
+
+def get_protocol_run(mainfile):
+    """
+    Returns the files of the protocol run `mainfile` belongs to as dict of
+    group_protocol_runs, None if it is not part of one.
+    """
+    return next(
+        (run for run in get_protocol_runs(mainfile) if os.path.basename(mainfile) in run.values()), None
+    )
+
+
 class TFSCGeneralParser(MatchingParser):
+    def __init__(self, stitch_mppt_files=False, bundle_mppt_protocols=False, **kwargs):
+        super().__init__(**kwargs)
+        self.stitch_mppt_files = stitch_mppt_files
+        self.bundle_mppt_protocols = bundle_mppt_protocols
+
+    def parse_mppt_protocol(self, mainfile: str, archive: EntryArchive, run):
+        """
+        Links `mainfile` to the entry of its protocol run. The entry is created or updated only
+        by the MPPT file of the run, the JV files just reference it.
+        """
+        search_id = mppt_series_id(mainfile)
+        archive.metadata.entry_name = os.path.basename(mainfile)
+
+        file_name = f'{run["mppt"].split(".")[0]}.protocol.archive.json'
+        eid = get_entry_id_from_file_name(file_name, archive)
+        archive.data = RawFileTFSCGeneral(processed_archive=get_reference(archive.metadata.upload_id, eid))
+        if os.path.basename(mainfile) != run['mppt']:
+            return
+
+        entry = TFSC_General_MPPTProtocol(
+            **{
+                key: (TFSC_General_SimpleMPPTracking if key == 'mppt' else TFSC_General_JVmeasurement)(
+                    name=run_file, data_file=run_file
+                )
+                for key, run_file in run.items()
+                if run_file
+            }
+        )
+        set_sample_reference(archive, entry, search_id, archive.metadata.upload_id)
+        entry.share_samples()
+        entry.name = f'{search_id} protocol {run["mppt"].split(".")[0][len(search_id) + 1 :]}'
+        create_archive(entry, archive, file_name, overwrite=True)
+
+    def parse_mppt_series(self, mainfile: str, archive: EntryArchive):
+        """
+        Links `mainfile` to the series entry of all MPPT files of its sample. The entry is
+        created or updated only by the file that started last, so the files of the series are
+        parsed once and not again for every file.
+        """
+        search_id = mppt_series_id(mainfile)
+        archive.metadata.entry_name = os.path.basename(mainfile)
+
+        file_name = f'{search_id}.mpp_series.archive.json'
+        eid = get_entry_id_from_file_name(file_name, archive)
+        archive.data = RawFileTFSCGeneral(processed_archive=get_reference(archive.metadata.upload_id, eid))
+        data_files = get_mppt_series_files(mainfile, exclude_protocol_runs=self.bundle_mppt_protocols)
+        if os.path.basename(mainfile) != max(data_files, key=mppt_file_start):
+            return
+
+        entry = TFSC_General_MPPTSeries(data_files=data_files)
+        set_sample_reference(archive, entry, search_id, archive.metadata.upload_id)
+        entry.name = f'{search_id} mpp series'
+        create_archive(entry, archive, file_name, overwrite=True)
+
     def parse(self, mainfile: str, archive: EntryArchive, logger):
+        if self.bundle_mppt_protocols and mppt_file_start(mainfile) is not None:
+            run = get_protocol_run(mainfile)
+            if run is not None:
+                return self.parse_mppt_protocol(mainfile, archive, run)
+        if self.stitch_mppt_files and is_mppt_file(mainfile) and mppt_file_start(mainfile) is not None:
+            return self.parse_mppt_series(mainfile, archive)
+
         mainfile_split = os.path.basename(mainfile).split('.')
 
         entry = TFSC_General_Measurement()
 
         filename_lower = os.path.basename(mainfile).lower()
 
-        # Check for .jv or .iv as extension (e.g., file.jv.txt, file.IV, file.iv.csv)
-        if (
-            '.jv.' in filename_lower
-            or filename_lower.endswith('.jv')
-            or '.iv.' in filename_lower
-            or filename_lower.endswith('.iv')
-        ):
+        if is_jv_file(filename_lower):
             entry = TFSC_General_JVmeasurement()
         if '.eqe.' in filename_lower or filename_lower.endswith('.eqe'):
             entry = TFSC_General_EQEmeasurement()
-        if '.mpp.' in filename_lower or filename_lower.endswith('.mpp'):
+        if is_mppt_file(filename_lower):
             entry = TFSC_General_SimpleMPPTracking()
 
         archive.metadata.entry_name = os.path.basename(mainfile)
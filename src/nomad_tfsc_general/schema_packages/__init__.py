@@ -1,7 +1,21 @@
 from nomad.config.models.plugins import SchemaPackageEntryPoint
+from pydantic import Field
 
 
 class TFSCGeneralPackageEntryPoint(SchemaPackageEntryPoint):
+    parse_cache_directory: str | None = Field(
+        None,
+        description='Directory of the parsed measurement file cache, defaults to the system temp directory.',
+    )
+    parse_cache_size: int = Field(
+        512 * 1024**2,
+        description='Maximum size of the parsed measurement file cache in bytes, 0 disables the cache.',
+    )
+    mmap_threshold: int | None = Field(
+        64 * 1024**2,
+        description='Size in bytes from which raw measurement files are memory mapped, None never maps them.',
+    )
+
     def load(self):
         from nomad_tfsc_general.schema_packages.tfsc_general_package import m_package
 
@@ -0,0 +1,241 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+
+# Number of buckets of the preview arrays, a preview has at most 2 * PREVIEW_BUCKETS + 2 points.
+PREVIEW_BUCKETS = 1000
+
+
+def minmax_decimation_indices(values, buckets=PREVIEW_BUCKETS):
+    """
+    Returns the sorted indices of the minimum and the maximum of `values` in each of `buckets`
+    equally long index ranges, together with the first and the last index. NaN values are
+    ignored. Arrays that are not longer than the preview would be are kept completely.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    length = len(values)
+    if length <= 2 * buckets + 2:
+        return np.arange(length)
+
+    bucket_size = -(-length // buckets)
+    padded = np.full(buckets * bucket_size, np.nan)
+    padded[:length] = values
+    blocks = padded.reshape(buckets, bucket_size)
+    nan = np.isnan(blocks)
+    bucket_start = np.arange(buckets) * bucket_size
+    indices = np.concatenate(
+        [
+            [0, length - 1],
+            bucket_start + np.argmin(np.where(nan, np.inf, blocks), axis=1),
+            bucket_start + np.argmax(np.where(nan, -np.inf, blocks), axis=1),
+        ]
+    )
+    # buckets that only hold padding point past the end
+    return np.unique(indices[indices < length])
+
+
+def decimate(arrays, key, buckets=PREVIEW_BUCKETS):
+    """
+    Returns preview versions of equally long arrays, the kept points are the extremes of
+    `arrays[key]` in every bucket, see minmax_decimation_indices.
+    """
+    indices = minmax_decimation_indices(arrays[key], buckets)
+    return {name: np.asarray(values)[indices] for name, values in arrays.items()}
+
+
+def level_preview(level, key, names):
+    """
+    Returns preview arrays of a level of build_pyramid, the minimum and the maximum of every
+    bucket of `level[name]` for every name in `names`, both at the start of the bucket given
+    by `level[key]`.
+    """
+    return {
+        key: np.repeat(np.asarray(level[key]), 2),
+        **{name: np.asarray(level[name])[:, [0, 2]].ravel() for name in names},
+    }
+
+
+# Bucket size of the finest stored pyramid level, windows that would need finer buckets span
+# fewer than PYRAMID_MIN_BUCKET raw points per pixel and are read from the raw arrays. Together
+# the stored levels hold 2 / PYRAMID_MIN_BUCKET buckets per raw point.
+PYRAMID_MIN_BUCKET = 16
+
+
+def _bucket_statistics(values, bucket_size):
+    """Minimum, maximum, sum and count of the finite values in consecutive buckets."""
+    buckets = -(-len(values) // bucket_size)
+    padded = np.full(buckets * bucket_size, np.nan)
+    padded[: len(values)] = values
+    blocks = padded.reshape(buckets, bucket_size)
+    finite = np.isfinite(blocks)
+    return (
+        np.where(finite, blocks, np.inf).min(axis=1),
+        np.where(finite, blocks, -np.inf).max(axis=1),
+        np.where(finite, blocks, 0.0).sum(axis=1),
+        finite.sum(axis=1),
+    )
+
+
+def _merge_pairs(minimum, maximum, total, count):
+    """Statistics of buckets twice as large, a trailing odd bucket is merged with an empty one."""
+    if len(minimum) % 2:
+        minimum = np.append(minimum, np.inf)
+        maximum = np.append(maximum, -np.inf)
+        total = np.append(total, 0.0)
+        count = np.append(count, 0)
+    return (
+        minimum.reshape(-1, 2).min(axis=1),
+        maximum.reshape(-1, 2).max(axis=1),
+        total.reshape(-1, 2).sum(axis=1),
+        count.reshape(-1, 2).sum(axis=1),
+    )
+
+
+def build_pyramid(arrays, key, names, min_bucket=PYRAMID_MIN_BUCKET):
+    """
+    Returns the levels of a min/max/mean pyramid of the equally long arrays `arrays[name]` for
+    every name in `names`. The bucket size doubles from level to level, starting at
+    `min_bucket` up to the level with a single bucket, and every level is computed from the one
+    below. A level is a dict with its bucket_size, the value of `arrays[key]` at the start of
+    every bucket and for every name an array with the columns minimum, mean and maximum of the
+    buckets. NaN values are ignored, buckets without values are NaN.
+    """
+    length = len(arrays[key])
+    if length == 0:
+        return []
+    statistics = {
+        name: _bucket_statistics(np.asarray(arrays[name], dtype=np.float64), min_bucket) for name in names
+    }
+    levels = []
+    bucket_size = min_bucket
+    while True:
+        level = {'bucket_size': bucket_size, key: np.asarray(arrays[key])[::bucket_size]}
+        for name, values in statistics.items():
+            level[name] = _level_values(*values)
+        levels.append(level)
+        if bucket_size >= length:
+            return levels
+        statistics = {name: _merge_pairs(*values) for name, values in statistics.items()}
+        bucket_size *= 2
+
+
+def _level_values(minimum, maximum, total, count):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+    return np.where((count == 0)[:, None], np.nan, np.column_stack([minimum, mean, maximum]))
+
+
+def _stored_bucket_statistics(values, bucket_size):
+    """Statistics of a stored complete bucket, which is assumed to hold no NaN values."""
+    minimum, mean, maximum = values
+    if np.isnan(mean):
+        return np.inf, -np.inf, 0.0, 0
+    return minimum, maximum, mean * bucket_size, bucket_size
+
+
+def pyramid_tail_offset(levels, start):
+    """
+    Returns the first point of the finest bucket of the levels of build_pyramid that holds
+    point `start`, the points from there on are needed by extend_pyramid.
+    """
+    if not levels:
+        return 0
+    bucket_size = levels[0]['bucket_size']
+    return start // bucket_size * bucket_size
+
+
+def extend_pyramid(levels, tail, key, names, start, offset=0):
+    """
+    Updates the levels of build_pyramid after the arrays grew beyond their first `start`
+    points. `tail` holds the arrays from point `offset` on, see pyramid_tail_offset, and the
+    stored levels only need to hold their buckets from the one before the bucket holding point
+    `start` on, with the index of their first bucket as `start` if it is not 0. Only the
+    buckets from the one holding point `start` on are recomputed, the finest ones from the raw
+    points and the coarser ones from the level below, so the work depends on the number of new
+    points and not on the length of the arrays. Complete buckets are assumed to hold no NaN
+    values, the MPPT parsers drop incomplete rows. The returned levels only hold the
+    recomputed buckets and the index of the first one as `start`.
+    """
+    if not levels or start == 0:
+        min_bucket = levels[0]['bucket_size'] if levels else PYRAMID_MIN_BUCKET
+        return [dict(level, start=0) for level in build_pyramid(tail, key, names, min_bucket)]
+
+    length = offset + len(tail[key])
+    bucket_size = levels[0]['bucket_size']
+    first = start // bucket_size
+    skip = first * bucket_size - offset
+    statistics = {
+        name: _bucket_statistics(np.asarray(tail[name][skip:], dtype=np.float64), bucket_size)
+        for name in names
+    }
+    times = np.asarray(tail[key][skip::bucket_size])
+    extended = []
+    while True:
+        extended.append(
+            {
+                'bucket_size': bucket_size,
+                'start': first,
+                key: times,
+                **{name: _level_values(*values) for name, values in statistics.items()},
+            }
+        )
+        if bucket_size >= length:
+            return extended
+        coarser_first = start // (2 * bucket_size)
+        if first == 2 * coarser_first + 1:
+            # the first recomputed bucket of the coarser level also holds a stored bucket of this
+            # one, levels that did not exist before start at the first bucket
+            stored = levels[len(extended) - 1]
+            previous = first - 1 - stored.get('start', 0)
+            statistics = {
+                name: tuple(
+                    np.concatenate([[stored_value], value])
+                    for stored_value, value in zip(
+                        _stored_bucket_statistics(stored[name][previous], bucket_size), values
+                    )
+                )
+                for name, values in statistics.items()
+            }
+            times = np.concatenate([[stored[key][previous]], times])
+        statistics = {name: _merge_pairs(*values) for name, values in statistics.items()}
+        times = times[::2]
+        first = coarser_first
+        bucket_size *= 2
+
+
+def pyramid_window(levels, start, stop, width):
+    """
+    Returns the buckets of the finest pyramid level that covers the raw points start to stop
+    with at most `width` buckets, as a dict of the sliced level arrays. The arrays may also be
+    datasets of an HDF5 file, only the returned buckets are read. Returns None if the window
+    holds at most `width` times the finest bucket size of raw points, they are then read
+    directly.
+    """
+    points = stop - start
+    finest = levels[0]['bucket_size'] if levels else 1
+    if points <= width * finest:
+        return None
+    for level in levels:
+        bucket_size = level['bucket_size']
+        if -(-points // bucket_size) <= width or level is levels[-1]:
+            selection = slice(start // bucket_size, -(-stop // bucket_size))
+            return {
+                name: values if name == 'bucket_size' else values[selection] for name, values in level.items()
+            }
+    return None
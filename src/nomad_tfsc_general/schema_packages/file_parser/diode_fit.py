@@ -0,0 +1,202 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Single-diode model fits of many JV curves at once.
+
+The model is evaluated in its explicit Lambert-W form
+
+    J = (Rsh (Jph + J0) - V) / (Rs + Rsh) - n Vt / Rs * W(x),
+    x = Rs J0 Rsh / (n Vt (Rs + Rsh)) * exp(Rsh (Rs (Jph + J0) + V) / (n Vt (Rs + Rsh)))
+
+with the photocurrent counted positive. All curves are fitted together with a
+Levenberg-Marquardt iteration, every array operation runs over all curves and points.
+"""
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.jv_analysis import (
+    compute_figures_of_merit,
+    pad_curves,
+    photocurrent_sign,
+)
+
+BOLTZMANN_CONSTANT_EV = 8.617333262e-5  # eV/K
+
+# fitted parameters: Jph [A/cm^2], ln J0, ln n, ln Rs, ln Rsh with resistances in ohm cm^2
+_N_PARAMETERS = 5
+_LOWER_BOUNDS = np.array([0.0, np.log(1e-30), np.log(0.5), np.log(1e-4), np.log(1.0)])
+_UPPER_BOUNDS = np.array([1.0, np.log(1.0), np.log(10.0), np.log(1e4), np.log(1e9)])
+_LAMBERT_W_ITERATIONS = 8
+
+
+def _lambertw_exp(log_x):
+    """Principal branch of the Lambert W function evaluated at exp(log_x), without overflow."""
+    # W(x) solves w + ln(w) = ln(x), Newton steps on that form are stable for large x
+    w = np.where(log_x > 1, log_x - np.log(np.maximum(log_x, 1)), np.exp(np.minimum(log_x, 1)))
+    w = np.maximum(w, 1e-300)
+    for _ in range(_LAMBERT_W_ITERATIONS):
+        w = w * (1 + log_x - np.log(w)) / (1 + w)
+        w = np.maximum(w, 1e-300)
+    return w
+
+
+def single_diode_current_density(voltage, parameters, thermal_voltage):
+    """Current density in A/cm^2 for the parameter rows (Jph, ln J0, ln n, ln Rs, ln Rsh)."""
+    photocurrent = parameters[:, 0:1]
+    saturation_current = np.exp(parameters[:, 1:2])
+    n_vt = np.exp(parameters[:, 2:3]) * thermal_voltage
+    rs = np.exp(parameters[:, 3:4])
+    rsh = np.exp(parameters[:, 4:5])
+    log_x = (
+        parameters[:, 1:2]
+        + np.log(rs * rsh / (n_vt * (rs + rsh)))
+        + rsh * (rs * (photocurrent + saturation_current) + voltage) / (n_vt * (rs + rsh))
+    )
+    return (rsh * (photocurrent + saturation_current) - voltage) / (rs + rsh) - n_vt / rs * _lambertw_exp(
+        log_x
+    )
+
+
+def _masked_slope(x, y, mask):
+    weight = mask.astype(np.float64)
+    count = np.maximum(weight.sum(axis=1), 1)
+    x = np.where(mask, x, 0.0)
+    y = np.where(mask, y, 0.0)
+    mean_x = x.sum(axis=1) / count
+    mean_y = y.sum(axis=1) / count
+    dx = (x - mean_x[:, None]) * weight
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (dx * (y - mean_y[:, None])).sum(axis=1) / (dx * dx).sum(axis=1)
+
+
+def _initial_parameters(voltage, current_density, v_oc, j_sc, thermal_voltage):
+    ideality = np.full(len(voltage), 1.5)
+    finite = np.isfinite(voltage) & np.isfinite(current_density)
+    with np.errstate(invalid='ignore'):
+        near_jsc = finite & (voltage < 0.25 * v_oc[:, None])
+        near_voc = finite & (np.abs(voltage - v_oc[:, None]) < 0.1 * v_oc[:, None])
+    shunt = -1 / _masked_slope(voltage, current_density, near_jsc)
+    shunt = np.clip(np.nan_to_num(shunt, nan=1e4, posinf=1e7, neginf=1e7), 10, 1e7)
+    series = -1 / _masked_slope(voltage, current_density, near_voc) - ideality * thermal_voltage / j_sc
+    series = np.clip(np.nan_to_num(series, nan=1.0), 1e-2, 1e2)
+    with np.errstate(over='ignore'):
+        saturation = j_sc / np.expm1(v_oc / (ideality * thermal_voltage))
+    return np.stack(
+        [j_sc, np.log(np.maximum(saturation, 1e-300)), np.log(ideality), np.log(series), np.log(shunt)],
+        axis=1,
+    )
+
+
+def fit_single_diode(voltage, current_density, temperature=298.15, max_iterations=100, tolerance=1e-10):
+    """
+    Fits the single-diode model to many JV curves at once.
+
+    `voltage` [V] and `current_density` [mA/cm^2] are 2-D arrays with one curve per row,
+    shorter curves are padded with NaN. The sign convention of the current density is
+    detected per curve. Curves without Jsc or Voc are not fitted and get NaN parameters.
+
+    Returns a dict of arrays with one value per curve: photocurrent_density and
+    saturation_current_density in mA/cm^2, ideality_factor, series_resistance and
+    shunt_resistance in ohm cm^2, the rmse of the fit in mA/cm^2 and whether it converged.
+    """
+    voltage = np.atleast_2d(np.asarray(voltage, dtype=np.float64))
+    current_density = np.atleast_2d(np.asarray(current_density, dtype=np.float64))
+    thermal_voltage = BOLTZMANN_CONSTANT_EV * temperature
+    n_curves = len(voltage)
+
+    figures_of_merit = compute_figures_of_merit(voltage, current_density)
+    # the fit runs in A/cm^2 with the photocurrent counted positive, as in compute_figures_of_merit
+    measured = current_density * photocurrent_sign(voltage, current_density)[:, None] / 1000
+    v_oc, j_sc = figures_of_merit['V_oc'], figures_of_merit['J_sc'] / 1000
+    fitted = np.isfinite(v_oc) & np.isfinite(j_sc) & (v_oc > 0) & (j_sc > 0)
+
+    mask = np.isfinite(voltage) & np.isfinite(measured) & fitted[:, None]
+    voltage = np.where(mask, voltage, 0.0)
+    measured = np.where(mask, measured, 0.0)
+    parameters = np.zeros((n_curves, _N_PARAMETERS))
+    parameters[fitted] = _initial_parameters(
+        voltage[fitted], np.where(mask, measured, np.nan)[fitted], v_oc[fitted], j_sc[fitted], thermal_voltage
+    )
+
+    def residuals(parameters, rows):
+        with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            model = single_diode_current_density(voltage[rows], parameters, thermal_voltage)
+        residual = np.nan_to_num(model - measured[rows], nan=1e3, posinf=1e3, neginf=-1e3)
+        return np.where(mask[rows], residual, 0.0)
+
+    cost = np.zeros(n_curves)
+    converged = np.zeros(n_curves, dtype=bool)
+    # the iteration works on the curves that have not converged yet only
+    rows = np.flatnonzero(fitted)
+    residual = residuals(parameters[rows], rows)
+    cost[rows] = (residual**2).sum(axis=1)
+    damping = np.full(len(rows), 1e-3)
+    for _ in range(max_iterations):
+        if not len(rows):
+            break
+        current = parameters[rows]
+        # forward difference jacobian, one model evaluation per parameter for all curves
+        steps = 1e-6 * np.maximum(np.abs(current), 1e-2)
+        jacobian = np.empty((*residual.shape, _N_PARAMETERS))
+        for k in range(_N_PARAMETERS):
+            shifted = current.copy()
+            shifted[:, k] += steps[:, k]
+            jacobian[..., k] = (residuals(shifted, rows) - residual) / steps[:, k : k + 1]
+        normal = np.einsum('cpk,cpl->ckl', jacobian, jacobian)
+        gradient = np.einsum('cpk,cp->ck', jacobian, residual)
+        diagonal = np.einsum('ckk->ck', normal)
+        damped = normal + (damping[:, None] * (diagonal + 1e-12))[:, :, None] * np.eye(_N_PARAMETERS)
+        step = np.linalg.solve(damped, -gradient[..., None])[..., 0]
+
+        candidate = np.clip(current + step, _LOWER_BOUNDS, _UPPER_BOUNDS)
+        candidate_residual = residuals(candidate, rows)
+        candidate_cost = (candidate_residual**2).sum(axis=1)
+        accepted = candidate_cost < cost[rows]
+
+        improvement = np.where(accepted, (cost[rows] - candidate_cost) / np.maximum(cost[rows], 1e-300), 0.0)
+        parameters[rows[accepted]] = candidate[accepted]
+        cost[rows[accepted]] = candidate_cost[accepted]
+        residual[accepted] = candidate_residual[accepted]
+        damping = np.where(accepted, damping / 3, np.minimum(damping * 3, 1e10))
+
+        stalled = damping >= 1e10
+        done = (accepted & (improvement < tolerance)) | (np.abs(step).max(axis=1) < tolerance) | stalled
+        converged[rows[done & ~stalled]] = True
+        rows, residual, damping = rows[~done], residual[~done], damping[~done]
+
+    points = np.maximum(mask.sum(axis=1), 1)
+    nan = np.where(fitted, 1.0, np.nan)
+    return {
+        'photocurrent_density': parameters[:, 0] * 1000 * nan,
+        'saturation_current_density': np.exp(parameters[:, 1]) * 1000 * nan,
+        'ideality_factor': np.exp(parameters[:, 2]) * nan,
+        'series_resistance': np.exp(parameters[:, 3]) * nan,
+        'shunt_resistance': np.exp(parameters[:, 4]) * nan,
+        'rmse': np.sqrt(cost / points) * 1000 * nan,
+        'converged': converged,
+    }
+
+
+def fit_jv_result(jv_result, temperature=298.15):
+    """Fits the single-diode model to all curves of a JVResult, see fit_single_diode."""
+    return fit_single_diode(
+        pad_curves(jv_result.voltage, jv_result.offsets),
+        pad_curves(jv_result.current_density, jv_result.offsets),
+        temperature,
+    )
@@ -0,0 +1,101 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Storage of large measurement arrays in an HDF5 file of the upload.
+
+The archive only keeps references of the form '<file>#<dataset path>' that NOMAD resolves
+with its HDF5Reference type. Datasets are written compressed and chunked, so analysis code
+can read slices without loading the whole array.
+"""
+
+import contextlib
+
+import h5py
+import numpy as np
+
+
+def hdf5_file_name(data_file):
+    """
+    Returns the name of the HDF5 file that holds the arrays parsed from `data_file`. The name
+    must not end like a measurement file, otherwise the parser would match it as a new entry.
+    """
+    return f'{data_file}.arrays.h5'
+
+
+def _open_raw_file(archive, file_name, append):
+    if append:
+        try:
+            return archive.m_context.raw_file(file_name, 'r+b'), 'a'
+        except FileNotFoundError:
+            pass
+    return archive.m_context.raw_file(file_name, 'wb'), 'w'
+
+
+def write_hdf5_arrays(archive, file_name, arrays, units=None, append=False, starts=None):
+    """
+    Writes arrays given by their dataset path into an HDF5 file of the upload, all in one
+    pass, and returns the HDF5 references by dataset path. `units` maps dataset paths to
+    units that are stored as the 'units' attribute. Without `append` the file is rewritten,
+    otherwise datasets that are not written again are kept. `starts` maps dataset paths to the
+    index along the first axis from which an existing dataset is overwritten with the array,
+    the dataset is resized to end with it. Datasets are created resizable for that purpose.
+    """
+    units = units or {}
+    starts = starts or {}
+    raw_file, mode = _open_raw_file(archive, file_name, append or bool(starts))
+    with raw_file, h5py.File(raw_file, mode) as f:
+        for path, values in arrays.items():
+            data = np.asarray(values, dtype=np.float64)
+            start = starts.get(path, 0)
+            if start and path in f:
+                dataset = f[path]
+                if dataset.maxshape[0] is None:
+                    dataset.resize(start + len(data), axis=0)
+                    dataset[start:] = data
+                    continue
+                data = np.concatenate([dataset[:start], data])
+            if path in f:
+                del f[path]
+            dataset = f.create_dataset(
+                path,
+                data=data,
+                maxshape=(None, *data.shape[1:]),
+                chunks=True,
+                compression='gzip',
+                shuffle=True,
+            )
+            unit = units.get(path)
+            if unit is not None:
+                dataset.attrs['units'] = unit if isinstance(unit, str) else format(unit, '~')
+    return {path: f'{file_name}#{path}' for path in arrays}
+
+
+@contextlib.contextmanager
+def open_hdf5_file(archive, file_name):
+    """Opens an HDF5 file of the upload for reading, slicing its datasets only reads the selection."""
+    with archive.m_context.raw_file(file_name, 'rb') as raw_file, h5py.File(raw_file, 'r') as f:
+        yield f
+
+
+@contextlib.contextmanager
+def open_hdf5_dataset(archive, reference):
+    """Opens the dataset an HDF5 reference points to, slicing it only reads the selection."""
+    file_name, path = reference.split('#', 1)
+    with open_hdf5_file(archive, file_name) as f:
+        yield f[path]
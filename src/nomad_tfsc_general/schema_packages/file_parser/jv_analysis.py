@@ -0,0 +1,247 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import re
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.jv_result import FIGURES_OF_MERIT
+
+
+def pad_curves(values, offsets):
+    """Turns curves stored back to back with an offsets vector into a NaN padded 2-D array."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    padded = np.full((len(lengths), lengths.max(initial=0)), np.nan)
+    point_idx = np.arange(padded.shape[1])
+    mask = point_idx < lengths[:, None]
+    padded[mask] = values[offsets[0] : offsets[-1]]
+    return padded
+
+
+def _first_crossing(x, y):
+    """
+    Returns the x value at which y crosses zero for the first time along every row, found by
+    linear interpolation between the neighbouring points. Rows without crossing give NaN.
+    """
+    y0, y1 = y[:, :-1], y[:, 1:]
+    x0, x1 = x[:, :-1], x[:, 1:]
+    with np.errstate(invalid='ignore'):
+        crossing = (y0 * y1 <= 0) & (y0 != y1)
+    crossing &= np.isfinite(y0) & np.isfinite(y1) & np.isfinite(x0) & np.isfinite(x1)
+    rows = np.arange(len(y))
+    idx = np.argmax(crossing, axis=1)
+    found = crossing[rows, idx]
+    y0, y1, x0, x1 = y0[rows, idx], y1[rows, idx], x0[rows, idx], x1[rows, idx]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        value = x0 - y0 * (x1 - x0) / (y1 - y0)
+    return np.where(found, value, np.nan)
+
+
+def photocurrent_sign(voltage, current_density):
+    """
+    Returns the factor per curve (1 or -1) that makes the photocurrent positive, so that the
+    power is positive in the power generating quadrant.
+    """
+    return np.where(_first_crossing(current_density, voltage) < 0, -1.0, 1.0)
+
+
+def compute_figures_of_merit(voltage, current_density, intensity=100.0):
+    """
+    Computes the figures of merit of many JV curves at once.
+
+    `voltage` and `current_density` are 2-D arrays with one curve per row, shorter curves are
+    padded with NaN. The sweep direction and the sign convention of the current density are
+    detected per curve. Jsc and Voc are interpolated at the zero crossings, the maximum power
+    point is the measured point with the highest power.
+
+    Returns a dict with arrays in the units of the jv_dict of the parsers: V_oc and U_MPP in V,
+    J_sc and J_MPP in mA/cm^2 (positive under illumination), P_MPP in mW/cm^2, Fill_factor as
+    fraction and Efficiency in % of the given light intensity in mW/cm^2.
+    """
+    voltage = np.atleast_2d(np.asarray(voltage, dtype=np.float64))
+    current_density = np.atleast_2d(np.asarray(current_density, dtype=np.float64))
+    if voltage.shape[1] < 2:
+        missing = np.full(len(voltage), np.nan)
+        return {key: missing.copy() for key in FIGURES_OF_MERIT}
+
+    # Jsc is the current density where the voltage crosses zero
+    j_sc = np.abs(_first_crossing(current_density, voltage))
+    current_density = current_density * photocurrent_sign(voltage, current_density)[:, None]
+    v_oc = _first_crossing(voltage, current_density)
+
+    power = voltage * current_density
+    valid = np.isfinite(power)
+    rows = np.arange(len(power))
+    mpp_idx = np.argmax(np.where(valid, power, -np.inf), axis=1)
+    has_power = valid.any(axis=1)
+    p_mpp = np.where(has_power, power[rows, mpp_idx], np.nan)
+    u_mpp = np.where(has_power, voltage[rows, mpp_idx], np.nan)
+    j_mpp = np.where(has_power, current_density[rows, mpp_idx], np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fill_factor = p_mpp / (v_oc * j_sc)
+    return {
+        'J_sc': j_sc,
+        'V_oc': v_oc,
+        'Fill_factor': fill_factor,
+        'Efficiency': p_mpp / intensity * 100,
+        'P_MPP': p_mpp,
+        'U_MPP': u_mpp,
+        'J_MPP': j_mpp,
+    }
+
+
+def compute_jv_result_figures_of_merit(jv_result, intensity=None):
+    """Computes the figures of merit of all curves of a JVResult, see compute_figures_of_merit."""
+    if intensity is None:
+        intensity = jv_result.intensity or 100.0
+    return compute_figures_of_merit(
+        pad_curves(jv_result.voltage, jv_result.offsets),
+        pad_curves(jv_result.current_density, jv_result.offsets),
+        intensity,
+    )
+
+
+# sweep direction in curve names, e.g. Pixel_1_reverse or 958.1a_loc2_forward.txt
+_SWEEP_DIRECTION = re.compile(r'[_\- ]?(?<![a-z])(forward|reverse|fwd|fw|rev|rv)(?![a-z])', re.IGNORECASE)
+
+
+def pair_sweeps(names):
+    """
+    Pairs reverse and forward sweeps of the same cell by their names, which have to be equal
+    after removing the sweep direction. Repeated sweeps of a cell are paired in order.
+
+    Returns the index arrays of the reverse and of the forward curves and the pair names.
+    """
+    reverse, forward = {}, {}
+    for idx, name in enumerate(names):
+        match = _SWEEP_DIRECTION.search(name)
+        if match is None:
+            continue
+        key = name[: match.start()] + name[match.end() :]
+        sweeps = forward if match.group(1).lower().startswith('f') else reverse
+        sweeps.setdefault(key, []).append(idx)
+    pairs = [
+        (reverse_idx, forward_idx, key)
+        for key, reverse_indices in reverse.items()
+        for reverse_idx, forward_idx in zip(reverse_indices, forward.get(key, []))
+    ]
+    return (
+        np.array([pair[0] for pair in pairs], dtype=np.int64),
+        np.array([pair[1] for pair in pairs], dtype=np.int64),
+        [pair[2] for pair in pairs],
+    )
+
+
+def _interp_rows(x_new, x, y):
+    """
+    np.interp for every row at once. `x_new` is an increasing grid per row, `x` and `y` may be
+    unsorted and NaN padded. Grid points outside the measured range give NaN.
+    """
+    x = np.where(np.isfinite(y), x, np.nan)
+    order = np.argsort(x, axis=1)  # NaN sorts last
+    x = np.take_along_axis(x, order, axis=1)
+    y = np.take_along_axis(y, order, axis=1)
+    rows, points = x.shape
+    count = np.isfinite(x).sum(axis=1)
+    last = x[np.arange(rows), np.maximum(count - 1, 0)]
+    x = np.where(np.isfinite(x), x, last[:, None])
+    # one searchsorted over all rows, shifted apart so that they do not overlap
+    low = np.minimum(np.nanmin(x, initial=0), np.nanmin(x_new, initial=0))
+    span = max(np.nanmax(x, initial=0), np.nanmax(x_new, initial=0)) - low + 1
+    shift = (np.arange(rows) * span)[:, None]
+    idx = np.searchsorted((x - low + shift).ravel(), (x_new - low + shift).ravel(), side='right')
+    idx = idx.reshape(x_new.shape) - (np.arange(rows) * points)[:, None]
+    idx = np.clip(idx, 1, np.maximum(count - 1, 1)[:, None])
+    x0 = np.take_along_axis(x, idx - 1, axis=1)
+    x1 = np.take_along_axis(x, idx, axis=1)
+    y0 = np.take_along_axis(y, idx - 1, axis=1)
+    y1 = np.take_along_axis(y, idx, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = np.where(x1 > x0, y0 + (y1 - y0) * (x_new - x0) / (x1 - x0), y0)
+    inside = (count[:, None] >= 2) & (x_new >= x[:, :1]) & (x_new <= last[:, None])
+    return np.where(inside, values, np.nan)
+
+
+def compute_hysteresis(voltage, current_density, reverse_idx, forward_idx, grid_points=201):
+    """
+    Computes hysteresis indices of pairs of reverse and forward sweeps at once.
+
+    `voltage` and `current_density` are NaN padded 2-D arrays with one curve per row. The PCE
+    based index is (PCE_rev - PCE_fw) / PCE_rev. For the area based index both curves of a
+    pair are resampled on a shared grid from 0 V to the Voc of the reverse sweep, the index
+    is the area between the curves divided by the area under the reverse curve. Pairs whose
+    curves do not cover that range give NaN.
+    """
+    voltage = np.atleast_2d(np.asarray(voltage, dtype=np.float64))
+    current_density = np.atleast_2d(np.asarray(current_density, dtype=np.float64))
+    current_density = current_density * photocurrent_sign(voltage, current_density)[:, None]
+    figures_of_merit = compute_figures_of_merit(voltage, current_density)
+    p_reverse = figures_of_merit['P_MPP'][reverse_idx]
+    p_forward = figures_of_merit['P_MPP'][forward_idx]
+
+    grid = np.linspace(0, 1, grid_points) * figures_of_merit['V_oc'][reverse_idx][:, None]
+    j_reverse = _interp_rows(grid, voltage[reverse_idx], current_density[reverse_idx])
+    j_forward = _interp_rows(grid, voltage[forward_idx], current_density[forward_idx])
+    step = np.diff(grid, axis=1)
+    area_reverse = ((j_reverse[:, 1:] + j_reverse[:, :-1]) / 2 * step).sum(axis=1)
+    area_forward = ((j_forward[:, 1:] + j_forward[:, :-1]) / 2 * step).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'hysteresis_index_pce': (p_reverse - p_forward) / p_reverse,
+            'hysteresis_index_area': (area_reverse - area_forward) / area_reverse,
+        }
+
+
+def compute_jv_result_hysteresis(jv_result):
+    """
+    Pairs the sweeps of a JVResult and computes their hysteresis indices.
+
+    Returns the pair names, the curve names of the reverse and forward sweeps and the indices,
+    see compute_hysteresis.
+    """
+    reverse_idx, forward_idx, pair_names = pair_sweeps(jv_result.names)
+    hysteresis = compute_hysteresis(
+        pad_curves(jv_result.voltage, jv_result.offsets),
+        pad_curves(jv_result.current_density, jv_result.offsets),
+        reverse_idx,
+        forward_idx,
+    )
+    hysteresis['name'] = pair_names
+    hysteresis['reverse_curve'] = [jv_result.names[idx] for idx in reverse_idx]
+    hysteresis['forward_curve'] = [jv_result.names[idx] for idx in forward_idx]
+    return hysteresis
+
+
+def compare_jv_curves(names_before, values_before, names_after, values_after):
+    """
+    Matches the curves of two JV measurements of the same cells by name, e.g. before and after
+    an MPP tracking. The values are matrices with one row per curve and one column per figure
+    of merit. Returns the matched names and the change after - before and the retention
+    after / before of all values as matrices with one row per name, NaN where the value before
+    is zero.
+    """
+    names, idx_before, idx_after = np.intersect1d(
+        np.asarray(names_before, dtype=str), np.asarray(names_after, dtype=str), return_indices=True
+    )
+    before = np.asarray(values_before, dtype=np.float64)[idx_before]
+    after = np.asarray(values_after, dtype=np.float64)[idx_after]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = np.where(before != 0, after / before, np.nan)
+    return names.tolist(), after - before, retention
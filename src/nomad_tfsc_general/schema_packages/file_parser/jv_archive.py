@@ -18,76 +18,183 @@
 
 import os
 
+import numpy as np
 from baseclasses.solar_energy.jvmeasurement import (
     SolarCellJVCurveCustom,
 )
 from nomad.units import ureg
 
+from nomad_tfsc_general.schema_packages.file_parser.decimation import decimate
+from nomad_tfsc_general.schema_packages.file_parser.hdf5_storage import write_hdf5_arrays
+from nomad_tfsc_general.schema_packages.file_parser.jv_result import JVResult
 
-def get_jv_archive(jv_dict, mainfile, jvm, archive, append=False):
+# curve quantity, figure of merit of the JVResult and unit
+CURVE_FIGURES_OF_MERIT = (
+    ('open_circuit_voltage', 'V_oc', 'V'),
+    ('short_circuit_current_density', 'J_sc', 'mA/cm^2'),
+    ('fill_factor', 'Fill_factor', None),
+    ('efficiency', 'Efficiency', None),
+    ('potential_at_maximum_power_point', 'U_MPP', 'V'),
+    ('current_density_at_maximun_power_point', 'J_MPP', 'mA/cm^2'),
+)
+
+# curve quantities compared before and after an MPP tracking, with their units
+JV_CHANGE_QUANTITIES = (
+    ('efficiency', None),
+    ('open_circuit_voltage', 'V'),
+    ('short_circuit_current_density', 'mA/cm^2'),
+    ('fill_factor', None),
+)
+
+# diode fit quantity, unit and decimals, the saturation current density spans many orders of
+# magnitude and is not rounded
+DIODE_FIT_QUANTITIES = (
+    ('photocurrent_density', 'mA/cm^2', 8),
+    ('saturation_current_density', 'mA/cm^2', None),
+    ('ideality_factor', None, 8),
+    ('series_resistance', 'ohm*cm^2', 8),
+    ('shunt_resistance', 'ohm*cm^2', 8),
+    ('rmse', 'mA/cm^2', 8),
+)
+
+
+def _scalar_column(values, unit=None, decimals=8):
+    """
+    Returns the values as list of scalars for one section each. The array is rounded in one
+    call and the unit is parsed once for all values, NaN values become None.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    if unit is None:
+        return [None if np.isnan(value) else value for value in values.tolist()]
+    unit = ureg.Unit(unit)
+    return [None if np.isnan(value) else ureg.Quantity(value, unit) for value in values.tolist()]
+
+
+def get_jv_archive(jv_result, mainfile, jvm, archive, append=False, curve_class=SolarCellJVCurveCustom):
+    if isinstance(jv_result, dict):
+        jv_result = JVResult.from_jv_dict(jv_result)
     jvm.file_name = os.path.basename(mainfile)
-    if jv_dict.get('datetime'):
-        jvm.datetime = jv_dict.get('datetime')
-    jvm.active_area = jv_dict['active_area'] if 'active_area' in jv_dict else None
-    jvm.intensity = jv_dict['intensity'] if 'intensity' in jv_dict else None
-    jvm.integration_time = jv_dict['integration_time'] if 'integration_time' in jv_dict else None
-    jvm.settling_time = jv_dict['settling_time'] if 'settling_time' in jv_dict else None
-    jvm.averaging = jv_dict['averaging'] if 'averaging' in jv_dict else None
-    jvm.compliance = jv_dict['compliance'] if 'compliance' in jv_dict else None
+    if jv_result.datetime:
+        jvm.datetime = jv_result.datetime
+    jvm.active_area = jv_result.active_area
+    jvm.intensity = jv_result.intensity
+    jvm.integration_time = jv_result.integration_time
+    jvm.settling_time = jv_result.settling_time
+    jvm.averaging = jv_result.averaging
+    jvm.compliance = jv_result.compliance
     if not append:
         jvm.jv_curve = []
-    light_idx = 0
-    for curve_idx, curve in enumerate(jv_dict['jv_curve']):
-        if jv_dict.get('location', '') == 'Hereon':
-            jv_set = SolarCellJVCurveCustom(
-                cell_name=curve['name'],
-                voltage=curve['voltage'] * ureg('V'),
-                current_density=curve['current_density'] * ureg('A/cm**2'),
+    columns = {
+        quantity: _scalar_column(jv_result.figure_of_merit(key), unit)
+        for quantity, key, unit in CURVE_FIGURES_OF_MERIT
+    }
+    for curve_idx, name in enumerate(jv_result.names):
+        voltage, current_density = jv_result.curve(curve_idx)
+        jvm.jv_curve.append(
+            curve_class(
+                cell_name=name,
+                voltage=voltage,
+                current_density=current_density,
+                light_intensity=jv_result.intensity,
+                **{quantity: column[curve_idx] for quantity, column in columns.items()},
             )
-            jv_set.normalize(archive, None)
-        elif 'pixel' in curve['name'].lower():  # for location 1 of tfsc plugin
-            # Extract pixel number from name to use correct index
-            pixel_num = int(curve['name'].split('_')[1]) - 1  # Convert to 0-based index
-            jv_set = SolarCellJVCurveCustom(
-                cell_name=curve['name'],
-                voltage=curve['voltage'],
-                current_density=curve['current_density'],
-                light_intensity=jv_dict['intensity'],
-                open_circuit_voltage=round(jv_dict['V_oc'][pixel_num], 8) * ureg('V'),
-                short_circuit_current_density=round(jv_dict['J_sc'][pixel_num], 8) * ureg('mA/cm^2'),
-                fill_factor=round(jv_dict['Fill_factor'][pixel_num], 8),
-                efficiency=round(jv_dict['Efficiency'][pixel_num], 8) if 'Efficiency' in jv_dict else None,
-                potential_at_maximum_power_point=round(jv_dict['U_MPP'][pixel_num], 8) * ureg('V'),
-                current_density_at_maximun_power_point=round(jv_dict['J_MPP'][pixel_num], 8)
-                * ureg('mA/cm^2'),
-            )
-        elif 'loc2' in curve['name'].lower():  # for location 2 of tfsc plugin
-            jv_set = SolarCellJVCurveCustom(
-                cell_name=curve['name'],
-                voltage=curve['voltage'],
-                current_density=curve['current_density'],
-                light_intensity=jv_dict['intensity'],
-                open_circuit_voltage=round(jv_dict['V_oc'][curve_idx], 8) * ureg('V'),
-                short_circuit_current_density=round(jv_dict['J_sc'][curve_idx], 8) * ureg('mA/cm^2'),
-                fill_factor=round(jv_dict['Fill_factor'][curve_idx], 8),
-                efficiency=round(jv_dict['Efficiency'][curve_idx], 8) if 'Efficiency' in jv_dict else None,
-                potential_at_maximum_power_point=round(jv_dict['U_MPP'][curve_idx], 8) * ureg('V'),
-                current_density_at_maximun_power_point=round(jv_dict['J_MPP'][curve_idx], 8)
-                * ureg('mA/cm^2'),
-            )
-        elif jv_dict.get('location') == 'Location 2 Outdoor':
-            jv_set = SolarCellJVCurveCustom(
-                cell_name=curve['name'],
-                voltage=curve['voltage'],
-                current_density=curve['current_density'],
-                light_intensity=jv_dict['intensity'],
-                open_circuit_voltage=round(jv_dict['V_oc'][curve_idx], 8) * ureg('V'),
-                short_circuit_current_density=round(jv_dict['J_sc'][curve_idx], 8) * ureg('mA/cm^2'),
-                fill_factor=round(jv_dict['Fill_factor'][curve_idx], 8),
-                efficiency=round(jv_dict['Efficiency'][curve_idx], 8) if 'Efficiency' in jv_dict else None,
-                potential_at_maximum_power_point=round(jv_dict['U_MPP'][curve_idx], 8) * ureg('V'),
-                current_density_at_maximun_power_point=round(jv_dict['J_MPP'][curve_idx], 8)
-                * ureg('mA/cm^2'),
+        )
+
+
+def get_jv_preview_archive(jv_result, jv_curves):
+    """Adds decimated copies of the curves of a JVResult for plotting to their sections."""
+    for curve_idx, jv_curve in enumerate(jv_curves):
+        voltage, current_density = jv_result.curve(curve_idx)
+        preview = decimate({'voltage': voltage, 'current_density': current_density}, 'current_density')
+        jv_curve.preview_voltage = preview['voltage']
+        jv_curve.preview_current_density = preview['current_density']
+
+
+def get_jv_hdf5_archive(jv_result, jv_curves, archive, file_name, append=False):
+    """
+    Writes the curves of a JVResult into an HDF5 file of the upload and replaces the arrays of
+    their sections by references. The datasets are grouped by the index of the curve in jv_curve,
+    with `append` the datasets of earlier curves are kept.
+    """
+    arrays, units = {}, {}
+    for curve_idx, jv_curve in enumerate(jv_curves):
+        voltage, current_density = jv_result.curve(curve_idx)
+        group = f'/jv_curve/{jv_curve.m_parent_index}'
+        arrays[f'{group}/voltage'] = voltage
+        arrays[f'{group}/current_density'] = current_density
+        units[f'{group}/voltage'] = SolarCellJVCurveCustom.voltage.unit
+        units[f'{group}/current_density'] = SolarCellJVCurveCustom.current_density.unit
+    references = write_hdf5_arrays(archive, file_name, arrays, units, append=append)
+    for jv_curve in jv_curves:
+        group = f'/jv_curve/{jv_curve.m_parent_index}'
+        jv_curve.voltage = None
+        jv_curve.current_density = None
+        jv_curve.voltage_hdf5 = references[f'{group}/voltage']
+        jv_curve.current_density_hdf5 = references[f'{group}/current_density']
+
+
+def get_diode_fit_archive(diode_fit, jv_curves, fit_class):
+    """Adds the single-diode model parameters of fit_single_diode to the fitted curves."""
+    columns = {
+        quantity: _scalar_column(diode_fit[quantity], unit, decimals)
+        for quantity, unit, decimals in DIODE_FIT_QUANTITIES
+    }
+    for curve_idx, jv_curve in enumerate(jv_curves):
+        if columns['ideality_factor'][curve_idx] is None:
+            jv_curve.diode_fit = None
+            continue
+        jv_curve.diode_fit = fit_class(
+            converged=bool(diode_fit['converged'][curve_idx]),
+            **{quantity: column[curve_idx] for quantity, column in columns.items()},
+        )
+
+
+def get_hysteresis_archive(hysteresis, jvm, hysteresis_class, append=False):
+    """
+    Stores the hysteresis indices of compute_jv_result_hysteresis, one section per sweep pair,
+    with `append` after the existing ones.
+    """
+    if not append:
+        jvm.hysteresis = []
+    index_pce = _scalar_column(hysteresis['hysteresis_index_pce'])
+    index_area = _scalar_column(hysteresis['hysteresis_index_area'])
+    for pair_idx, name in enumerate(hysteresis['name']):
+        jvm.hysteresis.append(
+            hysteresis_class(
+                name=name,
+                reverse_curve=hysteresis['reverse_curve'][pair_idx],
+                forward_curve=hysteresis['forward_curve'][pair_idx],
+                hysteresis_index_pce=index_pce[pair_idx],
+                hysteresis_index_area=index_area[pair_idx],
             )
-        light_idx += 1
-        jvm.jv_curve.append(jv_set)
+        )
+
+
+def read_jv_figures_of_merit(jvm):
+    """
+    Returns the cell names of the curves of a JV measurement section and a matrix with their
+    values of JV_CHANGE_QUANTITIES, one row per curve, NaN for missing values.
+    """
+    values = np.full((len(jvm.jv_curve), len(JV_CHANGE_QUANTITIES)), np.nan)
+    for curve_idx, jv_curve in enumerate(jvm.jv_curve):
+        for column, (quantity, unit) in enumerate(JV_CHANGE_QUANTITIES):
+            value = getattr(jv_curve, quantity)
+            if value is not None:
+                values[curve_idx, column] = value.to(unit).magnitude if unit else value
+    return [jv_curve.cell_name for jv_curve in jvm.jv_curve], values
+
+
+def get_jv_changes_archive(jv_changes, section, changes_class):
+    """Stores the names, changes and retentions of compare_jv_curves in one section."""
+    names, change, retention = jv_changes
+    changes = changes_class(cell_name=names)
+    for column, (quantity, unit) in enumerate(JV_CHANGE_QUANTITIES):
+        setattr(
+            changes,
+            f'{quantity}_change',
+            ureg.Quantity(change[:, column], unit) if unit else change[:, column],
+        )
+        setattr(changes, f'{quantity}_retention', retention[:, column])
+    section.jv_changes = changes
@@ -16,101 +16,235 @@
 # limitations under the License.
 #
 
+import functools
 import os
+from collections import namedtuple
 from io import StringIO
 
 import numpy as np
 import pandas as pd
 from baseclasses.helper.utilities import convert_datetime
 
+from nomad_tfsc_general.schema_packages.file_parser.jv_analysis import compute_figures_of_merit
+from nomad_tfsc_general.schema_packages.file_parser.jv_result import FIGURES_OF_MERIT, JVResult
+from nomad_tfsc_general.schema_packages.file_parser.raw_file import MappedText
+
+# Bump when the output of the parsers changes, cached parse results are keyed by it.
+JV_PARSER_VERSION = 6
+
+LOCATION_1_FORMAT = 'Location 1 IV Format'
+
+# Declarative column layout of a Location 1 record. The record starts with the fixed fields,
+# followed by one value per pixel for every pixel field and one sweep per pixel for every
+# curve field. Each sweep holds the reverse sweep followed by the forward sweep.
+LOCATION_1_FIXED_FIELDS = ('repetition', 'date', 'v_start', 'v_end', 'v_delta', 'unused')
+LOCATION_1_PIXEL_FIELDS = (
+    'area',
+    'J_sc_rev',
+    'J_sc_fw',
+    'V_oc_rev',
+    'V_oc_fw',
+    'FF_rev',
+    'FF_fw',
+    'MPP_rev',
+    'MPP_fw',
+)
+LOCATION_1_CURVE_FIELDS = ('current_density', 'voltage')
+
+
+class Location1Layout:
+    """
+    Column plan of a Location 1 record for a given pixel count and sweep length.
+
+    All accessors return views into the parsed float rows, they work on a single record as
+    well as on a (repetition, field) matrix.
+    """
+
+    __slots__ = ('pixel_count', 'sweep_point_count', 'record_length', 'columns', 'curve_offset')
+
+    def __init__(self, pixel_count, sweep_point_count):
+        self.pixel_count = pixel_count
+        self.sweep_point_count = sweep_point_count
+        self.columns = {name: idx for idx, name in enumerate(LOCATION_1_FIXED_FIELDS)}
+        offset = len(LOCATION_1_FIXED_FIELDS)
+        for name in LOCATION_1_PIXEL_FIELDS:
+            self.columns[name] = slice(offset, offset + pixel_count)
+            offset += pixel_count
+        self.curve_offset = offset
+        self.record_length = offset + len(LOCATION_1_CURVE_FIELDS) * pixel_count * sweep_point_count
+
+    def field(self, rows, name):
+        return rows[..., self.columns[name]]
+
+    def curves(self, rows, name):
+        # (..., pixel, point) view of the current density or voltage block
+        block = rows[..., self.curve_offset :].reshape(
+            *rows.shape[:-1], len(LOCATION_1_CURVE_FIELDS), self.pixel_count, self.sweep_point_count
+        )
+        return block[..., LOCATION_1_CURVE_FIELDS.index(name), :, :]
 
-def get_jv_data_location_1(filedata):
-    # Parse Location 1 IV format - tab-separated data with each row as measurement repetition
-    lines = filedata.strip().split('\n')
-    data = [line.strip().split('\t') for line in lines]
 
-    # each row in the datafile represents a measurement repetition.
-    # here i'm only parsing out the last repetition.
+@functools.lru_cache(maxsize=32)
+def location_1_layout(pixel_count, sweep_point_count):
+    return Location1Layout(pixel_count, sweep_point_count)
 
-    date = data[-1][1]  # measurement date, the time is the last pixel measurement time
+
+def _location_1_sweep_point_count(v_start, v_end, v_delta):
+    sweep_point_count = int((abs(v_end - v_start) / v_delta) + 1)
+    return sweep_point_count * 2  # because hysteresis
+
+
+def _location_1_layout_from_fields(fields):
+    # The sweep settings of the record and its length determine the pixel count.
+    try:
+        sweep_point_count = _location_1_sweep_point_count(
+            float(fields[2]), float(fields[3]), float(fields[4])
+        )
+    except (IndexError, ValueError, ZeroDivisionError, OverflowError):
+        return None
+    fields_per_pixel = len(LOCATION_1_PIXEL_FIELDS) + len(LOCATION_1_CURVE_FIELDS) * sweep_point_count
+    pixel_count, remainder = divmod(len(fields) - len(LOCATION_1_FIXED_FIELDS), fields_per_pixel)
+    if pixel_count < 1 or remainder:
+        return None
+    return location_1_layout(pixel_count, sweep_point_count)
+
+
+def _location_1_datetime(date):
     time, month, day, year = date.split()
     month = {'maa': 'mar', 'mei': 'may', 'okt': 'oct'}.get(month, month)
     fixed_date = time + ' ' + month + ' ' + day + ' ' + year
+    return convert_datetime(fixed_date, '%H:%M:%S %b %d %Y')
 
-    v_start = float(data[-1][2])  # v start [V]
-    v_end = float(data[-1][3])  # v end [V]
-    v_delta = float(data[-1][4])  # v step [V]
-    p1_cell_area = float(data[-1][6])  # cell area pixel 1 [cm2]
-
-    Jsc_rev = data[-1][10:14]  # Jsc of reverse sweeps
-    # Clean up the 'hysteresis$' string from Jsc_rev
-    Jsc_rev = [float(val.replace('hysteresis$', '')) for val in Jsc_rev]
 
-    Voc_rev = data[-1][18:22]  # Voc of reverse sweeps
-    Voc_fw = data[-1][22:26]  # Voc of forward sweeps
-    # Voc is in mV, convert to V
-    Voc_rev = [float(val) / 1000 for val in Voc_rev]
-    Voc_fw = [float(val) / 1000 for val in Voc_fw]
-
-    FF_rev = [float(val) for val in data[-1][26:30]]  # FF of reverse sweeps
+def _location_1_figures_of_merit(layout, rows, intensity):
+    # Use reverse sweep data as primary values (similar to IRIS format)
+    Jsc_rev = np.abs(layout.field(rows, 'J_sc_rev'))
+    Voc_rev = layout.field(rows, 'V_oc_rev') / 1000  # Voc is in mV, convert to V
+    FF_rev = layout.field(rows, 'FF_rev')
+
+    # the file only has the power at the maximum power point, rounded to 0.01 mW/cm^2, the
+    # point itself is taken from the reverse sweeps of all pixels
+    sweep_half = layout.sweep_point_count // 2
+    pixel_shape = (*rows.shape[:-1], layout.pixel_count)
+    reverse_sweeps = compute_figures_of_merit(
+        layout.curves(rows, 'voltage')[..., :sweep_half].reshape(-1, sweep_half),
+        layout.curves(rows, 'current_density')[..., :sweep_half].reshape(-1, sweep_half),
+        intensity,
+    )
+    return {
+        'J_sc': Jsc_rev,
+        'V_oc': Voc_rev,
+        'Fill_factor': FF_rev * 0.01,
+        'Efficiency': Voc_rev * Jsc_rev * FF_rev / intensity,
+        'P_MPP': reverse_sweeps['P_MPP'].reshape(pixel_shape),
+        'J_MPP': reverse_sweeps['J_MPP'].reshape(pixel_shape),
+        'U_MPP': reverse_sweeps['U_MPP'].reshape(pixel_shape),
+    }
+
+
+# initial size of the blocks text streams are read backwards in, it doubles with every block
+LOCATION_1_TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def _read_lines_backwards(stream, line_end, block_size=LOCATION_1_TAIL_BLOCK_SIZE):
+    """Yields the lines of a seekable stream from its end on, read in growing blocks."""
+    end = stream.seek(0, os.SEEK_END)
+    rest = line_end[:0]
+    while end > 0:
+        start = max(end - block_size, 0)
+        stream.seek(start)
+        lines = (stream.read(end - start) + rest).split(line_end)
+        # the first line may continue in the block before
+        rest = lines[0]
+        yield from reversed(lines[1:])
+        end = start
+        block_size *= 2
+    yield rest
+
+
+def _location_1_record(line):
+    line = line.strip()
+    if not line:
+        return None
+    fields = line.split('\t')
+    layout = _location_1_layout_from_fields(fields)
+    return None if layout is None else (fields, layout)
+
+
+def read_last_location_1_record(filedata):
+    """
+    Returns the tab-separated fields of the last complete repetition of a Location 1 file
+    together with its column layout.
+
+    The file is scanned backwards line by line, so only the tail of the file is touched no
+    matter how many repetitions it holds. Trailing lines that are still being written are skipped.
+    Strings and the bytes of a MappedText are searched in place, text streams are read backwards
+    in blocks from their end, text files through their binary buffer.
+    """
+    buffer, line_end, decode = filedata, '\n', str
+    if isinstance(filedata, MappedText):
+        buffer, line_end, decode = filedata.mapped, b'\n', filedata.decode
+    elif not isinstance(filedata, str):
+        stream = getattr(filedata, 'buffer', filedata)
+        if stream is not filedata:
+            line_end = b'\n'
+            decode = functools.partial(bytes.decode, encoding=filedata.encoding, errors='replace')
+        for line in _read_lines_backwards(stream, line_end):
+            record = _location_1_record(decode(line))
+            if record is not None:
+                return record
+        raise ValueError('No complete Location 1 record found')
+
+    end = len(buffer)
+    while end > 0:
+        start = buffer.rfind(line_end, 0, end) + 1
+        record = _location_1_record(decode(buffer[start:end]))
+        if record is not None:
+            return record
+        end = start - 1
+    raise ValueError('No complete Location 1 record found')
 
-    MPP_rev = [float(val) for val in data[-1][34:38]]  # MPP of reverse sweeps
 
-    # calculate the amount of measurements points
-    sweep_point_count = int((abs(v_end - v_start) / v_delta) + 1)
-    sweep_point_count *= 2  # because hysteresis
+def get_jv_data_location_1(filedata):
+    # Parse Location 1 IV format - tab-separated data with each row as measurement repetition
+    # each row in the datafile represents a measurement repetition.
+    # here i'm only parsing out the last repetition.
+    fields, layout = read_last_location_1_record(filedata)
 
-    # get the current density data for all 4 pixels
-    area_corrected_I = []
-    for i in range(4):
-        start = 42 + sweep_point_count * i
-        end = start + sweep_point_count
-        area_corrected_I_range = [float(val) for val in data[-1][start:end]]
-        area_corrected_I.append(area_corrected_I_range)
+    date = fields[1]  # measurement date, the time is the last pixel measurement time
 
-    # get the voltage data for all 4 pixels
-    # voltage range from v_start -> v_end -> v_start
-    voltage = []
-    for i in range(4):
-        offset = 42 + sweep_point_count * 4
-        start = offset + sweep_point_count * i
-        end = start + sweep_point_count
-        voltage_range = [float(val) for val in data[-1][start:end]]
-        voltage.append(voltage_range)
+    # Clean up the 'hysteresis$' string from Jsc_rev and convert the whole record at once
+    jsc_rev = layout.columns['J_sc_rev']
+    fields[1] = 'nan'
+    fields[jsc_rev] = [val.replace('hysteresis$', '') for val in fields[jsc_rev]]
+    row = np.array(fields, dtype=np.float64)
 
     jv_dict = {}
-    jv_dict['datetime'] = convert_datetime(fixed_date, '%H:%M:%S %b %d %Y')
-    jv_dict['active_area'] = p1_cell_area  # Use first pixel as default
+    jv_dict['datetime'] = _location_1_datetime(date)
+    jv_dict['active_area'] = float(layout.field(row, 'area')[0])  # Use first pixel as default
     jv_dict['intensity'] = 100.0  # Default 100 mW/cm² for efficiency calculation.
-    # Use reverse sweep data as primary values (similar to IRIS format)
-    jv_dict['J_sc'] = [abs(x) for x in Jsc_rev]
-    jv_dict['V_oc'] = Voc_rev
-    jv_dict['Fill_factor'] = [ff * 0.01 for ff in FF_rev]
-
-    # Calculate efficiency for each pixel
-    jv_dict['Efficiency'] = [
-        (voc * jsc * ff / jv_dict['intensity'])
-        for voc, jsc, ff in zip(Voc_rev, [abs(x) for x in Jsc_rev], FF_rev)
-    ]
+    figures_of_merit = _location_1_figures_of_merit(layout, row, jv_dict['intensity'])
+    for key, values in figures_of_merit.items():
+        jv_dict[key] = values.tolist()
 
-    jv_dict['P_MPP'] = [abs(x) for x in MPP_rev]
-    jv_dict['J_MPP'] = [abs(x) for x in Jsc_rev]  # Approximation
-    jv_dict['U_MPP'] = Voc_rev  # Approximation
+    # voltage range from v_start -> v_end -> v_start
+    area_corrected_I = layout.curves(row, 'current_density')
+    voltage = layout.curves(row, 'voltage')
 
     jv_dict['jv_curve'] = []
     # Create JV curves for each pixel - both forward and reverse sweeps
     # Split the hysteresis data: first half is reverse (v_start -> v_end), second half is forward
     # (v_end -> v_start). Double check with definition of forward and reverse if it is p-i-n or n-i-p.
-    sweep_half = sweep_point_count // 2
+    sweep_half = layout.sweep_point_count // 2
 
-    for i in range(4):
+    for i in range(layout.pixel_count):
         # Reverse sweep (first half of data)
         jv_dict['jv_curve'].append(
             {
                 'name': f'Pixel_{i + 1}_reverse',
                 'dark': False,
-                'voltage': np.array(voltage[i][:sweep_half]),
-                'current_density': np.array(area_corrected_I[i][:sweep_half]),
+                'voltage': voltage[i, :sweep_half],
+                'current_density': area_corrected_I[i, :sweep_half],
             }
         )
 
@@ -119,33 +253,165 @@ def get_jv_data_location_1(filedata):
             {
                 'name': f'Pixel_{i + 1}_forward',
                 'dark': False,
-                'voltage': np.array(voltage[i][sweep_half:]),
-                'current_density': np.array(area_corrected_I[i][sweep_half:]),
+                'voltage': voltage[i, sweep_half:],
+                'current_density': area_corrected_I[i, sweep_half:],
             }
         )
     return jv_dict
 
 
-def get_jv_data_location_2(filedata):
-    lines = filedata.splitlines()
-    curve_header_idx = next(
-        (idx for idx, line in enumerate(lines) if line.startswith('U [V]/Exposure [h]')),
-        None,
+def get_jv_data_location_1_repetitions(filedata):
+    """
+    Parses every repetition of a Location 1 file, given as string or text stream, in one pass.
+
+    The curves are returned as dense arrays of shape (repetition, pixel, point), where the
+    points hold the reverse sweep followed by the forward sweep. The figures of merit of the
+    reverse sweeps have shape (repetition, pixel). Incomplete trailing records are dropped.
+    """
+    if not isinstance(filedata, str):
+        filedata = filedata.read()
+    df = pd.read_csv(
+        StringIO(filedata.replace('hysteresis$', '')),
+        sep='\t',
+        header=None,
+        dtype={1: str},
+        engine='c',
     )
-    if curve_header_idx is None:
-        return None
+    df = df[df.iloc[:, -1].notna()]
+    if df.empty:
+        raise ValueError('No complete Location 1 record found')
 
-    header_text = '\n'.join(lines[:curve_header_idx]).strip()
-    curves_text = '\n'.join(lines[curve_header_idx:]).strip()
+    dates = df[1].tolist()
+    df[1] = np.nan
+    rows = df.to_numpy(dtype=np.float64)
+    layout = _location_1_layout_from_fields(rows[0])
+    if layout is None or layout.record_length != rows.shape[1]:
+        raise ValueError('Location 1 records do not match the sweep settings')
 
-    df_header = pd.read_csv(
-        StringIO(header_text),
-        header=0,
-        sep='\t',
-        encoding='unicode_escape',
-        engine='python',
+    jv_dict = {}
+    jv_dict['repetition'] = layout.field(rows, 'repetition').astype(np.int64)
+    jv_dict['datetime'] = [_location_1_datetime(date) for date in dates]
+    jv_dict['active_area'] = layout.field(rows, 'area')
+    jv_dict['intensity'] = 100.0
+    jv_dict.update(_location_1_figures_of_merit(layout, rows, jv_dict['intensity']))
+    jv_dict['current_density'] = layout.curves(rows, 'current_density')
+    jv_dict['voltage'] = layout.curves(rows, 'voltage')
+    return jv_dict
+
+
+def get_jv_result_location_1_repetitions(filedata):
+    """
+    Returns the curves of every repetition of a Location 1 file as JVResult. The curves are
+    named Pixel_<pixel>_<direction>_repetition_<repetition>, the settings are taken from the
+    last repetition.
+    """
+    jv_dict = get_jv_data_location_1_repetitions(filedata)
+    repetitions, pixel_count, point_count = jv_dict['voltage'].shape
+    sweep_half = point_count // 2
+    names = [
+        f'Pixel_{pixel + 1}_{direction}_repetition_{repetition}'
+        for repetition in jv_dict['repetition']
+        for pixel in range(pixel_count)
+        for direction in ('reverse', 'forward')
+    ]
+    # the reverse and forward sweep of every pixel share its figures of merit
+    figures_of_merit = {key: np.repeat(jv_dict[key].ravel(), 2) for key in FIGURES_OF_MERIT}
+    return JVResult(
+        names,
+        jv_dict['voltage'].ravel(),
+        jv_dict['current_density'].ravel(),
+        np.arange(len(names) + 1) * sweep_half,
+        figures_of_merit=figures_of_merit,
+        location=LOCATION_1_FORMAT,
+        datetime=jv_dict['datetime'][-1],
+        active_area=float(jv_dict['active_area'][-1, 0]),
+        intensity=jv_dict['intensity'],
     )
 
+
+def location_1_complete_size(data):
+    """
+    Returns the number of leading bytes of a chunk of a Location 1 file that hold complete
+    records, including the line end of the last one. Records still being written are excluded.
+    """
+    end = len(data)
+    while end > 0:
+        start = data.rfind(b'\n', 0, end) + 1
+        line = data[start:end].strip()
+        if line and _location_1_layout_from_fields(line.decode('latin-1').split('\t')) is not None:
+            return end + 1 if end < len(data) else end
+        end = start - 1
+    return 0
+
+
+def location_1_ingested_size(f, window=1024**2):
+    """
+    Returns the size of the part of a binary Location 1 file stream that holds complete
+    records. Only the tail of the file is read, in growing windows until a record is found.
+    """
+    size = f.seek(0, os.SEEK_END)
+    while True:
+        start = max(size - window, 0)
+        f.seek(start)
+        complete_size = location_1_complete_size(f.read())
+        if complete_size or start == 0:
+            f.seek(0)
+            return start + complete_size
+        window *= 2
+
+
+def read_appended_location_1_records(f, ingested_size):
+    """
+    Returns the complete records appended to a binary Location 1 file stream after its first
+    `ingested_size` bytes, together with the new ingested size. Returns None if the ingested
+    part does not end with a line end anymore, then the file has to be parsed as a whole.
+    """
+    f.seek(max(ingested_size - 1, 0))
+    data = f.read()
+    f.seek(0)
+    if data[:1] != b'\n':
+        return None
+    complete_size = location_1_complete_size(data[1:])
+    return data[1 : 1 + complete_size], ingested_size + complete_size
+
+
+LOCATION_2_CURVE_HEADER = 'U [V]/Exposure [h]'
+
+
+def _read_location_2_block(text):
+    # The C engine covers well-formed files, the python engine is only needed for ragged input.
+    try:
+        return pd.read_csv(StringIO(text), header=0, sep='\t', engine='c', float_precision='round_trip')
+    except (pd.errors.ParserError, ValueError):
+        return pd.read_csv(
+            StringIO(text),
+            header=0,
+            sep='\t',
+            encoding='unicode_escape',
+            engine='python',
+        )
+
+
+def _location_2_curve_matrix(df_curves):
+    try:
+        return df_curves.to_numpy(dtype=np.float64)
+    except (TypeError, ValueError):
+        return df_curves.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def get_jv_data_location_2(filedata):
+    if filedata.startswith(LOCATION_2_CURVE_HEADER):
+        curve_header_pos = 0
+    else:
+        curve_header_pos = filedata.find('\n' + LOCATION_2_CURVE_HEADER) + 1
+        if curve_header_pos == 0:
+            return None
+
+    header_text = filedata[:curve_header_pos].strip()
+    curves_text = filedata[curve_header_pos:].strip()
+
+    df_header = _read_location_2_block(header_text)
+
     df_header = df_header[
         df_header['File'].notna() & (df_header['File'].astype(str).str.strip() != '')
     ].reset_index(drop=True)
@@ -156,14 +422,7 @@ def get_jv_data_location_2(filedata):
     date = df_header['File'][0].split('_')[-3]
     time = df_header['File'][0].split('_')[-2]
 
-    df_curves = pd.read_csv(
-        StringIO(curves_text),
-        header=0,
-        sep='\t',
-        encoding='unicode_escape',
-        engine='python',
-    )
-
+    df_curves = _read_location_2_block(curves_text)
     df_curves = df_curves.dropna(how='all', axis=1)
 
     jv_dict = {}
@@ -197,19 +456,35 @@ def get_jv_data_location_2(filedata):
 
     n_curves = min(len(df_header), max(df_curves.shape[1] - 1, 0))
 
-    for i in range(n_curves):
-        voltage = pd.to_numeric(df_curves.iloc[:, 0], errors='coerce')
-        current_density = pd.to_numeric(df_curves.iloc[:, i + 1], errors='coerce')
-        valid_mask = ~(voltage.isna() | current_density.isna())
+    names = [
+        f'{extract_name_prefix(file_name)}_loc2_{file_name.split("_")[-1]}' for file_name in df_header['File']
+    ][:n_curves]
+
+    # all curves share the voltage column, the validity of every point is decided at once
+    curves = _location_2_curve_matrix(df_curves)
+    voltage = curves[:, 0]
+    current_density = curves[:, 1 : n_curves + 1]
+    # the currents of every curve are listed in measurement order, the voltage column runs in
+    # the direction of the sweeps in the file and backwards for sweeps in the other direction
+    measured_voltage = voltage[np.isfinite(voltage)]
+    ascending = len(measured_voltage) < 2 or measured_voltage[-1] > measured_voltage[0]
+    flipped = np.array(
+        [
+            ('reverse' in name.lower() and ascending) or ('forward' in name.lower() and not ascending)
+            for name in names
+        ],
+        dtype=bool,
+    )
+    curve_voltage = np.where(flipped, voltage[::-1, None], voltage[:, None])
+    valid_mask = ~(np.isnan(curve_voltage) | np.isnan(current_density))
 
+    for i, name in enumerate(names):
         jv_dict['jv_curve'].append(
             {
-                'name': (
-                    f'{extract_name_prefix(df_header["File"][i])}_loc2_{df_header["File"][i].split("_")[-1]}'
-                ),
+                'name': name,
                 'dark': False,
-                'voltage': np.array(voltage[valid_mask]),
-                'current_density': np.array(current_density[valid_mask]),
+                'voltage': curve_voltage[valid_mask[:, i], i],
+                'current_density': current_density[valid_mask[:, i], i],
             }
         )
     return jv_dict
@@ -237,10 +512,19 @@ def get_jv_data_location_3(filedata):
             {
                 'name': f'{col[0]}',
                 'dark': False,
-                'voltage': np.array(df[col]),
-                'current_density': np.array(df[(col[0], 'J (A/cm^2)')]),
+                'voltage': np.array(df[col], dtype=np.float64),
+                # the file holds A/cm^2, all parsers return mA/cm^2
+                'current_density': np.array(df[(col[0], 'J (A/cm^2)')], dtype=np.float64) * 1000,
             }
         )
+
+    # the file has no figures of merit, they are computed for all curves at once
+    figures_of_merit = compute_figures_of_merit(
+        [curve['voltage'] for curve in jv_dict['jv_curve']],
+        [curve['current_density'] for curve in jv_dict['jv_curve']],
+    )
+    for key, values in figures_of_merit.items():
+        jv_dict[key] = values.tolist()
     return jv_dict
 
 
@@ -329,16 +613,80 @@ def get_jv_data_location_2_outdoor(filedata, filename=None):
     return jv_dict
 
 
-def get_jv_data(filedata, filename=None):
-    # Check if it is Location 1 IV format by looking for tab-separated numeric data structure
-    lines = filedata.strip().split('\n')
-    if lines and '\t' in filedata and any(len(line.split('\t')) > 40 for line in lines):
-        return get_jv_data_location_1(filedata), 'Location 1 IV Format'
-    elif 'U [V]/Exposure [h]' in filedata:
-        return get_jv_data_location_2(filedata), 'Location 2 txt Format'
-    elif 'Voltage (V)\t' in filedata and 'ISC[A]:' in filedata:
-        return get_jv_data_location_2_outdoor(filedata, filename), 'Location 2 Outdoor txt Format'
-    elif 'Pixel 1' in filedata and 'J (A/cm^2)' in filedata and 'V (V)' in filedata:
-        return get_jv_data_location_3(filedata), 'Hereon csv Format'
+# Number of characters at the start of a file the format signatures are matched against.
+JV_SNIFF_SIZE = 4096
+
+JVFormat = namedtuple('JVFormat', ['location', 'signature', 'parser', 'streaming'])
+
+JV_FORMATS = []
+
+
+def register_jv_format(location, signature, parser, index=None, streaming=False):
+    """
+    Registers a JV file format for get_jv_data.
+
+    `signature(prefix)` gets the first JV_SNIFF_SIZE characters of the file and returns
+    whether the file is in this format, `parser(filedata, filename)` returns the jv_dict.
+    Parsers registered with `streaming=True` are passed text streams as they are, all others
+    get the file content as a string. Formats are tried in registration order unless an index
+    is given.
+    """
+    jv_format = JVFormat(location, signature, parser, streaming)
+    JV_FORMATS.insert(len(JV_FORMATS) if index is None else index, jv_format)
+    return jv_format
+
+
+def _first_line(prefix):
+    return prefix.lstrip().split('\n', 1)[0]
+
+
+# Location 1 IV format: tab-separated records with more than 40 fields per line
+register_jv_format(
+    LOCATION_1_FORMAT,
+    lambda prefix: _first_line(prefix).count('\t') >= 40,
+    lambda filedata, filename: get_jv_data_location_1(filedata),
+    streaming=True,
+)
+register_jv_format(
+    'Location 2 txt Format',
+    lambda prefix: LOCATION_2_CURVE_HEADER in prefix or _first_line(prefix).startswith('Time [h]\tISC[A]\t'),
+    lambda filedata, filename: get_jv_data_location_2(filedata),
+)
+register_jv_format(
+    'Location 2 Outdoor txt Format',
+    lambda prefix: 'Voltage (V)\t' in prefix and 'ISC[A]:' in prefix,
+    get_jv_data_location_2_outdoor,
+)
+register_jv_format(
+    'Hereon csv Format',
+    lambda prefix: 'Pixel 1' in prefix and 'J (A/cm^2)' in prefix and 'V (V)' in prefix,
+    lambda filedata, filename: get_jv_data_location_3(filedata),
+)
+
+
+def sniff_jv_format(filedata):
+    if isinstance(filedata, str):
+        prefix = filedata[:JV_SNIFF_SIZE]
     else:
+        position = filedata.tell()
+        prefix = filedata.read(JV_SNIFF_SIZE)
+        filedata.seek(position)
+    return next((jv_format for jv_format in JV_FORMATS if jv_format.signature(prefix)), None)
+
+
+def get_jv_data(filedata, filename=None):
+    """Parses JV data from a string or a text stream, returns the jv_dict and the format name."""
+    if not isinstance(filedata, str) and not filedata.seekable():
+        filedata = StringIO(filedata.read())
+    jv_format = sniff_jv_format(filedata)
+    if jv_format is None:
         return None, 'Unknown format'
+    if not isinstance(filedata, str) and not jv_format.streaming:
+        filedata = filedata.read()
+    return jv_format.parser(filedata, filename), jv_format.location
+
+
+def get_jv_result(filedata, filename=None):
+    """Like get_jv_data, but returns the parsed data as a JVResult."""
+    jv_dict, location = get_jv_data(filedata, filename)
+    return (JVResult.from_jv_dict(jv_dict) if jv_dict is not None else None), location
@@ -0,0 +1,141 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import re
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.parse_cache import register_cacheable
+
+# Figures of merit as named in the jv_dict of the parsers, units are V, mA/cm^2, mW and %.
+FIGURES_OF_MERIT = ('J_sc', 'V_oc', 'Fill_factor', 'Efficiency', 'P_MPP', 'U_MPP', 'J_MPP')
+
+MEASUREMENT_SETTINGS = (
+    'datetime',
+    'active_area',
+    'intensity',
+    'integration_time',
+    'settling_time',
+    'averaging',
+    'compliance',
+)
+
+
+@register_cacheable
+class JVResult:
+    """
+    Parsed JV data of one file in columnar form.
+
+    The figures of merit are stored as one float array per quantity with one value per curve,
+    missing values are NaN. The curves are stored back to back in `voltage` and
+    `current_density`, curve i spans `offsets[i]:offsets[i + 1]`.
+    """
+
+    __slots__ = (
+        'location',
+        *MEASUREMENT_SETTINGS,
+        'names',
+        'dark',
+        'offsets',
+        'voltage',
+        'current_density',
+        'figures_of_merit',
+    )
+
+    def __init__(
+        self, names, voltage, current_density, offsets, dark=None, figures_of_merit=None, **settings
+    ):
+        self.names = list(names)
+        self.voltage = np.asarray(voltage, dtype=np.float64)
+        self.current_density = np.asarray(current_density, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.dark = np.zeros(len(self.names), dtype=bool) if dark is None else np.asarray(dark, dtype=bool)
+        self.figures_of_merit = {
+            key: np.asarray(values, dtype=np.float64) for key, values in (figures_of_merit or {}).items()
+        }
+        self.location = settings.pop('location', None)
+        for key in MEASUREMENT_SETTINGS:
+            setattr(self, key, settings.pop(key, None))
+        if settings:
+            raise TypeError(f'Unknown JV result settings: {", ".join(settings)}')
+
+    def __len__(self):
+        return len(self.names)
+
+    def curve(self, idx):
+        """Returns views of the voltage and current density of curve `idx`."""
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.voltage[start:end], self.current_density[start:end]
+
+    def curve_lengths(self):
+        return np.diff(self.offsets)
+
+    def figure_of_merit(self, key):
+        """Returns the values of a figure of merit, NaN for every curve if it is unknown."""
+        values = self.figures_of_merit.get(key)
+        return np.full(len(self), np.nan) if values is None else values
+
+    @classmethod
+    def from_jv_dict(cls, jv_dict):
+        """
+        Converts the jv_dict of the parsers.
+
+        Location 1 files report one figure of merit per pixel for the forward and reverse curve
+        of that pixel, all other formats one per curve.
+        """
+        curves = jv_dict['jv_curve']
+        names = [curve['name'] for curve in curves]
+        lengths = [len(curve['voltage']) for curve in curves]
+        offsets = np.zeros(len(curves) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        voltage = np.concatenate([np.asarray(curve['voltage'], dtype=np.float64) for curve in curves] or [[]])
+        current_density = np.concatenate(
+            [np.asarray(curve['current_density'], dtype=np.float64) for curve in curves] or [[]]
+        )
+
+        figures_of_merit = {}
+        value_idx = np.arange(len(curves))
+        pixels = [re.match(r'pixel_(\d+)_', name, re.IGNORECASE) for name in names]
+        if pixels and all(pixels):
+            # Location 1 curves are named Pixel_<number>_<direction>
+            value_idx = np.array([int(pixel.group(1)) - 1 for pixel in pixels], dtype=np.int64)
+        for key in FIGURES_OF_MERIT:
+            values = np.asarray(jv_dict.get(key, []), dtype=np.float64)
+            if len(values) == 0:
+                continue
+            figures_of_merit[key] = np.where(
+                value_idx < len(values), values[np.minimum(value_idx, len(values) - 1)], np.nan
+            )
+
+        return cls(
+            names,
+            voltage,
+            current_density,
+            offsets,
+            dark=[curve.get('dark', False) for curve in curves],
+            figures_of_merit=figures_of_merit,
+            location=jv_dict.get('location'),
+            **{key: jv_dict.get(key) for key in MEASUREMENT_SETTINGS},
+        )
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
@@ -0,0 +1,716 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Stability and tracking quality metrics of MPP tracking runs, computed with array operations
+over whole traces, and the change points between their degradation regimes.
+"""
+
+import heapq
+
+import numpy as np
+
+# Bump when the metrics computed from the traces change, entries of unchanged files are then
+# normalized again.
+MPPT_ANALYSIS_VERSION = 3
+
+# Length of the rolling windows in the unit of the time array (seconds).
+STABILITY_WINDOW = 60.0
+# The stable part of a run whose linear trend is extrapolated back to the peak for the
+# burn-in loss, as fraction of the time after the peak, counted from its end.
+STABLE_FRACTION = 0.5
+
+# The window length in points and the sign of the power density are taken from this many
+# points at the start of a run.
+STABILITY_SAMPLE = 1000
+# Fractions of the peak power density the t95, t90 and t80 thresholds stand for.
+STABILITY_THRESHOLDS = {'t95': 0.95, 't90': 0.9, 't80': 0.8}
+
+STABILITY_METRICS = (
+    'window',
+    'initial_power_density',
+    'peak_power_density',
+    'time_to_peak',
+    'stabilized_power_density',
+    'stabilized_efficiency',
+    'burn_in_loss',
+    'degradation_rate',
+    't95',
+    't90',
+    't80',
+)
+
+# Voltage changes up to this size (V) count as holding the voltage.
+STEP_TOLERANCE = 1e-6
+# The voltage is stuck if it is held this many times longer than between typical steps.
+STUCK_FACTOR = 10
+# The tracking is lost if the voltage is stepped in one direction this many times in a row.
+LOST_TRACK_STEPS = 10
+# Medians of growing traces are taken from histograms with logarithmic bins of this relative
+# width, as the mean of the values in the bin of the median.
+HISTOGRAM_BIN_WIDTH = 1e-3
+# Holds longer than this fraction of the stuck threshold are kept to continue the tracking
+# analysis, as the threshold follows the step interval.
+HOLD_FRACTION = 0.2
+
+TRACKING_METRICS = (
+    'step_size',
+    'step_size_mean',
+    'step_size_std',
+    'step_size_min',
+    'step_size_max',
+    'step_interval',
+    'oscillation_amplitude',
+    'oscillation_frequency',
+    'stuck_time',
+    'lost_track_time',
+)
+
+# Segments between change points hold at least this many points.
+CHANGE_POINT_MIN_SIZE = 10
+# A trace is split into at most this many segments.
+CHANGE_POINT_MAX_SEGMENTS = 16
+# Penalty of a change point in noise variances per log of the number of points, counts the
+# intercept, slope and position of the additional segment as for the BIC.
+CHANGE_POINT_PENALTY = 3.0
+# Long traces are segmented from the means of at most this many pyramid buckets.
+CHANGE_POINT_BUCKETS = 4096
+
+
+def rolling_mean(values, window):
+    """Mean of values[i - window + 1 : i + 1] for every i, with shorter windows at the start."""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - window, 0)
+    return (cumulative[end] - cumulative[begin]) / (end - begin)
+
+
+def rolling_max(values, window):
+    """
+    Maximum of values[i : i + window] for every i, with shorter windows at the end. Uses the
+    maxima of the prefixes and suffixes of blocks of `window` values (van Herk/Gil-Werman),
+    which gives the result of a monotone deque with array operations in O(n).
+    """
+    length = len(values)
+    padded = np.full((-(-length // window) + 1) * window, -np.inf)
+    padded[:length] = values
+    blocks = padded.reshape(-1, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    idx = np.arange(length)
+    return np.maximum(suffix[idx], prefix[idx + window - 1])
+
+
+def _new_stability_state(read, length, window):
+    sample_time, sample_power = read(0, min(length, STABILITY_SAMPLE + 1))
+    steps = np.diff(sample_time)
+    return {
+        'window': window,
+        'points': max(int(round(window / max(np.median(steps), 1e-12))), 1) if len(steps) else 1,
+        'sign': -1.0 if len(sample_power) and np.median(sample_power) < 0 else 1.0,
+        'start_time': float(sample_time[0]) if len(sample_time) else 0.0,
+        'length': 0,
+        'initial': None,
+        'peak': None,
+        'peak_index': 0,
+        'peak_time': None,
+        'time_to_peak': None,
+        'stabilized': None,
+        'decided': 0,
+        **dict.fromkeys(STABILITY_THRESHOLDS),
+        'trend_start': None,
+        'trend_sums': None,
+    }
+
+
+def _trend_sums(time, power, reference):
+    time = time - reference
+    return np.array([len(time), time.sum(), (time * time).sum(), power.sum(), (time * power).sum()])
+
+
+def update_stability_state(state, read, length, window=STABILITY_WINDOW):
+    """
+    Continues the state of compute_stability_metrics of the first points of a run up to
+    `length` points, a new state is started without a `state`. `read(start, stop)` returns the
+    time and the power density of the points start to stop.
+
+    Only the new points and the ones of the last two windows before them are read, as well as
+    the points the stable part of the run moved beyond, which are about half of the new ones.
+    The window length in points and the sign of the power are taken from the first
+    STABILITY_SAMPLE points, states of shorter runs are started anew. The time is assumed to
+    increase and the values to be finite. Returns a dict of JSON types.
+    """
+    length = int(length)
+    if (
+        state is None
+        or state['window'] != window
+        or state['length'] <= STABILITY_SAMPLE
+        or state['length'] < state['points']
+    ):
+        state = _new_stability_state(read, length, window)
+    else:
+        state = dict(state)
+    start = state['length']
+    if length <= start:
+        return state
+    points = state['points']
+
+    # window averages of the new points and of the ones whose following window was incomplete
+    first = min(start, state['decided'])
+    offset = max(first - points + 1, 0)
+    time, power = read(offset, length)
+    time = time - state['start_time']
+    power = power * state['sign']
+    begin = np.maximum(np.arange(len(time)) - points + 1, 0)
+    smoothed = rolling_mean(power, points)[first - offset :]
+    window_time = ((time + time[begin]) / 2)[first - offset :]
+    new = smoothed[start - first :]
+    state['length'] = length
+    if min(points, length) - 1 >= start:
+        state['initial'] = float(smoothed[min(points, length) - 1 - first])
+    state['stabilized'] = float(smoothed[-1])
+    peak_idx = int(np.argmax(new))
+    if state['peak'] is None or new[peak_idx] > state['peak']:
+        peak_idx += start
+        state.update(
+            peak=float(smoothed[peak_idx - first]),
+            peak_index=peak_idx,
+            peak_time=float(time[peak_idx - offset]),
+            time_to_peak=float(window_time[peak_idx - first]),
+            decided=peak_idx,
+            trend_start=None,
+            **dict.fromkeys(STABILITY_THRESHOLDS),
+        )
+
+    # the maximum of the window averages over the following window falls below a threshold
+    # once they stay below it for a whole window, this is decided for complete windows only
+    decided = state['decided']
+    last = length - points
+    if last >= decided:
+        upcoming_max = rolling_max(smoothed[decided - first :], points)[: last - decided + 1]
+        for key, fraction in STABILITY_THRESHOLDS.items():
+            if state[key] is not None:
+                continue
+            below = np.flatnonzero(upcoming_max < fraction * state['peak'])
+            if len(below):
+                state[key] = float(window_time[decided - first + below[0]])
+        state['decided'] = last + 1
+
+    # sums of the linear fit to the stable part of the run, the points it moved beyond are
+    # subtracted again
+    reference = state['time_to_peak']
+    if state['trend_start'] is None:
+        trend_start = state['peak_index']
+        sums = _trend_sums(time[trend_start - offset :], power[trend_start - offset :], reference)
+    else:
+        trend_start = state['trend_start']
+        sums = np.array(state['trend_sums']) + _trend_sums(
+            time[start - offset :], power[start - offset :], reference
+        )
+    threshold = time[-1] - STABLE_FRACTION * (time[-1] - state['peak_time'])
+    block = max(length - start, 1)
+    while trend_start < length:
+        block_time, block_power = read(trend_start, min(trend_start + block, length))
+        block_time = block_time - state['start_time']
+        moved = int(np.searchsorted(block_time, threshold))
+        sums = sums - _trend_sums(block_time[:moved], block_power[:moved] * state['sign'], reference)
+        trend_start += moved
+        if moved < len(block_time):
+            break
+    state['trend_start'] = trend_start
+    state['trend_sums'] = sums.tolist()
+    return state
+
+
+def stability_metrics(state, intensity=100.0):
+    """
+    Returns the metrics of compute_stability_metrics from a state of update_stability_state,
+    the stabilized efficiency is given in % of the light `intensity` in mW/cm^2.
+    """
+    metrics = dict.fromkeys(STABILITY_METRICS, np.nan)
+    metrics['window'] = state['window']
+    if state['length'] < 2:
+        return metrics
+
+    peak = state['peak']
+    metrics.update(
+        initial_power_density=state['initial'],
+        peak_power_density=peak,
+        time_to_peak=state['time_to_peak'],
+        stabilized_power_density=state['stabilized'],
+        stabilized_efficiency=state['stabilized'] / intensity * 100,
+    )
+    for key in STABILITY_THRESHOLDS:
+        if state[key] is not None:
+            metrics[key] = state[key]
+    count, sum_t, sum_tt, sum_y, sum_ty = state['trend_sums']
+    var_t = sum_tt - sum_t**2 / count if count else 0.0
+    if count >= 2 and peak > 0 and var_t > 0:
+        # the times are counted from the peak window
+        slope = (sum_ty - sum_t * sum_y / count) / var_t
+        metrics['degradation_rate'] = slope / peak
+        metrics['burn_in_loss'] = 1 - (sum_y - slope * sum_t) / count / peak
+    return {key: float(value) for key, value in metrics.items()}
+
+
+def compute_stability_metrics(time, power_density, window=STABILITY_WINDOW, intensity=100.0):
+    """
+    Computes the stability metrics of an MPP tracking run.
+
+    The power density is counted positive and averaged over trailing windows of `window`
+    time units, which span the number of points the window takes at the median time step of
+    the first STABILITY_SAMPLE points. From the averaged power
+    - initial_power_density is the first complete window average and peak_power_density the
+      highest one, reached at time_to_peak,
+    - stabilized_power_density is the average of the last window and stabilized_efficiency
+      that in % of the light intensity in mW/cm^2,
+    - t95, t90 and t80 are the first times after the peak from which the window averages stay
+      below 95, 90 and 80 % of the peak for a whole window, NaN if that has not happened
+      within the complete windows of the run,
+    - degradation_rate is the relative slope of a linear fit to the stable last part of the
+      run after the peak and burn_in_loss the relative drop from the peak to the fit
+      extrapolated back to the peak.
+    Times are counted from the first point, window averages count at the middle of their
+    window. Returns a dict of floats, NaN if not defined. Growing runs can be continued with
+    update_stability_state instead.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    power = np.asarray(power_density, dtype=np.float64)
+    finite = np.isfinite(time) & np.isfinite(power)
+    time, power = time[finite], power[finite]
+    state = update_stability_state(
+        None, lambda start, stop: (time[start:stop], power[start:stop]), len(time), window
+    )
+    return stability_metrics(state, intensity)
+
+
+def voltage_steps(voltage):
+    """Returns the indices i of the voltage changes from point i to i + 1 and their sizes."""
+    steps = np.diff(np.asarray(voltage, dtype=np.float64))
+    idx = np.flatnonzero(np.abs(steps) > STEP_TOLERANCE)
+    return idx, steps[idx]
+
+
+def find_step_size(voltage):
+    """
+    Returns the median size of the voltage perturbations over the whole trace, NaN if the
+    voltage never changes, e.g. in a run that just started.
+    """
+    steps = voltage_steps(voltage)[1]
+    if not len(steps):
+        return float('nan')
+    return float(np.median(np.abs(steps)))
+
+
+def _histogram_add(histogram, values):
+    """
+    Adds values to a histogram with logarithmic bins of the relative width
+    HISTOGRAM_BIN_WIDTH, given as lists of the bins, the counts and the sums of their values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return histogram
+    bins = np.floor(
+        np.log(np.maximum(values, np.finfo(np.float64).tiny)) / np.log1p(HISTOGRAM_BIN_WIDTH)
+    ).astype(np.int64)
+    bins, inverse = np.unique(np.concatenate([histogram[0], bins]), return_inverse=True)
+    counts = np.bincount(inverse, np.concatenate([histogram[1], np.ones(len(values))]))
+    sums = np.bincount(inverse, np.concatenate([histogram[2], values]))
+    return [bins.tolist(), counts.astype(np.int64).tolist(), sums.tolist()]
+
+
+def _histogram_median(histogram):
+    """Median of a histogram of _histogram_add, as the mean of the values of its bin."""
+    counts = np.asarray(histogram[1], dtype=np.int64)
+    if not len(counts):
+        return float('nan')
+    means = np.asarray(histogram[2]) / counts
+    cumulative = np.cumsum(counts)
+    ranks = [(cumulative[-1] - 1) // 2, cumulative[-1] // 2]
+    return float(means[np.searchsorted(cumulative, ranks, side='right')].mean())
+
+
+def _new_tracking_state(stuck_factor, lost_track_steps):
+    return {
+        'stuck_factor': stuck_factor,
+        'lost_track_steps': lost_track_steps,
+        'length': 0,
+        'start_time': None,
+        'last_time': None,
+        'last_voltage': None,
+        'segment': 0,
+        'restart_gaps': 0.0,
+        'step_count': 0,
+        'step_mean': 0.0,
+        'step_m2': 0.0,
+        'step_min': None,
+        'step_max': None,
+        'step_sizes': [[], [], []],
+        'last_step_sign': 0.0,
+        'last_step_segment': None,
+        'reversals': 0,
+        'last_reversal_voltage': None,
+        'swings': [[], [], []],
+        'run_start': None,
+        'run_end': None,
+        'run_length': 0,
+        'lost_track_start': [],
+        'lost_track_end': [],
+        'marker_index': None,
+        'marker_time': None,
+        'marker_after_step': False,
+        'marker_segment': 0,
+        'intervals': [[], [], []],
+        'hold_start': [],
+        'hold_end': [],
+        'hold_cut': None,
+    }
+
+
+def update_tracking_state(
+    state, time, voltage, restart_index=(), stuck_factor=STUCK_FACTOR, lost_track_steps=LOST_TRACK_STEPS
+):
+    """
+    Continues the state of compute_tracking_metrics with the points `time` and `voltage` that
+    follow the ones of `state`, a new state is started without a `state`. The tracking is
+    restarted at the points in `restart_index`, counted from the first new point.
+
+    Only the new points are processed. The state keeps the last point, step, reversal, run of
+    steps and point the voltage changed at, histograms for the medians and the holds that are
+    longer than HOLD_FRACTION stuck thresholds, as the threshold follows the step interval.
+    Returns None if the step interval shrank so much that holds below that were dropped, the
+    whole trace has then to be processed again. Otherwise returns a dict of JSON types.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    voltage = np.asarray(voltage, dtype=np.float64)
+    if state is None:
+        state = _new_tracking_state(stuck_factor, lost_track_steps)
+    elif (state['stuck_factor'], state['lost_track_steps']) != (stuck_factor, lost_track_steps):
+        return None
+    else:
+        state = dict(state)
+    if not len(time):
+        return state
+
+    # the last stored point is prepended to find the steps and holds across the new points
+    fresh = state['length'] == 0
+    shift = 0 if fresh else 1
+    if fresh:
+        state['start_time'] = float(time[0])
+    else:
+        time = np.concatenate([[state['last_time']], time])
+        voltage = np.concatenate([[state['last_voltage']], voltage])
+    restarts = np.asarray(restart_index, dtype=np.int64) + shift
+    restarts = restarts[restarts > 0]
+    segment = np.zeros(len(time), dtype=np.int64)
+    segment[restarts] = 1
+    segment = state['segment'] + np.cumsum(segment)
+    state['restart_gaps'] += float(np.sum(time[restarts] - time[restarts - 1]))
+
+    idx, steps = voltage_steps(voltage)
+    within = segment[idx] == segment[idx + 1]
+    idx, steps = idx[within], steps[within]
+    if len(steps):
+        # mean and squared deviations of the step sizes are merged with the stored ones
+        sizes = np.abs(steps)
+        count = state['step_count'] + len(sizes)
+        delta = sizes.mean() - state['step_mean']
+        state.update(
+            step_count=count,
+            step_mean=state['step_mean'] + delta * len(sizes) / count,
+            step_m2=state['step_m2']
+            + np.sum((sizes - sizes.mean()) ** 2)
+            + delta**2 * state['step_count'] * len(sizes) / count,
+            step_min=float(min(sizes.min(), state['step_min'] if state['step_count'] else np.inf)),
+            step_max=float(max(sizes.max(), state['step_max'] if state['step_count'] else -np.inf)),
+            step_sizes=_histogram_add(state['step_sizes'], sizes),
+        )
+
+        # reversals and runs of steps in the same direction, continuing the stored step
+        signs = np.sign(steps)
+        step_segment = segment[idx]
+        previous_segment = -1 if state['last_step_segment'] is None else state['last_step_segment']
+        turns = np.diff(np.concatenate([[state['last_step_sign']], signs])) != 0
+        same_segment = np.diff(np.concatenate([[previous_segment], step_segment])) == 0
+        reversal_voltage = voltage[idx[turns & same_segment]]
+        state['reversals'] += len(reversal_voltage)
+        if len(reversal_voltage):
+            if state['last_reversal_voltage'] is not None:
+                reversal_voltage = np.concatenate([[state['last_reversal_voltage']], reversal_voltage])
+            state['swings'] = _histogram_add(state['swings'], np.abs(np.diff(reversal_voltage)))
+            state['last_reversal_voltage'] = float(reversal_voltage[-1])
+
+        step_start, step_end = time[idx], time[idx + 1]
+        run_start = np.flatnonzero(turns | ~same_segment)
+        if len(run_start):
+            lost_start, lost_end = [], []
+            if state['run_length'] + run_start[0] >= lost_track_steps:
+                lost_start.append(state['run_start'])
+                lost_end.append(step_end[run_start[0] - 1] if run_start[0] else state['run_end'])
+            run_length = np.diff(np.append(run_start, len(steps)))
+            lost = run_length[:-1] >= lost_track_steps
+            lost_start.extend(step_start[run_start[:-1][lost]])
+            lost_end.extend(step_end[run_start[1:][lost] - 1])
+            state['lost_track_start'] = state['lost_track_start'] + [float(value) for value in lost_start]
+            state['lost_track_end'] = state['lost_track_end'] + [float(value) for value in lost_end]
+            state['run_start'] = float(step_start[run_start[-1]])
+            state['run_length'] = int(run_length[-1])
+        else:
+            state['run_length'] += len(steps)
+        state.update(
+            run_end=float(step_end[-1]),
+            last_step_sign=float(signs[-1]),
+            last_step_segment=int(step_segment[-1]),
+        )
+
+    # the voltage is constant between the points after consecutive steps and up to the
+    # beginning and the end of every segment, the end of the trace is not stored
+    after_step = np.zeros(len(time), dtype=bool)
+    after_step[idx + 1] = True
+    marker = after_step.copy()
+    marker[restarts] = True
+    marker[restarts - 1] = True
+    # the first point of the trace is a marker, the stored last point may be one already
+    marker[0] = fresh or (marker[0] and state['marker_index'] != state['length'] - 1)
+    markers = np.flatnonzero(marker)
+    marker_time = time[markers]
+    marker_after_step = after_step[markers]
+    marker_segment = segment[markers]
+    if not fresh:
+        marker_time = np.concatenate([[state['marker_time']], marker_time])
+        marker_after_step = np.concatenate([[state['marker_after_step']], marker_after_step])
+        marker_segment = np.concatenate([[state['marker_segment']], marker_segment])
+    holds = np.diff(marker_time)
+    held = marker_segment[:-1] == marker_segment[1:]
+    state['intervals'] = _histogram_add(
+        state['intervals'], holds[marker_after_step[:-1] & marker_after_step[1:]]
+    )
+    hold_start = np.concatenate([state['hold_start'], marker_time[:-1][held]])
+    hold_end = np.concatenate([state['hold_end'], marker_time[1:][held]])
+    interval = _histogram_median(state['intervals'])
+    if not np.isnan(interval):
+        if state['hold_cut'] is not None and stuck_factor * interval < state['hold_cut']:
+            return None
+        cut = HOLD_FRACTION * stuck_factor * interval
+        if state['hold_cut'] is None or cut > state['hold_cut']:
+            kept = hold_end - hold_start > cut
+            hold_start, hold_end = hold_start[kept], hold_end[kept]
+            state['hold_cut'] = cut
+    if len(markers):
+        state.update(
+            marker_index=int(state['length'] + markers[-1] - shift),
+            marker_time=float(marker_time[-1]),
+            marker_after_step=bool(marker_after_step[-1]),
+            marker_segment=int(marker_segment[-1]),
+        )
+    state.update(
+        hold_start=hold_start.tolist(),
+        hold_end=hold_end.tolist(),
+        length=state['length'] + len(time) - shift,
+        last_time=float(time[-1]),
+        last_voltage=float(voltage[-1]),
+        segment=int(segment[-1]),
+    )
+    return state
+
+
+def tracking_metrics(state):
+    """Returns the metrics of compute_tracking_metrics from a state of update_tracking_state."""
+    metrics = dict.fromkeys(TRACKING_METRICS, np.nan)
+    periods = {key: np.empty(0) for key in ('stuck_start', 'stuck_end', 'lost_track_start', 'lost_track_end')}
+    if state['length'] < 2:
+        return {**metrics, **periods}
+
+    if state['step_count']:
+        metrics.update(
+            step_size=_histogram_median(state['step_sizes']),
+            step_size_mean=state['step_mean'],
+            step_size_std=np.sqrt(state['step_m2'] / state['step_count']),
+            step_size_min=state['step_min'],
+            step_size_max=state['step_max'],
+        )
+    metrics['step_interval'] = _histogram_median(state['intervals'])
+
+    # the hold up to the end of the trace ends at its last point
+    hold_start = np.array(state['hold_start'])
+    hold_end = np.array(state['hold_end'])
+    if state['marker_index'] != state['length'] - 1:
+        hold_start = np.append(hold_start, state['marker_time'])
+        hold_end = np.append(hold_end, state['last_time'])
+    if not np.isnan(metrics['step_interval']):
+        stuck = hold_end - hold_start > state['stuck_factor'] * metrics['step_interval']
+    else:
+        stuck = np.full(len(hold_start), not state['step_count'])
+    periods['stuck_start'] = hold_start[stuck]
+    periods['stuck_end'] = hold_end[stuck]
+
+    if len(state['swings'][1]):
+        metrics['oscillation_amplitude'] = _histogram_median(state['swings']) / 2
+    duration = state['last_time'] - state['start_time'] - state['restart_gaps']
+    if state['step_count'] and duration > 0:
+        metrics['oscillation_frequency'] = state['reversals'] / 2 / duration
+    periods['lost_track_start'] = np.array(state['lost_track_start'])
+    periods['lost_track_end'] = np.array(state['lost_track_end'])
+    if state['run_length'] >= state['lost_track_steps']:
+        periods['lost_track_start'] = np.append(periods['lost_track_start'], state['run_start'])
+        periods['lost_track_end'] = np.append(periods['lost_track_end'], state['run_end'])
+
+    metrics['stuck_time'] = np.sum(periods['stuck_end'] - periods['stuck_start'])
+    metrics['lost_track_time'] = np.sum(periods['lost_track_end'] - periods['lost_track_start'])
+    return {**{key: float(value) for key, value in metrics.items()}, **periods}
+
+
+def compute_tracking_metrics(
+    time, voltage, restart_index=(), stuck_factor=STUCK_FACTOR, lost_track_steps=LOST_TRACK_STEPS
+):
+    """
+    Computes how the perturb and observe tracking of an MPP tracking run behaved.
+
+    From the voltage changes between consecutive points
+    - step_size is the median size of the perturbations, step_size_mean, step_size_std,
+      step_size_min and step_size_max describe their distribution and step_interval is the
+      median time between them,
+    - oscillation_amplitude is half the median voltage swing between reversals of the step
+      direction and oscillation_frequency the number of full oscillations per time unit,
+    - stuck periods hold the voltage more than `stuck_factor` step intervals,
+    - lost track periods step the voltage `lost_track_steps` or more times in the same
+      direction instead of oscillating around the maximum power point.
+    stuck_time and lost_track_time are the total duration of these periods, their start and
+    end times are returned as arrays under stuck_start, stuck_end, lost_track_start and
+    lost_track_end. The tracking is restarted at the points in `restart_index`, changes and
+    periods never span a restart. The medians are taken from histograms with logarithmic bins,
+    see HISTOGRAM_BIN_WIDTH. Returns a dict of floats, NaN if not defined, and arrays. Growing
+    runs can be continued with update_tracking_state instead.
+    """
+    return tracking_metrics(
+        update_tracking_state(None, time, voltage, restart_index, stuck_factor, lost_track_steps)
+    )
+
+
+def _linear_residuals(count, sum_t, sum_tt, sum_y, sum_ty, sum_yy):
+    # squared residuals of least-squares lines from the sums over the fitted points
+    var_t = sum_tt - sum_t**2 / count
+    cov = sum_ty - sum_t * sum_y / count
+    residuals = sum_yy - sum_y**2 / count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        residuals = residuals - np.where(var_t > 0, cov**2 / var_t, 0.0)
+    return np.maximum(residuals, 0.0)
+
+
+def _best_split(time, power, start, stop, min_size):
+    """
+    Returns the decrease of the squared residuals by fitting two lines instead of one to the
+    points start to stop, and the split index, or None if the segment is too short. All split
+    points are evaluated at once from cumulative sums.
+    """
+    if stop - start < 2 * min_size:
+        return None
+    t = time[start:stop] - time[start:stop].mean()
+    scale = np.abs(t).max()
+    t = t / scale if scale > 0 else t
+    y = power[start:stop] - power[start:stop].mean()
+    sums = [np.cumsum(values) for values in (t, t * t, y, t * y, y * y)]
+    total = _linear_residuals(len(y), *(values[-1] for values in sums))
+    split = np.arange(min_size, len(y) - min_size + 1)
+    left = [values[split - 1] for values in sums]
+    right = [values[-1] - values[split - 1] for values in sums]
+    residuals = _linear_residuals(split, *left) + _linear_residuals(len(y) - split, *right)
+    best = int(np.argmin(residuals))
+    return float(total - residuals[best]), start + int(split[best])
+
+
+def detect_change_points(
+    time,
+    power,
+    min_size=CHANGE_POINT_MIN_SIZE,
+    max_segments=CHANGE_POINT_MAX_SEGMENTS,
+    penalty=CHANGE_POINT_PENALTY,
+):
+    """
+    Splits a power trace into segments with a linear trend each, e.g. burn-in, plateau and
+    linear degradation, or drop-outs of the setup.
+
+    Binary segmentation: the segment whose split into two fitted lines reduces the squared
+    residuals most is split, as long as the reduction exceeds `penalty` times the noise
+    variance times the log of the number of points. The noise variance is estimated from the
+    differences of consecutive points. The change points are then refined between their
+    neighbours. Every split point of a segment is evaluated in one pass over cumulative sums,
+    so the cost grows linearly with the points for a bounded number of segments. Points with
+    undefined values are skipped.
+
+    Returns the start and end times, the slope and the mean power of every segment as arrays.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    power = np.asarray(power, dtype=np.float64)
+    valid = np.isfinite(time) & np.isfinite(power)
+    time, power = time[valid], power[valid]
+    if not len(time):
+        return {name: np.empty(0) for name in ('segment_start', 'segment_end', 'slope', 'mean_power_density')}
+
+    differences = np.diff(power)
+    noise = (
+        (1.4826 * np.median(np.abs(differences - np.median(differences)))) ** 2 / 2 if len(power) > 1 else 0
+    )
+    # exactly linear segments leave only rounding errors of the sums
+    noise = max(noise, np.finfo(np.float64).eps * len(power) * np.mean(power**2))
+    threshold = penalty * noise * np.log(len(power))
+
+    boundaries = [0, len(power)]
+    candidates = []
+
+    def push(start, stop):
+        split = _best_split(time, power, start, stop, min_size)
+        if split is not None:
+            heapq.heappush(candidates, (-split[0], start, stop, split[1]))
+
+    push(0, len(power))
+    while candidates and len(boundaries) - 1 < max_segments:
+        decrease, start, stop, split = heapq.heappop(candidates)
+        if -decrease <= threshold:
+            break
+        boundaries.append(split)
+        push(start, split)
+        push(split, stop)
+
+    # a first split between nested regimes stays, so every change point is moved to the best
+    # split between its neighbours or dropped if that does not pay off, until none changes
+    boundaries.sort()
+    for _ in range(max_segments):
+        changed = False
+        i = 1
+        while i < len(boundaries) - 1:
+            split = _best_split(time, power, boundaries[i - 1], boundaries[i + 1], min_size)
+            if split is None or split[0] <= threshold:
+                del boundaries[i]
+                changed = True
+                continue
+            changed |= split[1] != boundaries[i]
+            boundaries[i] = split[1]
+            i += 1
+        if not changed:
+            break
+
+    segments = {name: [] for name in ('segment_start', 'segment_end', 'slope', 'mean_power_density')}
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        t, y = time[start:stop], power[start:stop]
+        var_t = np.sum((t - t.mean()) ** 2)
+        segments['segment_start'].append(t[0])
+        segments['segment_end'].append(t[-1])
+        segments['slope'].append(np.sum((t - t.mean()) * (y - y.mean())) / var_t if var_t > 0 else 0.0)
+        segments['mean_power_density'].append(y.mean())
+    return {name: np.array(values) for name, values in segments.items()}
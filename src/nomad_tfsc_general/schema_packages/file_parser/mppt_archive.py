@@ -0,0 +1,197 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+from baseclasses.solar_energy import MPPTracking
+
+from nomad_tfsc_general.schema_packages.file_parser.decimation import pyramid_window
+from nomad_tfsc_general.schema_packages.file_parser.hdf5_storage import (
+    open_hdf5_dataset,
+    open_hdf5_file,
+    write_hdf5_arrays,
+)
+
+# traces of an MPP tracking, the ones the pyramid summarizes and the arrays of its levels
+MPPT_ARRAYS = ('time', 'voltage', 'current_density', 'power_density')
+PYRAMID_ARRAYS = ('power_density', 'voltage', 'current_density')
+LEVEL_ARRAYS = ('time', *PYRAMID_ARRAYS)
+
+
+def _set_arrays(section, arrays, names, references, group):
+    for name in names:
+        reference = references.get(f'{group}/{name}')
+        setattr(section, name, None if reference else arrays[name])
+        setattr(section, f'{name}_hdf5', reference)
+
+
+def _write_hdf5(archive, file_name, arrays, pyramid, start=0):
+    """
+    Writes the traces and the pyramid levels into an HDF5 file of the upload in one pass.
+    With a `start` the arrays hold the points from there on and the levels the recomputed
+    buckets of extend_pyramid from their `start` on, the datasets are extended with them.
+    """
+    datasets = {f'/mppt/{name}': arrays[name] for name in MPPT_ARRAYS}
+    starts = dict.fromkeys(datasets, start)
+    for level in pyramid:
+        group = f'/mppt/pyramid/{level["bucket_size"]}'
+        for name in LEVEL_ARRAYS:
+            datasets[f'{group}/{name}'] = level[name]
+            starts[f'{group}/{name}'] = level.get('start', 0)
+    units = {path: getattr(MPPTracking, path.rsplit('/', 1)[-1]).unit for path in datasets}
+    return write_hdf5_arrays(archive, file_name, datasets, units, starts=starts if start else None)
+
+
+def _set_mppt_archive(arrays, pyramid, mppt, level_class, references):
+    _set_arrays(mppt, arrays, MPPT_ARRAYS, references, '/mppt')
+    mppt.pyramid = []
+    for level in pyramid:
+        section = level_class(bucket_size=level['bucket_size'])
+        _set_arrays(section, level, LEVEL_ARRAYS, references, f'/mppt/pyramid/{level["bucket_size"]}')
+        mppt.pyramid.append(section)
+
+
+def get_mppt_archive(arrays, pyramid, mppt, level_class, archive, file_name=None):
+    """
+    Sets the traces and the pyramid levels of build_pyramid on an MPP tracking section. With a
+    `file_name` all arrays are written into that HDF5 file of the upload in one pass and the
+    sections reference the datasets instead of holding the arrays.
+    """
+    references = _write_hdf5(archive, file_name, arrays, pyramid) if file_name else {}
+    _set_mppt_archive(arrays, pyramid, mppt, level_class, references)
+
+
+def _join_arrays(section, arrays, names, start, archive):
+    stored = _read_arrays(section, names, archive, slice(start))
+    return {name: np.concatenate([stored[name], arrays[name]]) for name in names}
+
+
+def append_mppt_archive(arrays, start, pyramid, mppt, level_class, archive):
+    """
+    Appends the points `arrays` to an MPP tracking section whose traces held `start` points,
+    together with the recomputed buckets of extend_pyramid. If the section references an HDF5
+    file only these are written to it, otherwise they are joined with the arrays the section
+    holds.
+    """
+    file_name = mppt.time_hdf5.split('#', 1)[0] if mppt.time_hdf5 else None
+    if file_name:
+        references = _write_hdf5(archive, file_name, arrays, pyramid, start)
+    else:
+        references = {}
+        arrays = _join_arrays(mppt, arrays, MPPT_ARRAYS, start, archive)
+        stored = {level.bucket_size: level for level in mppt.pyramid}
+        pyramid = [
+            {
+                'bucket_size': level['bucket_size'],
+                **(
+                    _join_arrays(stored[level['bucket_size']], level, LEVEL_ARRAYS, level['start'], archive)
+                    if level['start']
+                    else {name: level[name] for name in LEVEL_ARRAYS}
+                ),
+            }
+            for level in pyramid
+        ]
+    _set_mppt_archive(arrays, pyramid, mppt, level_class, references)
+
+
+def _read_arrays(section, names, archive, selection=slice(None)):
+    """
+    Reads the `selection` of the arrays `names` of a section, arrays stored in an HDF5 file
+    are read from there and every file is opened once.
+    """
+    arrays = {}
+    files = {}
+    for name in names:
+        reference = getattr(section, f'{name}_hdf5')
+        if reference:
+            file_name, path = reference.split('#', 1)
+            files.setdefault(file_name, []).append((name, path))
+            continue
+        values = getattr(section, name)
+        values = np.empty(0) if values is None else getattr(values, 'magnitude', values)
+        arrays[name] = np.asarray(values, dtype=np.float64)[selection]
+    for file_name, paths in files.items():
+        with open_hdf5_file(archive, file_name) as f:
+            for name, path in paths:
+                arrays[name] = f[path][selection]
+    return arrays
+
+
+def mppt_archive_length(mppt, archive):
+    """Returns the number of points of the traces stored in an MPP tracking section."""
+    if mppt.time_hdf5:
+        with open_hdf5_dataset(archive, mppt.time_hdf5) as dataset:
+            return len(dataset)
+    return 0 if mppt.time is None else len(mppt.time)
+
+
+def read_mppt_points(mppt, archive, start=0, stop=None, names=MPPT_ARRAYS):
+    """
+    Returns the points start to stop of the traces `names` stored in an MPP tracking section,
+    in the units of its quantities. Arrays stored in an HDF5 file are sliced there.
+    """
+    return _read_arrays(mppt, names, archive, slice(start, stop))
+
+
+def read_mppt_pyramid_tail(mppt, archive, start):
+    """
+    Returns the stored pyramid levels of an MPP tracking section as extend_pyramid needs them
+    to append points to the first `start` ones, from the bucket before the one holding point
+    `start` on. The index of the first bucket of every level is stored as its `start`.
+    """
+    levels = []
+    for level in mppt.pyramid:
+        first = max(start // level.bucket_size - 1, 0)
+        levels.append(
+            {
+                'bucket_size': level.bucket_size,
+                'start': first,
+                **_read_arrays(level, LEVEL_ARRAYS, archive, slice(first, None)),
+            }
+        )
+    return levels
+
+
+def read_mppt_overview(mppt, archive, length, width):
+    """
+    Returns an overview of the `length` points of the traces stored in an MPP tracking
+    section with at most `width` buckets, see pyramid_window, and the bucket size. The
+    overview is the pyramid level as a dict of its arrays or, for short traces, the raw points
+    with a bucket size of None.
+    """
+    window = pyramid_window([{'bucket_size': level.bucket_size} for level in mppt.pyramid], 0, length, width)
+    if window is None:
+        return read_mppt_points(mppt, archive, 0, length), None
+    level = next(level for level in mppt.pyramid if level.bucket_size == window['bucket_size'])
+    return _read_arrays(level, LEVEL_ARRAYS, archive), level.bucket_size
+
+
+def get_mppt_stability_archive(metrics, mppt, stability_class):
+    """Stores the metrics of compute_stability_metrics, undefined ones are left unset."""
+    mppt.stability = stability_class(**{key: value for key, value in metrics.items() if not np.isnan(value)})
+
+
+def get_mppt_tracking_archive(metrics, mppt, tracking_class):
+    """Stores the metrics and periods of compute_tracking_metrics, undefined ones are left unset."""
+    mppt.tracking_quality = tracking_class(
+        **{key: value for key, value in metrics.items() if np.ndim(value) or not np.isnan(value)}
+    )
+
+
+def get_mppt_change_points_archive(segments, mppt, change_points_class):
+    """Stores the segments of detect_change_points."""
+    mppt.change_points = change_points_class(**segments)
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 
+import datetime
+import os
 from io import StringIO
 
 import numpy as np
 import pandas as pd
 from baseclasses.helper.utilities import convert_datetime
 
+from nomad_tfsc_general.schema_packages.file_parser.mppt_analysis import find_step_size
+from nomad_tfsc_general.schema_packages.file_parser.raw_file import MappedText
+
 """
 Created on Thur Feb  19 10:00:00 2026
 
@@ -20,6 +25,18 @@ MPPT measurement of the best pixel as per the following protocol:
 4.Measure IV-sweep for the best pixel 3rd time
 """
 
+# Bump when the output of the parsers changes, cached parse results are keyed by it.
+MPPT_PARSER_VERSION = 3
+
+# Rows the C parser reads per chunk, bounds the size of the intermediate data frames.
+MPPT_CHUNK_ROWS = 500_000
+
+# Location 1 files list time, current density, voltage and power, these are the columns of
+# time, voltage, current density and power, the order in which the arrays are returned
+LOCATION_1_COLUMNS = [0, 2, 1, 3]
+# columns of Location 2 files, in the order the arrays are returned
+MPPT_COLUMNS = ['Time (s)', 'Voltage (V)', 'Current density (mA/cm2)', 'Power (mW/cm2)']
+
 
 def get_value(val):
     try:
@@ -28,55 +45,152 @@ def get_value(val):
         return None
 
 
-def find_step_size(df_curve):
-    for i in range(7):
-        dV = abs(df_curve.iloc[i, 1] - df_curve.iloc[i + 1, 1])
-        if dV != 0:
-            return dV
-    return ValueError('No non-zero voltage step found in the first 7 rows')
+def read_numeric_columns(filedata, usecols, chunk_rows=MPPT_CHUNK_ROWS):
+    """
+    Reads the tab separated numeric rows that follow the header of a stream with the C parser
+    of pandas, fields that are no numbers become NaN. Returns a float64 matrix with one row per
+    column in `usecols`, in that order, so every column is a contiguous array. The chunks are
+    copied into a preallocated matrix whose capacity is doubled when it is full, intermediate
+    data frames never exceed `chunk_rows` rows. The bytes of a MappedText are read by the C
+    parser directly.
+    """
+    encoding = None
+    if isinstance(filedata, MappedText):
+        filedata, encoding = filedata.mapped, filedata.encoding
+    matrix = np.empty((len(usecols), 0))
+    rows = 0
+    with pd.read_csv(
+        filedata,
+        sep='\t',
+        header=None,
+        usecols=usecols,
+        engine='c',
+        chunksize=chunk_rows,
+        encoding=encoding,
+        encoding_errors='replace',
+    ) as reader:
+        for chunk in reader:
+            columns = chunk[usecols]
+            if any(dtype.kind == 'O' for dtype in columns.dtypes):
+                # a row still being written may end in a truncated number, it becomes NaN
+                columns = columns.apply(pd.to_numeric, errors='coerce')
+            values = columns.to_numpy(dtype=np.float64)
+            if rows + len(values) > matrix.shape[1]:
+                grown = np.empty((len(usecols), max(2 * matrix.shape[1], rows + len(values))))
+                grown[:, :rows] = matrix[:, :rows]
+                matrix = grown
+            matrix[:, rows : rows + len(values)] = values.T
+            rows += len(values)
+    return matrix[:, :rows]
+
+
+def mppt_body_columns(filename, header):
+    """
+    Returns the columns of time, voltage, current density and power in the rows of an MPPT
+    file, `header` is its first non-empty line.
+    """
+    if 'MPP' in filename.split('.')[-1]:
+        return LOCATION_1_COLUMNS
+    return [header.strip().split('\t').index(column) for column in MPPT_COLUMNS]
+
+
+def read_mppt_rows(filedata, columns):
+    """
+    Parses the rows of an MPPT file into time, voltage, current density and power, see
+    mppt_body_columns. Rows with missing values, e.g. one still being written, are dropped.
+    """
+    data = read_numeric_columns(filedata, columns)
+    incomplete = np.isnan(data).any(axis=0)
+    if incomplete.any():
+        data = data[:, ~incomplete]
+    return data
+
+
+def read_appended_mppt_rows(f, ingested_size):
+    """
+    Returns the complete rows appended to a binary MPPT file stream after its first
+    `ingested_size` bytes, together with the new ingested size. A row still being written is
+    left for the next call. Returns None if the ingested part does not end with a line end
+    anymore, then the file has to be parsed as a whole.
+    """
+    f.seek(max(ingested_size - 1, 0))
+    data = f.read()
+    f.seek(0)
+    if data[:1] != b'\n':
+        return None
+    complete_size = data.rfind(b'\n')
+    return data[1 : complete_size + 1], ingested_size + complete_size
+
+
+def read_appended_mppt_file(f, ingested_size, filename, encoding='utf-8'):
+    """
+    Incremental counterpart of read_mppt_file for a binary stream of which the first
+    `ingested_size` bytes have been parsed. Returns the appended complete rows as time, voltage,
+    current density and power together with the new ingested size, or None if the file has to
+    be parsed as a whole, see read_appended_mppt_rows.
+    """
+    appended = read_appended_mppt_rows(f, ingested_size)
+    if appended is None:
+        return None
+    rows, ingested_size = appended
+    if not rows:
+        return np.empty((len(MPPT_COLUMNS), 0)), ingested_size
+    header = b''
+    while not header.strip() and (line := f.readline()):
+        header = line
+    f.seek(0)
+    columns = mppt_body_columns(filename, header.decode(encoding, errors='replace'))
+    return read_mppt_rows(StringIO(rows.decode(encoding)), columns), ingested_size
+
+
+def _mppt_dict(time, voltage, current_density, power):
+    return {
+        'total_time': get_value(time[-1]),
+        'step_size': find_step_size(voltage),
+        'time_data': time,
+        'voltage_data': voltage,
+        'current_density_data': current_density,
+        'power_data': power,
+    }
 
 
 def read_mppt_data_location_1(filedata, filename=None):
-    date = filedata.split('\t')[0].split('\n')[0].split(' ')[-2]
-    time = filedata.split('\t')[0].split('\n')[0].split(' ')[-1]
+    # the first line holds the start of the measurement, the numeric data follows
+    date, time = filedata.readline().split()[-2:]
 
     # Normalize date format: convert "1-10-2026" to "01-10-2026"
     date_parts = date.split('-')
     date = '-'.join(part.zfill(2) if i < 2 else part for i, part in enumerate(date_parts))
 
-    df_curve = pd.read_csv(
-        StringIO(filedata),
-        sep='\t',
-        header=None,
-        skiprows=1,
-        names=['Time (s)', 'Current density (mA/cm2)', 'Voltage (V)', 'Power (mW/cm2)'],
-    )
+    mppt_dict = {'datetime': convert_datetime(f'{date} {time}', '%d-%m-%Y %H:%M:%S')}
+    mppt_dict.update(_mppt_dict(*read_mppt_rows(filedata, LOCATION_1_COLUMNS)))
+    return mppt_dict
 
-    # changing column order for consistency and for find_step_size function
-    df_curve = df_curve[['Time (s)', 'Voltage (V)', 'Current density (mA/cm2)', 'Power (mW/cm2)']]
 
-    mppt_dict = {}
+def mppt_file_start(filename):
+    """
+    Returns the start of the measurement in a Location 2 file name ending in
+    `_YYYYMMDD_HHMMSS.mpp.txt` as datetime, None for names without it.
+    """
+    parts = os.path.basename(filename).split('.')[0].split('_')
+    if len(parts) < 3:
+        return None
+    try:
+        return datetime.datetime.strptime(f'{parts[-2]} {parts[-1]}', '%Y%m%d %H%M%S')
+    except ValueError:
+        return None
 
-    mppt_dict['datetime'] = convert_datetime(f'{date} {time}', '%d-%m-%Y %H:%M:%S')
-    mppt_dict['total_time'] = get_value(df_curve.iloc[-1, 0])
-    mppt_dict['step_size'] = find_step_size(df_curve)
-    mppt_dict['time_data'] = np.array(df_curve['Time (s)'], dtype=np.float64)
-    mppt_dict['voltage_data'] = np.array(df_curve['Voltage (V)'], dtype=np.float64)
-    mppt_dict['current_density_data'] = np.array(df_curve['Current density (mA/cm2)'], dtype=np.float64)
-    mppt_dict['power_data'] = np.array(df_curve['Power (mW/cm2)'], dtype=np.float64)
 
-    return mppt_dict
+def mppt_series_id(filename):
+    """Returns the name of an MPPT file up to the start of the measurement, see mppt_file_start."""
+    return '_'.join(os.path.basename(filename).split('.')[0].split('_')[:-2])
 
 
 def read_mppt_data_location_2(filedata, filename=None):
-    df_curve = pd.read_csv(
-        StringIO(filedata),
-        sep='\t',
-        encoding='unicode_escape',
-        engine='python',
-    )
-
-    df_curve = df_curve.dropna(how='any', axis=0)
+    header = ''
+    while not header.strip():
+        header = filedata.readline()
+    data = read_mppt_rows(filedata, mppt_body_columns(filename or '', header))
 
     mppt_dict = {}
 
@@ -85,21 +199,98 @@ def read_mppt_data_location_2(filedata, filename=None):
         date = filename.split('_')[-2]
         time = filename.split('_')[-1].split('.')[0]
         mppt_dict['datetime'] = convert_datetime(f'{date} {time}', '%Y%m%d %H%M%S')
-    mppt_dict['total_time'] = get_value(df_curve.iloc[-1, 0])
-    mppt_dict['step_size'] = find_step_size(df_curve)
+    mppt_dict.update(_mppt_dict(*data))
+    return mppt_dict
 
-    mppt_dict['time_data'] = np.array(df_curve['Time (s)'], dtype=np.float64)
-    mppt_dict['voltage_data'] = np.array(df_curve['Voltage (V)'], dtype=np.float64)
-    mppt_dict['current_density_data'] = np.array(df_curve['Current density (mA/cm2)'], dtype=np.float64)
-    mppt_dict['power_data'] = np.array(df_curve['Power (mW/cm2)'], dtype=np.float64)
 
-    return mppt_dict
+def _peek_first_line(filedata):
+    position = filedata.tell()
+    line = ''
+    while not line.strip():
+        line = filedata.readline()
+        if not line:
+            break
+    filedata.seek(position)
+    return line.strip()
 
 
 def read_mppt_file(filedata, filename):
+    """
+    Parses an MPPT file given as a string or as a text stream.
+
+    Streams are consumed incrementally, so no copy of the whole file content is needed.
+    """
+    if isinstance(filedata, str):
+        filedata = StringIO(filedata)
+    elif not filedata.seekable():
+        filedata = StringIO(filedata.read())
+
     if 'MPP' in filename.split('.')[-1]:
         return read_mppt_data_location_1(filedata, filename)
-    elif filedata.strip().split('\t')[0] == 'Time (s)':
+    elif _peek_first_line(filedata).split('\t')[0] == 'Time (s)':
         return read_mppt_data_location_2(filedata, filename)
     else:
         raise TypeError('mppt file not recognized')
+
+
+def stitch_mppt_data(files):
+    """
+    Joins the parsed MPPT files of one device that were measured one after the other into a
+    continuous series. `files` holds the name and the dict of read_mppt_file of every file,
+    the names carry the start of the measurement, see mppt_file_start. The times of each file
+    are shifted by its start relative to the start of the first file. Returns the dict of
+    read_mppt_file for the whole series together with the index of the first point and the
+    start time of every file after the first as restart markers.
+    """
+    files = sorted(files, key=lambda file: mppt_file_start(file[0]))
+    first_start = mppt_file_start(files[0][0])
+    offsets = np.array([(mppt_file_start(name) - first_start).total_seconds() for name, _ in files])
+    stitched = {
+        key: np.concatenate([data[key] for _, data in files])
+        for key in ('voltage_data', 'current_density_data', 'power_data')
+    }
+    stitched['time_data'] = np.concatenate(
+        [data['time_data'] + offset for offset, (_, data) in zip(offsets, files)]
+    )
+    stitched.update(
+        datetime=files[0][1]['datetime'],
+        total_time=get_value(stitched['time_data'][-1]),
+        step_size=find_step_size(stitched['voltage_data']),
+        restart_index=np.cumsum([len(data['time_data']) for _, data in files])[:-1],
+        restart_time=offsets[1:],
+        files=[name for name, _ in files],
+    )
+    return stitched
+
+
+def group_protocol_runs(jv_files, mppt_files):
+    """
+    Splits the JV and MPPT files of one device into runs of the protocol above, the names
+    carry the start of the measurement, see mppt_file_start. Each MPPT file forms a run with
+    up to two JV files measured before it, the sweeps of all pixels and of the best pixel, and
+    the next JV file as the final sweep. Returns one dict per run with the file names under
+    jv_all_pixels, jv_before, mppt and jv_after, None for missing ones.
+    """
+    files = sorted(
+        [(mppt_file_start(name), 0, name) for name in jv_files]
+        + [(mppt_file_start(name), 1, name) for name in mppt_files]
+    )
+    runs = []
+    pending = []
+    final_sweep_of = None
+    for _, is_mppt, name in files:
+        if is_mppt:
+            final_sweep_of = {
+                'jv_all_pixels': pending[-2] if len(pending) > 1 else None,
+                'jv_before': pending[-1] if pending else None,
+                'mppt': name,
+                'jv_after': None,
+            }
+            runs.append(final_sweep_of)
+            pending = []
+        elif final_sweep_of is not None:
+            final_sweep_of['jv_after'] = name
+            final_sweep_of = None
+        else:
+            pending.append(name)
+    return runs
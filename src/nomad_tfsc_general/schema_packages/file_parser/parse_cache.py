@@ -0,0 +1,223 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Content-addressed on-disk cache for parsed measurement files.
+
+Entries are keyed by the hash of the raw file content and the name and version of the
+parser. Parse results (nested dicts and lists of arrays, numbers and strings) are stored as
+uncompressed .npz files: every array is written as binary data and the remaining structure
+as a small JSON document. The cache is bounded in size, the least recently used entries
+are evicted first.
+"""
+
+import contextlib
+import datetime
+import hashlib
+import importlib.metadata
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+PACKAGE_ENTRY_POINT_ID = 'nomad_tfsc_general.schema_packages:tfsc_general_package'
+DEFAULT_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), 'nomad_tfsc_general_parse_cache')
+DEFAULT_CACHE_SIZE = 512 * 1024**2
+
+_META_KEY = '__meta__'
+_CHUNK_SIZE = 1024**2
+
+# classes with to_dict/from_dict methods that can be stored in the cache, by name
+_CACHEABLE_TYPES = {}
+
+
+class UncacheableError(TypeError):
+    pass
+
+
+def register_cacheable(cls):
+    """Class decorator, instances are cached as the dict returned by their to_dict method."""
+    _CACHEABLE_TYPES[cls.__name__] = cls
+    return cls
+
+
+def hash_file(f):
+    """Returns the sha256 hex digest of a binary stream, read in chunks from its start."""
+    f.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+def _flatten(obj, arrays):
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            raise UncacheableError('object arrays can not be cached')
+        arrays[f'a{len(arrays)}'] = obj
+        return {'__array__': f'a{len(arrays) - 1}'}
+    if isinstance(obj, dict):
+        if not all(isinstance(key, str) for key in obj):
+            raise UncacheableError('only dicts with string keys can be cached')
+        return {'__dict__': {key: _flatten(value, arrays) for key, value in obj.items()}}
+    if isinstance(obj, list | tuple):
+        return {'__list__': [_flatten(value, arrays) for value in obj], 'tuple': isinstance(obj, tuple)}
+    if isinstance(obj, datetime.datetime):
+        return {'__datetime__': obj.isoformat()}
+    if _CACHEABLE_TYPES.get(type(obj).__name__) is type(obj):
+        return {'__object__': type(obj).__name__, 'state': _flatten(obj.to_dict(), arrays)}
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if obj is None or isinstance(obj, bool | int | float | str):
+        return obj
+    raise UncacheableError(f'{type(obj).__name__} can not be cached')
+
+
+def _unflatten(obj, arrays):
+    if not isinstance(obj, dict):
+        return obj
+    if '__array__' in obj:
+        return arrays[obj['__array__']]
+    if '__dict__' in obj:
+        return {key: _unflatten(value, arrays) for key, value in obj['__dict__'].items()}
+    if '__list__' in obj:
+        values = [_unflatten(value, arrays) for value in obj['__list__']]
+        return tuple(values) if obj['tuple'] else values
+    if '__object__' in obj:
+        return _CACHEABLE_TYPES[obj['__object__']].from_dict(_unflatten(obj['state'], arrays))
+    return datetime.datetime.fromisoformat(obj['__datetime__'])
+
+
+class ParseCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.max_size > 0
+
+    def key(self, content_hash, parser_name, parser_version, file_name=''):
+        # some parsers read metadata from the file name, so it is part of the key
+        key = f'{content_hash}:{parser_name}:{parser_version}:{os.path.basename(file_name)}'
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            meta = json.loads(arrays.pop(_META_KEY).tobytes().decode())
+            value = _unflatten(meta, arrays)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+            # a truncated or corrupt entry is a miss, it is removed to be written again
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(path)  # mark as recently used
+        return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return False
+        arrays = {}
+        try:
+            meta = _flatten(value, arrays)
+        except UncacheableError:
+            return False
+        arrays[_META_KEY] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first so that concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+
+def get_parse_cache():
+    """Returns the parse cache configured on the TFSC General schema package entry point."""
+    from nomad.config import config
+
+    try:
+        entry_point = config.get_plugin_entry_point(PACKAGE_ENTRY_POINT_ID)
+    except KeyError:
+        return ParseCache()
+    return ParseCache(
+        entry_point.parse_cache_directory or DEFAULT_CACHE_DIRECTORY,
+        entry_point.parse_cache_size,
+    )
+
+
+def package_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def cached_parse(parse_cache, parse, content_hash, parser_name, parser_version, file_name=''):
+    """
+    Returns the cached result of `parse()` for the given file content and parser.
+
+    Results of parsers without a known version are never cached.
+    """
+    if parser_version is None:
+        return parse()
+    key = parse_cache.key(content_hash, parser_name, parser_version, file_name)
+    result = parse_cache.get(key)
+    if result is None:
+        result = parse()
+        parse_cache.put(key, result)
+    return result
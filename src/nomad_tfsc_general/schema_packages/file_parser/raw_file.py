@@ -0,0 +1,239 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Access to the raw files of an upload for the parsers.
+
+Files above a size threshold are memory mapped instead of being read through a text stream.
+The parsers then work on the mapped bytes: lines are decoded when they are read, numeric
+bodies are handed to the C parser of pandas as bytes and the tails of files are searched in
+place, so no str copy of a whole large file is made.
+
+The encoding of a raw file is detected from a bounded prefix and remembered per file
+fingerprint, the text is then decoded from the same binary stream that was hashed for the
+parse cache, so every file is opened once.
+
+Entries store the state of the raw file they were parsed from, see check_raw_file, and do not
+parse it again while it is unchanged.
+"""
+
+import io
+import mmap
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from nomad_tfsc_general.schema_packages.file_parser.parse_cache import PACKAGE_ENTRY_POINT_ID, hash_file
+
+DEFAULT_MMAP_THRESHOLD = 64 * 1024**2
+# bytes from the start of a file the encoding is detected from
+ENCODING_SAMPLE_SIZE = 64 * 1024
+# fingerprints of files whose encoding is remembered
+ENCODING_CACHE_SIZE = 1024
+
+_encodings = OrderedDict()
+
+
+class MappedFile(mmap.mmap):
+    """
+    Read-only memory map that can be used like a binary file stream, `fingerprint` is the one
+    of the mapped file.
+    """
+
+    fingerprint = None
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        super().seek(pos, whence)
+        return self.tell()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+
+class MappedText:
+    """
+    Text stream over a MappedFile. Text is decoded when it is read, line ends are translated
+    as in text mode. Parsers can access the bytes of the map directly through `mapped`.
+    """
+
+    def __init__(self, mapped, encoding='utf-8'):
+        self.mapped = mapped
+        self.encoding = encoding
+
+    def decode(self, data):
+        return data.decode(self.encoding, errors='replace').replace('\r\n', '\n')
+
+    def read(self, size=-1):
+        return self.decode(self.mapped.read(size))
+
+    def readline(self):
+        return self.decode(self.mapped.readline())
+
+    def __iter__(self):
+        return iter(self.readline, '')
+
+    def tell(self):
+        return self.mapped.tell()
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        return self.mapped.seek(pos, whence)
+
+    def seekable(self):
+        return True
+
+
+def get_mmap_threshold():
+    """Returns the size from which raw files are memory mapped, see the schema package entry point."""
+    from nomad.config import config
+
+    try:
+        entry_point = config.get_plugin_entry_point(PACKAGE_ENTRY_POINT_ID)
+    except KeyError:
+        return DEFAULT_MMAP_THRESHOLD
+    return entry_point.mmap_threshold
+
+
+def map_file(f, threshold):
+    """
+    Returns a MappedFile of a binary file stream of at least `threshold` bytes, None for
+    smaller files and streams without a file descriptor, e.g. from zipped uploads.
+    """
+    size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    if not size or threshold is None or size < threshold:
+        return None
+    try:
+        mapped = MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, io.UnsupportedOperation):
+        return None
+    mapped.fingerprint = file_fingerprint(f)
+    return mapped
+
+
+def file_fingerprint(f):
+    """
+    Returns device, inode, size and modification time of the file behind a binary stream,
+    None for streams without a file descriptor.
+    """
+    if isinstance(f, MappedFile):
+        return f.fingerprint
+    try:
+        stat = os.fstat(f.fileno())
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def detect_encoding(f, sample_size=ENCODING_SAMPLE_SIZE):
+    """
+    Returns the encoding of a binary stream detected from its first `sample_size` bytes. The
+    result is remembered per file fingerprint, files that did not change are not read again.
+    ASCII is reported as UTF-8, as later bytes beyond the sample may not be ASCII.
+    """
+    from baseclasses.helper.utilities import get_encoding
+
+    fingerprint = file_fingerprint(f)
+    if fingerprint is not None and fingerprint in _encodings:
+        _encodings.move_to_end(fingerprint)
+        return _encodings[fingerprint]
+    f.seek(0)
+    sample = f.read(sample_size)
+    f.seek(0)
+    if len(sample) == sample_size and b'\n' in sample:
+        # a multibyte character may be cut at the end of the sample
+        sample = sample[: sample.rindex(b'\n') + 1]
+    encoding = get_encoding(io.BytesIO(sample)) or 'utf-8'
+    if encoding.lower() == 'ascii':
+        encoding = 'utf-8'
+    if fingerprint is not None:
+        _encodings[fingerprint] = encoding
+        if len(_encodings) > ENCODING_CACHE_SIZE:
+            _encodings.popitem(last=False)
+    return encoding
+
+
+@contextmanager
+def open_raw_file(archive, file_name, threshold=None):
+    """
+    Opens a raw file of the upload for binary reading, large files are memory mapped. The
+    threshold defaults to the configured one.
+    """
+    with archive.m_context.raw_file(file_name, 'br') as f:
+        mapped = map_file(f, get_mmap_threshold() if threshold is None else threshold)
+        if mapped is None:
+            yield f
+            return
+        with mapped:
+            yield mapped
+
+
+@contextmanager
+def decode_raw_file(f, encoding):
+    """
+    Text stream over a binary stream of open_raw_file from its start, the bytes are decoded
+    as they are read. MappedFiles are read through a MappedText.
+    """
+    f.seek(0)
+    if isinstance(f, MappedFile):
+        yield MappedText(f, encoding)
+        return
+    text = io.TextIOWrapper(f, encoding=encoding, errors='replace')
+    try:
+        yield text
+    finally:
+        # leaves closing to the owner of the binary stream
+        text.detach()
+
+
+def hash_raw_file(state, f):
+    """Returns the content hash of the raw file of a state from check_raw_file, hashing it once."""
+    if state['content_hash'] is None:
+        state['content_hash'] = hash_file(f)
+    return state['content_hash']
+
+
+def check_raw_file(archive, file_name, stored, parser_version):
+    """
+    Returns the state of a raw file, a dict of the quantities of the data file state of an
+    entry, and whether the file and the parser version match the `stored` state section.
+    Size and modification time are compared first, the file is only hashed if the time
+    differs or is unavailable. Without a hash the content hash of the state is None. Files of
+    parsers without a known version, `parser_version` None, are never unchanged.
+    """
+    with archive.m_context.raw_file(file_name, 'br') as f:
+        fingerprint = file_fingerprint(f)
+        state = {
+            'file_name': file_name,
+            'size': f.seek(0, os.SEEK_END) if fingerprint is None else fingerprint[2],
+            'modification_time': None if fingerprint is None else fingerprint[3],
+            'content_hash': None,
+            'parser_version': None if parser_version is None else str(parser_version),
+        }
+        if (
+            stored is None
+            or parser_version is None
+            or any(getattr(stored, key) != state[key] for key in ('file_name', 'size', 'parser_version'))
+        ):
+            return state, False
+        if state['modification_time'] is not None and stored.modification_time == state['modification_time']:
+            state['content_hash'] = stored.content_hash
+            return state, True
+        return state, hash_raw_file(state, f) == stored.content_hash
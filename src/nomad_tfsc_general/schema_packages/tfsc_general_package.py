@@ -17,6 +17,8 @@
 #
 
 
+import os
+
 import numpy as np
 from baseclasses import (
     BaseMeasurement,
@@ -25,10 +27,7 @@ from baseclasses import (
     LayerDeposition,
 )
 from baseclasses.helper.add_solar_cell import add_band_gap
-from baseclasses.helper.utilities import (
-    get_encoding,
-    set_sample_reference,
-)
+from baseclasses.helper.utilities import set_sample_reference
 from baseclasses.material_processes_misc import (
     Cleaning,
     CoronaCleaning,
@@ -48,6 +47,7 @@ from baseclasses.solar_energy import (
     SolcarCellSample,
     Substrate,
 )
+from baseclasses.solar_energy.jvmeasurement import SolarCellJVCurveCustom
 from baseclasses.vapour_based_deposition import (
     ALDPropertiesIris,
     AtomicLayerDeposition,
@@ -64,9 +64,10 @@ from baseclasses.wet_chemical_deposition import (
     SpinCoating,
     WetChemicalDeposition,
 )
-from nomad.datamodel.data import EntryData
+from nomad.datamodel.data import ArchiveSection, EntryData
+from nomad.datamodel.hdf5 import HDF5Reference
 from nomad.datamodel.results import ELN
-from nomad.metainfo import Quantity, SchemaPackage, Section, SubSection
+from nomad.metainfo import JSON, Quantity, SchemaPackage, Section, SubSection
 
 m_package = SchemaPackage()
 
@@ -674,6 +675,75 @@ class TFSC_General_Encapsulation(Encapsulation, EntryData):
 # %%####################################### Measurements
 
 
+class TFSC_General_DataFileState(ArchiveSection):
+    """
+    Raw data file an entry was last parsed from, normalizing the entry again does not parse
+    the file while it and the parser version are unchanged.
+    """
+
+    file_name = Quantity(type=str)
+    size = Quantity(type=int, description='Size of the file in bytes.')
+    modification_time = Quantity(
+        type=int, description='Modification time of the file in nanoseconds since the epoch.'
+    )
+    content_hash = Quantity(type=str, description='sha256 hex digest of the file content.')
+    parser_version = Quantity(type=str)
+
+
+class TFSC_General_SingleDiodeFit(ArchiveSection):
+    """
+    Parameters of the single-diode model fitted to a JV curve, with the photocurrent counted
+    positive and the resistances normalized to the active area.
+    """
+
+    photocurrent_density = Quantity(type=np.dtype(np.float64), unit='mA/cm^2')
+    saturation_current_density = Quantity(type=np.dtype(np.float64), unit='mA/cm^2')
+    ideality_factor = Quantity(type=np.dtype(np.float64))
+    series_resistance = Quantity(type=np.dtype(np.float64), unit='ohm*cm^2')
+    shunt_resistance = Quantity(type=np.dtype(np.float64), unit='ohm*cm^2')
+    rmse = Quantity(
+        type=np.dtype(np.float64),
+        unit='mA/cm^2',
+        description='Root mean square deviation of the fitted from the measured current density.',
+    )
+    converged = Quantity(type=bool)
+
+
+class TFSC_General_JVCurve(SolarCellJVCurveCustom):
+    # decimated copies of the curve for plotting, the raw arrays stay untouched
+    preview_voltage = Quantity(
+        type=np.dtype(np.float64), shape=['*'], unit=SolarCellJVCurveCustom.voltage.unit
+    )
+    preview_current_density = Quantity(
+        type=np.dtype(np.float64), shape=['*'], unit=SolarCellJVCurveCustom.current_density.unit
+    )
+
+    # references to the arrays if they are stored in the HDF5 file of the measurement
+    voltage_hdf5 = Quantity(type=HDF5Reference)
+    current_density_hdf5 = Quantity(type=HDF5Reference)
+
+    diode_fit = SubSection(section_def=TFSC_General_SingleDiodeFit)
+
+
+class TFSC_General_JVHysteresis(ArchiveSection):
+    """Hysteresis of a pair of reverse and forward sweeps of one cell."""
+
+    name = Quantity(type=str)
+    reverse_curve = Quantity(type=str)
+    forward_curve = Quantity(type=str)
+    hysteresis_index_pce = Quantity(
+        type=np.dtype(np.float64),
+        description='(PCE_reverse - PCE_forward) / PCE_reverse',
+    )
+    hysteresis_index_area = Quantity(
+        type=np.dtype(np.float64),
+        description="""
+        Area between the reverse and the forward sweep divided by the area under the reverse
+        sweep, both integrated from 0 V to the open circuit voltage of the reverse sweep.
+        """,
+    )
+
+
 class TFSC_General_JVmeasurement(JVMeasurement, EntryData):
     m_def = Section(
         a_eln=dict(
@@ -693,6 +763,8 @@ class TFSC_General_JVmeasurement(JVMeasurement, EntryData):
                 order=[
                     'name',
                     'data_file',
+                    'parse_all_repetitions',
+                    'store_arrays_in_hdf5',
                     'active_area',
                     'corrected_active_area',
                     'intensity',
@@ -706,8 +778,8 @@ class TFSC_General_JVmeasurement(JVMeasurement, EntryData):
         ),
         a_plot=[
             {
-                'x': 'jv_curve/:/voltage',
-                'y': 'jv_curve/:/current_density',
+                'x': 'jv_curve/:/preview_voltage',
+                'y': 'jv_curve/:/preview_current_density',
                 'layout': {
                     'showlegend': True,
                     'yaxis': {'fixedrange': False},
@@ -717,10 +789,73 @@ class TFSC_General_JVmeasurement(JVMeasurement, EntryData):
         ],
     )
 
+    hysteresis = SubSection(section_def=TFSC_General_JVHysteresis, repeats=True)
+
+    ingested_bytes = Quantity(
+        type=int,
+        description="""
+        Size of the part of a Location 1 data file that has been ingested with
+        parse_all_repetitions. Records appended to the file later are parsed from here on and
+        their curves are appended.
+        """,
+    )
+    ingested_curves = Quantity(type=int, description='Number of curves ingested from the data file.')
+
+    data_file_state = SubSection(section_def=TFSC_General_DataFileState)
+
+    parse_all_repetitions = Quantity(
+        type=bool,
+        default=False,
+        description="""
+        Ingest every repetition of a Location 1 data file instead of only the last one, e.g. for
+        light soaking. The curves are named Pixel_<pixel>_<direction>_repetition_<repetition>.
+        """,
+        a_eln=dict(component='BoolEditQuantity'),
+    )
+
+    store_arrays_in_hdf5 = Quantity(
+        type=bool,
+        default=False,
+        description="""
+        Write the voltage and current density of every curve to an HDF5 file next to the data
+        file, the curves in the archive then reference the datasets instead of holding the arrays.
+        """,
+        a_eln=dict(component='BoolEditQuantity'),
+    )
+
     def normalize(self, archive, logger):
-        from nomad_tfsc_general.schema_packages.file_parser.jv_archive import get_jv_archive
+        from nomad_tfsc_general.schema_packages.file_parser.diode_fit import fit_jv_result
+        from nomad_tfsc_general.schema_packages.file_parser.hdf5_storage import hdf5_file_name
+        from nomad_tfsc_general.schema_packages.file_parser.jv_analysis import (
+            compute_jv_result_hysteresis,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.jv_archive import (
+            get_diode_fit_archive,
+            get_hysteresis_archive,
+            get_jv_archive,
+            get_jv_hdf5_archive,
+            get_jv_preview_archive,
+        )
         from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
-            get_jv_data,
+            JV_PARSER_VERSION,
+            JV_SNIFF_SIZE,
+            LOCATION_1_FORMAT,
+            get_jv_result,
+            get_jv_result_location_1_repetitions,
+            location_1_ingested_size,
+            read_appended_location_1_records,
+            sniff_jv_format,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.parse_cache import (
+            cached_parse,
+            get_parse_cache,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.raw_file import (
+            check_raw_file,
+            decode_raw_file,
+            detect_encoding,
+            hash_raw_file,
+            open_raw_file,
         )
 
         if not self.samples and self.data_file:
@@ -728,18 +863,248 @@ class TFSC_General_JVmeasurement(JVMeasurement, EntryData):
             set_sample_reference(archive, self, search_id, upload_id=archive.metadata.upload_id)
 
         if self.data_file:
-            # todo detect file format
-            with archive.m_context.raw_file(self.data_file, 'br') as f:
-                encoding = get_encoding(f)
-
-            with archive.m_context.raw_file(self.data_file, 'tr', encoding=encoding) as f:
-                jv_dict, location = get_jv_data(f.read(), self.data_file)
-                self.location = location
-                get_jv_archive(jv_dict, self.data_file, self, archive)
+            # an unchanged data file is not parsed again, e.g. after editing other quantities,
+            # curves of plain SolarCellJVCurveCustom sections carry no hdf5 references
+            stored_state = (
+                self.data_file_state
+                if self.jv_curve
+                and bool(getattr(self.jv_curve[0], 'voltage_hdf5', None)) == bool(self.store_arrays_in_hdf5)
+                else None
+            )
+            # the curves of both Location 1 modes differ, switching the mode parses the file again
+            parser_version = (
+                f'{JV_PARSER_VERSION}.repetitions' if self.parse_all_repetitions else JV_PARSER_VERSION
+            )
+            data_file_state, unchanged = check_raw_file(archive, self.data_file, stored_state, parser_version)
+            if not unchanged:
+                # todo detect file format
+                appended = None
+                with open_raw_file(archive, self.data_file) as f:
+                    encoding = detect_encoding(f)
+                    # Location 1 files grow by one record per repetition, with all repetitions ingested
+                    # only appended records are read and their curves added to the existing ones
+                    if (
+                        self.location == LOCATION_1_FORMAT
+                        and self.parse_all_repetitions
+                        and self.ingested_bytes
+                        and self.file_name == os.path.basename(self.data_file)
+                        and len(self.jv_curve) == self.ingested_curves
+                        and stored_state is not None
+                        and stored_state.parser_version == data_file_state['parser_version']
+                    ):
+                        appended = read_appended_location_1_records(f, self.ingested_bytes)
+                    if appended is None:
+                        content_hash = hash_raw_file(data_file_state, f)
+                        prefix = f.read(JV_SNIFF_SIZE).decode(encoding, errors='replace')
+                        jv_format = sniff_jv_format(prefix)
+                        is_location_1 = jv_format is not None and jv_format.location == LOCATION_1_FORMAT
+                        repetitions = is_location_1 and self.parse_all_repetitions
+                        self.ingested_bytes = location_1_ingested_size(f) if repetitions else None
+
+                        def parse():
+                            with decode_raw_file(f, encoding) as text:
+                                if repetitions:
+                                    return get_jv_result_location_1_repetitions(text), LOCATION_1_FORMAT
+                                return get_jv_result(text, self.data_file)
+
+                        jv_result, location = cached_parse(
+                            get_parse_cache(),
+                            parse,
+                            content_hash,
+                            'jv_repetitions' if repetitions else 'jv',
+                            JV_PARSER_VERSION,
+                            self.data_file,
+                        )
+                        self.location = location
+
+                append = appended is not None
+                if append:
+                    records, self.ingested_bytes = appended
+                    jv_result = (
+                        get_jv_result_location_1_repetitions(records.decode(encoding)) if records else None
+                    )
+
+                if jv_result is not None:
+                    count = len(self.jv_curve) if append else 0
+                    get_jv_archive(
+                        jv_result,
+                        self.data_file,
+                        self,
+                        archive,
+                        append=append,
+                        curve_class=TFSC_General_JVCurve,
+                    )
+                    new_curves = self.jv_curve[count:]
+                    get_jv_preview_archive(jv_result, new_curves)
+                    get_diode_fit_archive(fit_jv_result(jv_result), new_curves, TFSC_General_SingleDiodeFit)
+                    hysteresis = compute_jv_result_hysteresis(jv_result)
+                    get_hysteresis_archive(hysteresis, self, TFSC_General_JVHysteresis, append=append)
+                    if self.store_arrays_in_hdf5:
+                        get_jv_hdf5_archive(
+                            jv_result, new_curves, archive, hdf5_file_name(self.data_file), append=append
+                        )
+                self.ingested_curves = len(self.jv_curve) if self.ingested_bytes else None
+            self.data_file_state = TFSC_General_DataFileState(**data_file_state)
 
         super().normalize(archive, logger)
 
 
+class TFSC_General_MPPTPyramidLevel(ArchiveSection):
+    """
+    One level of the min/max/mean pyramid of an MPP tracking, every bucket summarizes
+    bucket_size consecutive points. The columns of the arrays are minimum, mean and maximum.
+    """
+
+    bucket_size = Quantity(type=int)
+    time = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        unit=MPPTracking.time.unit,
+        description='Time at the start of every bucket.',
+    )
+    power_density = Quantity(type=np.dtype(np.float64), shape=['*', 3], unit=MPPTracking.power_density.unit)
+    voltage = Quantity(type=np.dtype(np.float64), shape=['*', 3], unit=MPPTracking.voltage.unit)
+    current_density = Quantity(
+        type=np.dtype(np.float64), shape=['*', 3], unit=MPPTracking.current_density.unit
+    )
+
+    # references to the arrays if they are stored in the HDF5 file of the measurement
+    time_hdf5 = Quantity(type=HDF5Reference)
+    power_density_hdf5 = Quantity(type=HDF5Reference)
+    voltage_hdf5 = Quantity(type=HDF5Reference)
+    current_density_hdf5 = Quantity(type=HDF5Reference)
+
+
+class TFSC_General_MPPTStability(ArchiveSection):
+    """
+    Stability metrics of an MPP tracking, computed from the power density averaged over
+    rolling windows with the photocurrent counted positive.
+    """
+
+    window = Quantity(
+        type=np.dtype(np.float64), unit=MPPTracking.time.unit, description='Length of the rolling windows.'
+    )
+    initial_power_density = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.power_density.unit,
+        description='Average power density of the first window.',
+    )
+    peak_power_density = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.power_density.unit,
+        description='Highest window average of the power density.',
+    )
+    time_to_peak = Quantity(type=np.dtype(np.float64), unit=MPPTracking.time.unit)
+    stabilized_power_density = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.power_density.unit,
+        description='Average power density of the last window.',
+    )
+    stabilized_efficiency = Quantity(
+        type=np.dtype(np.float64),
+        description='Stabilized power density in % of an illumination of 100 mW/cm^2.',
+    )
+    burn_in_loss = Quantity(
+        type=np.dtype(np.float64),
+        description="""
+        Relative drop from the peak to the linear trend of the second half of the run after the
+        peak, extrapolated back to the time of the peak.
+        """,
+    )
+    degradation_rate = Quantity(
+        type=np.dtype(np.float64),
+        unit=f'1/{MPPTracking.time.unit}',
+        description='Slope of the linear trend after the burn-in relative to the peak power density.',
+    )
+    t95 = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.time.unit,
+        description="""
+        First time after the peak from which the window averages stay below 95 % of the peak
+        for a whole window. Not set if that has not happened within the complete windows.
+        """,
+    )
+    t90 = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.time.unit,
+        description="""
+        First time after the peak from which the window averages stay below 90 % of the peak
+        for a whole window. Not set if that has not happened within the complete windows.
+        """,
+    )
+    t80 = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.time.unit,
+        description="""
+        First time after the peak from which the window averages stay below 80 % of the peak
+        for a whole window. Not set if that has not happened within the complete windows.
+        """,
+    )
+
+
+class TFSC_General_MPPTTrackingQuality(ArchiveSection):
+    """
+    Perturbation steps and tracking behaviour of an MPP tracking, computed from the voltage
+    changes over the whole trace.
+    """
+
+    step_size = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.voltage.unit,
+        description='Median size of the voltage perturbations.',
+    )
+    step_size_mean = Quantity(type=np.dtype(np.float64), unit=MPPTracking.voltage.unit)
+    step_size_std = Quantity(type=np.dtype(np.float64), unit=MPPTracking.voltage.unit)
+    step_size_min = Quantity(type=np.dtype(np.float64), unit=MPPTracking.voltage.unit)
+    step_size_max = Quantity(type=np.dtype(np.float64), unit=MPPTracking.voltage.unit)
+    step_interval = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.time.unit,
+        description='Median time between voltage perturbations.',
+    )
+    oscillation_amplitude = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.voltage.unit,
+        description='Half the median voltage swing between reversals of the step direction.',
+    )
+    oscillation_frequency = Quantity(
+        type=np.dtype(np.float64),
+        unit=f'1/{MPPTracking.time.unit}',
+        description='Full oscillations of the voltage around the maximum power point per time.',
+    )
+    stuck_time = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.time.unit,
+        description='Total time the voltage was held much longer than between typical steps.',
+    )
+    stuck_start = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.time.unit)
+    stuck_end = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.time.unit)
+    lost_track_time = Quantity(
+        type=np.dtype(np.float64),
+        unit=MPPTracking.time.unit,
+        description='Total time the voltage was stepped in one direction instead of oscillating.',
+    )
+    lost_track_start = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.time.unit)
+    lost_track_end = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.time.unit)
+
+
+class TFSC_General_MPPTChangePoints(ArchiveSection):
+    """
+    Segments of the power density of an MPP tracking with a linear trend each, e.g. burn-in,
+    plateau, linear degradation or drop-outs of the setup, split at detected change points.
+    """
+
+    segment_start = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.time.unit)
+    segment_end = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.time.unit)
+    slope = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        unit=f'{MPPTracking.power_density.unit}/{MPPTracking.time.unit}',
+        description='Slope of the line fitted to the power density of every segment.',
+    )
+    mean_power_density = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.power_density.unit)
+
+
 class TFSC_General_SimpleMPPTracking(MPPTracking, EntryData):
     m_def = Section(
         a_eln=dict(
@@ -753,12 +1118,12 @@ class TFSC_General_SimpleMPPTracking(MPPTracking, EntryData):
                 'results',
                 'properties',
             ],
-            properties=dict(order=['name', 'data_file', 'samples']),
+            properties=dict(order=['name', 'data_file', 'store_arrays_in_hdf5', 'samples']),
         ),
         a_plot=[
             {
-                'x': 'time',
-                'y': 'power_density',
+                'x': 'preview_time',
+                'y': 'preview_power_density',
                 'layout': {
                     'showlegend': True,
                     'yaxis': {'fixedrange': False},
@@ -768,29 +1133,483 @@ class TFSC_General_SimpleMPPTracking(MPPTracking, EntryData):
         ],
     )
 
+    # decimated copies of the traces for plotting, the raw arrays stay untouched
+    preview_time = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.time.unit)
+    preview_voltage = Quantity(type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.voltage.unit)
+    preview_current_density = Quantity(
+        type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.current_density.unit
+    )
+    preview_power_density = Quantity(
+        type=np.dtype(np.float64), shape=['*'], unit=MPPTracking.power_density.unit
+    )
+
+    store_arrays_in_hdf5 = Quantity(
+        type=bool,
+        default=False,
+        description="""
+        Write the time, voltage, current density and power density traces to an HDF5 file next
+        to the data file and only keep references to them in the archive. The previews are
+        still stored in the archive.
+        """,
+        a_eln=dict(component='BoolEditQuantity'),
+    )
+    time_hdf5 = Quantity(type=HDF5Reference)
+    voltage_hdf5 = Quantity(type=HDF5Reference)
+    current_density_hdf5 = Quantity(type=HDF5Reference)
+    power_density_hdf5 = Quantity(type=HDF5Reference)
+
+    pyramid = SubSection(
+        section_def=TFSC_General_MPPTPyramidLevel,
+        repeats=True,
+        description="""
+        Min/max/mean summaries of the traces with bucket sizes growing in powers of two, any
+        time window can be plotted from the level that has about one bucket per pixel.
+        """,
+    )
+
+    stability = SubSection(section_def=TFSC_General_MPPTStability)
+    tracking_quality = SubSection(section_def=TFSC_General_MPPTTrackingQuality)
+    change_points = SubSection(section_def=TFSC_General_MPPTChangePoints)
+
+    ingested_file = Quantity(type=str, description='Data file the traces were ingested from.')
+    ingested_bytes = Quantity(
+        type=int,
+        description="""
+        Size of the part of the data file that has been ingested. Rows appended to the file
+        later are parsed from here on and extend the traces.
+        """,
+    )
+    ingested_rows = Quantity(type=int, description='Number of rows ingested from the data file.')
+    analysis_state = Quantity(
+        type=JSON,
+        description="""
+        State of the stability and tracking analyses after the ingested rows, appended rows
+        continue it instead of analysing the whole traces again.
+        """,
+    )
+
+    data_file_state = SubSection(section_def=TFSC_General_DataFileState)
+
     def normalize(self, archive, logger):
+        from nomad_tfsc_general.schema_packages.file_parser.decimation import (
+            build_pyramid,
+            extend_pyramid,
+            pyramid_tail_offset,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.hdf5_storage import hdf5_file_name
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_analysis import (
+            MPPT_ANALYSIS_VERSION,
+            update_stability_state,
+            update_tracking_state,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_archive import (
+            MPPT_ARRAYS,
+            PYRAMID_ARRAYS,
+            append_mppt_archive,
+            get_mppt_archive,
+            mppt_archive_length,
+            read_mppt_points,
+            read_mppt_pyramid_tail,
+        )
         from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import (
+            MPPT_PARSER_VERSION,
+            read_appended_mppt_file,
             read_mppt_file,
         )
+        from nomad_tfsc_general.schema_packages.file_parser.parse_cache import (
+            cached_parse,
+            get_parse_cache,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.raw_file import (
+            check_raw_file,
+            decode_raw_file,
+            detect_encoding,
+            hash_raw_file,
+            open_raw_file,
+        )
 
         if not self.samples and self.data_file:
             search_id = self.data_file.split('.')[0]
             set_sample_reference(archive, self, search_id, upload_id=archive.metadata.upload_id)
 
         if self.data_file:
-            with archive.m_context.raw_file(self.data_file, 'br') as f:
-                encoding = get_encoding(f)
+            # an unchanged data file is not parsed again, e.g. after editing other quantities
+            stored_state = (
+                self.data_file_state
+                if self.ingested_rows and bool(self.time_hdf5) == bool(self.store_arrays_in_hdf5)
+                else None
+            )
+            data_file_state, unchanged = check_raw_file(
+                archive, self.data_file, stored_state, f'{MPPT_PARSER_VERSION}.{MPPT_ANALYSIS_VERSION}'
+            )
+            if not unchanged:
+                # running measurements append rows to the file, only the appended ones are parsed
+                # and only the tail of the stored traces is read to extend the pyramid and the
+                # analyses
+                append = (
+                    stored_state is not None
+                    and stored_state.parser_version == data_file_state['parser_version']
+                    and self.ingested_bytes
+                    and self.ingested_file == self.data_file
+                    and self.analysis_state
+                    and mppt_archive_length(self, archive) == self.ingested_rows
+                )
+                appended = None
+                with open_raw_file(archive, self.data_file) as f:
+                    encoding = detect_encoding(f)
+                    if append:
+                        appended = read_appended_mppt_file(f, self.ingested_bytes, self.data_file, encoding)
+                    if appended is None:
+                        content_hash = hash_raw_file(data_file_state, f)
+                        self.ingested_bytes = f.seek(0, os.SEEK_END)
+
+                        def parse():
+                            with decode_raw_file(f, encoding) as text:
+                                return read_mppt_file(text, self.data_file)
+
+                        data = cached_parse(
+                            get_parse_cache(),
+                            parse,
+                            content_hash,
+                            'mppt',
+                            MPPT_PARSER_VERSION,
+                            self.data_file,
+                        )
+
+                if appended is not None:
+                    new_rows, self.ingested_bytes = appended
+                    start = self.ingested_rows
+                    arrays = dict(zip(MPPT_ARRAYS, new_rows))
+                    levels = read_mppt_pyramid_tail(self, archive, start)
+                    offset = pyramid_tail_offset(levels, start)
+                    tail = read_mppt_points(self, archive, offset, start)
+                    tail = {name: np.concatenate([tail[name], arrays[name]]) for name in MPPT_ARRAYS}
+                    append_mppt_archive(
+                        arrays,
+                        start,
+                        extend_pyramid(levels, tail, 'time', PYRAMID_ARRAYS, start, offset),
+                        self,
+                        TFSC_General_MPPTPyramidLevel,
+                        archive,
+                    )
+                    state = self.analysis_state
+                    tracking = update_tracking_state(state['tracking'], arrays['time'], arrays['voltage'])
+                    if tracking is None:
+                        points = read_mppt_points(self, archive, names=('time', 'voltage'))
+                        tracking = update_tracking_state(None, points['time'], points['voltage'])
+                else:
+                    self.datetime = data['datetime']
+                    start = 0
+                    state = {'stability': None}
+                    arrays = {
+                        'time': data['time_data'],
+                        'voltage': data['voltage_data'],
+                        'current_density': data['current_density_data'],
+                        'power_density': data['power_data'],
+                    }
+                    get_mppt_archive(
+                        arrays,
+                        build_pyramid(arrays, 'time', PYRAMID_ARRAYS),
+                        self,
+                        TFSC_General_MPPTPyramidLevel,
+                        archive,
+                        hdf5_file_name(self.data_file) if self.store_arrays_in_hdf5 else None,
+                    )
+                    tracking = update_tracking_state(None, arrays['time'], arrays['voltage'])
+                self.ingested_file = self.data_file
+                self.ingested_rows = start + len(arrays['time'])
+
+                def read(start, stop):
+                    points = read_mppt_points(self, archive, start, stop, ('time', 'power_density'))
+                    return points['time'], points['power_density']
+
+                stability = update_stability_state(state['stability'], read, self.ingested_rows)
+                self.set_mppt_results(archive, self.ingested_rows, stability, tracking)
+            self.data_file_state = TFSC_General_DataFileState(**data_file_state)
+        super().normalize(archive, logger)
+
+    def set_mppt_results(self, archive, length, stability, tracking):
+        """
+        Sets the previews, properties, metrics and change points of the `length` points of the
+        stored traces, from the states of update_stability_state and update_tracking_state.
+        The previews and the change points are taken from a pyramid level of long traces, so
+        their cost does not grow with the traces.
+        """
+        from nomad_tfsc_general.schema_packages.file_parser.decimation import (
+            PREVIEW_BUCKETS,
+            decimate,
+            level_preview,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_analysis import (
+            CHANGE_POINT_BUCKETS,
+            detect_change_points,
+            stability_metrics,
+            tracking_metrics,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_archive import (
+            PYRAMID_ARRAYS,
+            get_mppt_change_points_archive,
+            get_mppt_stability_archive,
+            get_mppt_tracking_archive,
+            read_mppt_overview,
+        )
+
+        overview, bucket_size = read_mppt_overview(self, archive, length, PREVIEW_BUCKETS)
+        preview = (
+            decimate(overview, 'power_density')
+            if bucket_size is None
+            else level_preview(overview, 'time', PYRAMID_ARRAYS)
+        )
+        self.preview_time = preview['time']
+        self.preview_voltage = preview['voltage']
+        self.preview_current_density = preview['current_density']
+        self.preview_power_density = preview['power_density']
+
+        metrics = tracking_metrics(tracking)
+        get_mppt_tracking_archive(metrics, self, TFSC_General_MPPTTrackingQuality)
+        self.properties = MPPTrackingProperties(
+            time=tracking['last_time'],
+            perturbation_voltage=None if np.isnan(metrics['step_size']) else metrics['step_size'],
+        )
+        get_mppt_stability_archive(stability_metrics(stability), self, TFSC_General_MPPTStability)
+        self.analysis_state = {'stability': stability, 'tracking': tracking}
+
+        overview, bucket_size = read_mppt_overview(self, archive, length, CHANGE_POINT_BUCKETS)
+        power = overview['power_density'] if bucket_size is None else overview['power_density'][:, 1]
+        get_mppt_change_points_archive(
+            detect_change_points(overview['time'], power),
+            self,
+            TFSC_General_MPPTChangePoints,
+        )
+
+
+class TFSC_General_MPPTSeries(TFSC_General_SimpleMPPTracking):
+    """
+    MPP tracking of one device recorded in consecutive files, e.g. after restarts of the
+    setup, joined into one continuous series.
+    """
+
+    m_def = Section(
+        a_eln=dict(
+            hide=[
+                'lab_id',
+                'users',
+                'location',
+                'end_time',
+                'steps',
+                'instruments',
+                'results',
+                'properties',
+                'data_file',
+                'ingested_file',
+                'ingested_bytes',
+                'ingested_rows',
+                'analysis_state',
+                'data_file_state',
+            ],
+            properties=dict(order=['name', 'data_files', 'store_arrays_in_hdf5', 'samples']),
+        ),
+        a_plot=[
+            {
+                'x': 'preview_time',
+                'y': 'preview_power_density',
+                'layout': {
+                    'showlegend': True,
+                    'yaxis': {'fixedrange': False},
+                    'xaxis': {'fixedrange': False},
+                },
+            }
+        ],
+    )
+
+    data_files = Quantity(
+        type=str,
+        shape=['*'],
+        description="""
+        MPPT files of the device whose names end in the start of the measurement,
+        `_YYYYMMDD_HHMMSS`. They are joined in the order of these starts.
+        """,
+        a_eln=dict(component='FileEditQuantity'),
+        a_browser=dict(adaptor='RawFileAdaptor'),
+    )
+    restart_index = Quantity(
+        type=np.dtype(np.int64),
+        shape=['*'],
+        description='Index of the first point of every file after the first.',
+    )
+    restart_time = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        unit=MPPTracking.time.unit,
+        description='Start of every file after the first, relative to the start of the series.',
+    )
 
-            with archive.m_context.raw_file(self.data_file, 'tr', encoding=encoding) as f:
-                data = read_mppt_file(f.read(), self.data_file)
+    def normalize(self, archive, logger):
+        from nomad_tfsc_general.schema_packages.file_parser.decimation import build_pyramid
+        from nomad_tfsc_general.schema_packages.file_parser.hdf5_storage import hdf5_file_name
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_analysis import (
+            update_stability_state,
+            update_tracking_state,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_archive import (
+            PYRAMID_ARRAYS,
+            get_mppt_archive,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import (
+            MPPT_PARSER_VERSION,
+            mppt_series_id,
+            read_mppt_file,
+            stitch_mppt_data,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.parse_cache import (
+            cached_parse,
+            get_parse_cache,
+            hash_file,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.raw_file import (
+            decode_raw_file,
+            detect_encoding,
+            open_raw_file,
+        )
 
+        if self.data_files:
+            search_id = mppt_series_id(self.data_files[0])
+            if not self.samples:
+                set_sample_reference(archive, self, search_id, upload_id=archive.metadata.upload_id)
+
+            files = []
+            for data_file in self.data_files:
+                with open_raw_file(archive, data_file) as f:
+                    encoding = detect_encoding(f)
+                    content_hash = hash_file(f)
+
+                    def parse(f=f, data_file=data_file, encoding=encoding):
+                        with decode_raw_file(f, encoding) as text:
+                            return read_mppt_file(text, data_file)
+
+                    files.append(
+                        (
+                            data_file,
+                            cached_parse(
+                                get_parse_cache(), parse, content_hash, 'mppt', MPPT_PARSER_VERSION, data_file
+                            ),
+                        )
+                    )
+            data = stitch_mppt_data(files)
+
+            self.data_files = data['files']
             self.datetime = data['datetime']
-            self.time = data['time_data']
-            self.voltage = data['voltage_data']
-            self.current_density = data['current_density_data']
-            self.power_density = data['power_data']
-            self.properties = MPPTrackingProperties(
-                time=data['total_time'], perturbation_voltage=data['step_size']
+            self.restart_index = data['restart_index']
+            self.restart_time = data['restart_time']
+            arrays = {
+                'time': data['time_data'],
+                'voltage': data['voltage_data'],
+                'current_density': data['current_density_data'],
+                'power_density': data['power_data'],
+            }
+            get_mppt_archive(
+                arrays,
+                build_pyramid(arrays, 'time', PYRAMID_ARRAYS),
+                self,
+                TFSC_General_MPPTPyramidLevel,
+                archive,
+                hdf5_file_name(f'{search_id}.mpp_series') if self.store_arrays_in_hdf5 else None,
+            )
+            self.set_mppt_results(
+                archive,
+                len(arrays['time']),
+                update_stability_state(
+                    None,
+                    lambda start, stop: (arrays['time'][start:stop], arrays['power_density'][start:stop]),
+                    len(arrays['time']),
+                ),
+                update_tracking_state(None, arrays['time'], arrays['voltage'], data['restart_index']),
+            )
+        super().normalize(archive, logger)
+
+
+class TFSC_General_JVChanges(ArchiveSection):
+    """
+    Changes of the JV curves of the same cells from before to after an MPP tracking, the
+    curves are matched by their cell names.
+    """
+
+    cell_name = Quantity(type=str, shape=['*'])
+    efficiency_change = Quantity(
+        type=np.dtype(np.float64), shape=['*'], description='Efficiency after minus before in %.'
+    )
+    efficiency_retention = Quantity(
+        type=np.dtype(np.float64), shape=['*'], description='Efficiency after relative to before.'
+    )
+    open_circuit_voltage_change = Quantity(type=np.dtype(np.float64), shape=['*'], unit='V')
+    open_circuit_voltage_retention = Quantity(type=np.dtype(np.float64), shape=['*'])
+    short_circuit_current_density_change = Quantity(type=np.dtype(np.float64), shape=['*'], unit='mA/cm^2')
+    short_circuit_current_density_retention = Quantity(type=np.dtype(np.float64), shape=['*'])
+    fill_factor_change = Quantity(type=np.dtype(np.float64), shape=['*'])
+    fill_factor_retention = Quantity(type=np.dtype(np.float64), shape=['*'])
+
+
+class TFSC_General_MPPTProtocol(BaseMeasurement, EntryData):
+    """
+    One run of the stability protocol: JV sweeps of all pixels and of the best pixel, an MPP
+    tracking of the best pixel and a final JV sweep, see group_protocol_runs.
+    """
+
+    m_def = Section(
+        a_eln=dict(
+            hide=[
+                'lab_id',
+                'users',
+                'location',
+                'end_time',
+                'steps',
+                'instruments',
+                'results',
+            ],
+            properties=dict(order=['name', 'samples']),
+        )
+    )
+
+    jv_all_pixels = SubSection(section_def=TFSC_General_JVmeasurement)
+    jv_before = SubSection(section_def=TFSC_General_JVmeasurement)
+    mppt = SubSection(section_def=TFSC_General_SimpleMPPTracking)
+    jv_after = SubSection(section_def=TFSC_General_JVmeasurement)
+    jv_changes = SubSection(section_def=TFSC_General_JVChanges)
+
+    def protocol_measurements(self):
+        return [
+            measurement
+            for measurement in (self.jv_all_pixels, self.jv_before, self.mppt, self.jv_after)
+            if measurement is not None
+        ]
+
+    def share_samples(self):
+        """Copies the sample references to the measurements, so they do not search them again."""
+        for measurement in self.protocol_measurements():
+            measurement.samples = [sample.m_copy() for sample in self.samples or []]
+
+    def normalize(self, archive, logger):
+        from nomad_tfsc_general.schema_packages.file_parser.jv_analysis import compare_jv_curves
+        from nomad_tfsc_general.schema_packages.file_parser.jv_archive import (
+            get_jv_changes_archive,
+            read_jv_figures_of_merit,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import mppt_series_id
+
+        # the measurements are normalized before, with the sample references of the parser
+        if not self.samples and self.mppt is not None and self.mppt.data_file:
+            search_id = mppt_series_id(self.mppt.data_file)
+            set_sample_reference(archive, self, search_id, upload_id=archive.metadata.upload_id)
+
+        if self.mppt is not None and self.mppt.datetime:
+            self.datetime = self.mppt.datetime
+        if self.jv_before is not None and self.jv_after is not None:
+            get_jv_changes_archive(
+                compare_jv_curves(
+                    *read_jv_figures_of_merit(self.jv_before), *read_jv_figures_of_merit(self.jv_after)
+                ),
+                self,
+                TFSC_General_JVChanges,
             )
         super().normalize(archive, logger)
 
@@ -825,36 +1644,70 @@ class TFSC_General_EQEmeasurement(EQEMeasurement, EntryData):
         ],
     )
 
+    data_file_state = SubSection(section_def=TFSC_General_DataFileState)
+
     def normalize(self, archive, logger):
         from nomad_hysprint.schema_packages.file_parser.eqe_parser import (
             read_file,
             read_file_multiple,
         )
 
+        from nomad_tfsc_general.schema_packages.file_parser.parse_cache import (
+            cached_parse,
+            get_parse_cache,
+            package_version,
+        )
+        from nomad_tfsc_general.schema_packages.file_parser.raw_file import (
+            check_raw_file,
+            decode_raw_file,
+            detect_encoding,
+            hash_raw_file,
+            open_raw_file,
+        )
+
         if not self.samples and self.data_file:
             search_id = self.data_file.split('.')[0]
             set_sample_reference(archive, self, search_id)
 
+        eqe_data = self.eqe_data
         if self.data_file:
-            with archive.m_context.raw_file(self.data_file, 'br') as f:
-                encoding = get_encoding(f)
-            with archive.m_context.raw_file(self.data_file, 'tr', encoding=encoding) as f:
-                filedata = f.read()
-                if filedata.startswith('[Header]'):
-                    data_list = [read_file(filedata, 8)]
-                else:
-                    data_list = read_file_multiple(filedata)
-            eqe_data = []
-            for d in data_list:
-                entry = SolarCellEQECustom(
-                    photon_energy_array=d.get('photon_energy'),
-                    raw_photon_energy_array=d.get('photon_energy_raw'),
-                    eqe_array=d.get('intensity'),
-                    raw_eqe_array=d.get('intensty_raw'),
-                )
-                entry.normalize(archive, logger)
-                eqe_data.append(entry)
-            self.eqe_data = eqe_data
+            # an unchanged data file is not parsed again, e.g. after editing other quantities
+            parser_version = package_version('nomad-hysprint')
+            data_file_state, unchanged = check_raw_file(
+                archive, self.data_file, self.data_file_state if self.eqe_data else None, parser_version
+            )
+            if not unchanged:
+                with open_raw_file(archive, self.data_file) as f:
+                    encoding = detect_encoding(f)
+                    content_hash = hash_raw_file(data_file_state, f)
+
+                    def parse():
+                        with decode_raw_file(f, encoding) as text:
+                            filedata = text.read()
+                        if filedata.startswith('[Header]'):
+                            return [read_file(filedata, 8)]
+                        return read_file_multiple(filedata)
+
+                    data_list = cached_parse(
+                        get_parse_cache(),
+                        parse,
+                        content_hash,
+                        'eqe',
+                        parser_version,
+                        self.data_file,
+                    )
+                eqe_data = []
+                for d in data_list:
+                    entry = SolarCellEQECustom(
+                        photon_energy_array=d.get('photon_energy'),
+                        raw_photon_energy_array=d.get('photon_energy_raw'),
+                        eqe_array=d.get('intensity'),
+                        raw_eqe_array=d.get('intensty_raw'),
+                    )
+                    entry.normalize(archive, logger)
+                    eqe_data.append(entry)
+                self.eqe_data = eqe_data
+            self.data_file_state = TFSC_General_DataFileState(**data_file_state)
 
         if eqe_data:
             band_gaps = np.array([d.bandgap_eqe.magnitude for d in eqe_data])
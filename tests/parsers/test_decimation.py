@@ -0,0 +1,102 @@
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.decimation import (
+    decimate,
+    minmax_decimation_indices,
+)
+
+
+def test_minmax_decimation_keeps_extremes():
+    time = np.arange(100_003, dtype=float)
+    power = np.sin(time / 5000)
+    power[12_345] = 10.0
+    power[54_321] = -10.0
+    power[777] = np.nan
+    preview = decimate({'time': time, 'power': power}, 'power', buckets=100)
+
+    assert len(preview['time']) <= 202
+    assert np.all(np.diff(preview['time']) > 0)
+    assert preview['time'][0] == 0 and preview['time'][-1] == time[-1]
+    assert {12_345, 54_321} <= set(preview['time'].astype(int))
+    assert not np.isnan(preview['power']).any()
+
+
+def test_minmax_decimation_short_arrays():
+    assert list(minmax_decimation_indices(np.arange(5.0), buckets=100)) == [0, 1, 2, 3, 4]
+
+
+def test_pyramid_levels():
+    from nomad_tfsc_general.schema_packages.file_parser.decimation import build_pyramid
+
+    time = np.arange(1000, dtype=float)
+    power = np.cos(time / 50)
+    power[500:520] = np.nan
+    levels = build_pyramid({'time': time, 'power': power}, 'time', ['power'], min_bucket=4)
+
+    assert [level['bucket_size'] for level in levels] == [4, 8, 16, 32, 64, 128, 256, 512, 1024]
+    for level in levels:
+        bucket_size = level['bucket_size']
+        assert len(level['power']) == -(-1000 // bucket_size)
+        np.testing.assert_array_equal(level['time'], time[::bucket_size])
+        for bucket, (minimum, mean, maximum) in enumerate(level['power']):
+            values = power[bucket * bucket_size : (bucket + 1) * bucket_size]
+            if np.isnan(values).all():
+                assert np.isnan([minimum, mean, maximum]).all()
+                continue
+            assert minimum == np.nanmin(values) and maximum == np.nanmax(values)
+            assert np.isclose(mean, np.nanmean(values))
+
+
+def test_pyramid_window():
+    from nomad_tfsc_general.schema_packages.file_parser.decimation import (
+        build_pyramid,
+        pyramid_window,
+    )
+
+    time = np.arange(100_000, dtype=float)
+    levels = build_pyramid({'time': time, 'power': time}, 'time', ['power'], min_bucket=16)
+
+    window = pyramid_window(levels, 10_000, 90_000, 800)
+    assert window['bucket_size'] == 128
+    assert len(window['power']) <= 800
+    assert window['time'][0] <= 10_000 < window['time'][1]
+    assert window['power'][-1][2] >= 89_999
+
+    # narrow windows are read from the raw points
+    assert pyramid_window(levels, 0, 6000, 800) is None
+    assert pyramid_window(levels, 0, 800 * 16, 800) is None
+    assert pyramid_window(levels, 0, 800 * 16 + 1, 800)['bucket_size'] == 32
+    assert pyramid_window(levels, 5, 5 + 800 * 16 + 1, 800)['bucket_size'] == 32
+    assert pyramid_window(levels, 0, 100_000, 1)['bucket_size'] == 131072
+
+
+def test_pyramid_extension():
+    from nomad_tfsc_general.schema_packages.file_parser.decimation import (
+        build_pyramid,
+        extend_pyramid,
+        pyramid_tail_offset,
+    )
+
+    rng = np.random.default_rng(0)
+    time = np.arange(5000, dtype=float)
+    power = rng.normal(size=5000)
+    rebuilt = build_pyramid({'time': time, 'power': power}, 'time', ['power'])
+    for start in [1, 16, 100, 4096]:
+        levels = build_pyramid({'time': time[:start], 'power': power[:start]}, 'time', ['power'])
+        # only the bucket before the first recomputed one is needed of the stored levels
+        stored = []
+        for level in levels:
+            first = max(start // level['bucket_size'] - 1, 0)
+            stored.append(
+                {'bucket_size': level['bucket_size'], 'start': first}
+                | {name: level[name][first:] for name in ('time', 'power')}
+            )
+        offset = pyramid_tail_offset(levels, start)
+        tail = {'time': time[offset:], 'power': power[offset:]}
+        extended = extend_pyramid(stored, tail, 'time', ['power'], start, offset)
+
+        assert [level['bucket_size'] for level in extended] == [level['bucket_size'] for level in rebuilt]
+        for level, expected in zip(extended, rebuilt):
+            assert level['start'] == start // level['bucket_size']
+            np.testing.assert_array_equal(level['time'], expected['time'][level['start'] :])
+            np.testing.assert_allclose(level['power'], expected['power'][level['start'] :], rtol=1e-12)
@@ -0,0 +1,64 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.hdf5_storage import (
+    hdf5_file_name,
+    open_hdf5_dataset,
+    write_hdf5_arrays,
+)
+
+
+def upload_archive(upload_path):
+    def raw_file(name, mode):
+        return open(os.path.join(upload_path, name), mode)
+
+    return SimpleNamespace(m_context=SimpleNamespace(raw_file=raw_file))
+
+
+def test_hdf5_storage_round_trip(tmp_path):
+    archive = upload_archive(tmp_path)
+    file_name = hdf5_file_name('PERS_1_1_1.mppt.txt')
+    time = np.linspace(0, 10, 50_000)
+    references = write_hdf5_arrays(
+        archive, file_name, {'/mppt/time': time, '/mppt/empty': []}, {'/mppt/time': 'h'}
+    )
+
+    assert references['/mppt/time'] == 'PERS_1_1_1.mppt.txt.arrays.h5#/mppt/time'
+    with open_hdf5_dataset(archive, references['/mppt/time']) as dataset:
+        assert dataset.attrs['units'] == 'h'
+        assert dataset.shape == time.shape
+        np.testing.assert_array_equal(dataset[1000:1010], time[1000:1010])
+    with open_hdf5_dataset(archive, references['/mppt/empty']) as dataset:
+        assert dataset.shape == (0,)
+
+
+def test_hdf5_storage_append(tmp_path):
+    archive = upload_archive(tmp_path)
+    write_hdf5_arrays(archive, 'jv.h5', {'/jv_curve/0/voltage': [0.0, 0.5]})
+    references = write_hdf5_arrays(archive, 'jv.h5', {'/jv_curve/1/voltage': [0.1]}, append=True)
+    with open_hdf5_dataset(archive, 'jv.h5#/jv_curve/0/voltage') as dataset:
+        assert list(dataset[:]) == [0.0, 0.5]
+
+    # without append the file only holds the arrays written last
+    write_hdf5_arrays(archive, 'jv.h5', {'/jv_curve/1/voltage': [0.2]})
+    with open_hdf5_dataset(archive, references['/jv_curve/1/voltage']) as dataset:
+        assert list(dataset.file) == ['jv_curve']
+        assert list(dataset.file['jv_curve']) == ['1']
+        assert list(dataset[:]) == [0.2]
+
+
+def test_hdf5_storage_extend(tmp_path):
+    archive = upload_archive(tmp_path)
+    write_hdf5_arrays(archive, 'mppt.h5', {'/mppt/time': [0.0, 1.0, 2.0], '/mppt/pyramid/16': [[0, 1, 2]]})
+    write_hdf5_arrays(
+        archive,
+        'mppt.h5',
+        {'/mppt/time': [3.0, 4.0], '/mppt/pyramid/16': [[0, 2, 4]]},
+        starts={'/mppt/time': 3, '/mppt/pyramid/16': 0},
+    )
+    with open_hdf5_dataset(archive, 'mppt.h5#/mppt/time') as dataset:
+        assert list(dataset[:]) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    with open_hdf5_dataset(archive, 'mppt.h5#/mppt/pyramid/16') as dataset:
+        assert dataset[:].tolist() == [[0, 2, 4]]
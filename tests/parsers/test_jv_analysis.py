@@ -0,0 +1,116 @@
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.diode_fit import (
+    BOLTZMANN_CONSTANT_EV,
+    fit_single_diode,
+    single_diode_current_density,
+)
+from nomad_tfsc_general.schema_packages.file_parser.jv_analysis import (
+    compare_jv_curves,
+    compute_figures_of_merit,
+    compute_hysteresis,
+    pad_curves,
+    pair_sweeps,
+)
+
+
+def synthetic_curve(voltage, j_sc=20.0, v_oc=1.1, thermal_voltage=0.05):
+    # ideal diode, photocurrent positive
+    return j_sc - j_sc * np.expm1(voltage / thermal_voltage) / np.expm1(v_oc / thermal_voltage)
+
+
+def test_figures_of_merit_batch():
+    voltage = np.linspace(-0.2, 1.2, 1401)
+    current_density = synthetic_curve(voltage)
+    power = voltage * current_density
+    mpp = np.argmax(power)
+
+    # forward sweep, reverse sweep, sign flipped and a shorter NaN padded curve
+    voltages = np.stack([voltage, voltage[::-1], voltage, voltage])
+    currents = np.stack([current_density, current_density[::-1], -current_density, current_density])
+    voltages[3, 1000:] = np.nan
+    currents[3, 1000:] = np.nan
+    fom = compute_figures_of_merit(voltages, currents, intensity=100.0)
+
+    np.testing.assert_allclose(fom['J_sc'][:3], 20.0, rtol=1e-9)
+    np.testing.assert_allclose(fom['V_oc'][:3], 1.1, rtol=1e-4)
+    np.testing.assert_allclose(fom['U_MPP'][:3], voltage[mpp])
+    np.testing.assert_allclose(fom['J_MPP'][:3], current_density[mpp])
+    np.testing.assert_allclose(fom['Efficiency'][:3], power[mpp])
+    np.testing.assert_allclose(fom['Fill_factor'][:3], power[mpp] / (20.0 * fom['V_oc'][:3]))
+    # the padded curve ends at 0.8 V, before Voc
+    assert np.isnan(fom['V_oc'][3])
+    assert fom['J_sc'][3] == fom['J_sc'][0]
+
+
+def test_pad_curves():
+    values = np.arange(6, dtype=float)
+    padded = pad_curves(values, [0, 1, 4, 6])
+    assert padded.shape == (3, 3)
+    assert list(padded[1]) == [1.0, 2.0, 3.0]
+    assert np.isnan(padded[0, 1:]).all()
+
+
+def test_single_diode_fit_batch():
+    thermal_voltage = BOLTZMANN_CONSTANT_EV * 298.15
+    # Jph [A/cm^2], ln J0, ln n, ln Rs, ln Rsh
+    parameters = np.array(
+        [
+            [0.020, np.log(1e-12), np.log(1.5), np.log(3.0), np.log(2000.0)],
+            [0.022, np.log(1e-11), np.log(1.8), np.log(6.0), np.log(800.0)],
+        ]
+    )
+    voltage = np.tile(np.linspace(-0.1, 1.2, 131), (3, 1))
+    current_density = single_diode_current_density(voltage[:2], parameters, thermal_voltage) * 1000
+    # second curve measured with negative photocurrent, third curve is dark and not fitted
+    currents = np.stack([current_density[0], -current_density[1], np.zeros(131)])
+    fit = fit_single_diode(voltage, currents)
+
+    assert list(fit['converged']) == [True, True, False]
+    np.testing.assert_allclose(fit['photocurrent_density'][:2], [20.0, 22.0], rtol=1e-4)
+    np.testing.assert_allclose(fit['ideality_factor'][:2], [1.5, 1.8], rtol=1e-3)
+    np.testing.assert_allclose(fit['series_resistance'][:2], [3.0, 6.0], rtol=1e-3)
+    np.testing.assert_allclose(fit['shunt_resistance'][:2], [2000.0, 800.0], rtol=1e-2)
+    np.testing.assert_allclose(fit['saturation_current_density'][:2], [1e-9, 1e-8], rtol=1e-2)
+    assert np.isnan(fit['ideality_factor'][2])
+
+
+def test_pair_sweeps():
+    names = [
+        'Pixel_1_reverse',
+        'Pixel_1_forward',
+        'Pixel_2_forward',
+        '958.1a_loc2_forward.txt',
+        '958.1a_loc2_reverse.txt',
+        'Pixel 3',
+    ]
+    reverse_idx, forward_idx, pair_names = pair_sweeps(names)
+    assert list(reverse_idx) == [0, 4]
+    assert list(forward_idx) == [1, 3]
+    assert pair_names == ['Pixel_1', '958.1a_loc2.txt']
+
+
+def test_hysteresis_batch():
+    voltage = np.linspace(-0.2, 1.2, 1401)
+    reverse = synthetic_curve(voltage)
+    # forward sweep with 10 % lower current, measured in the other direction and sign
+    voltages = np.stack([voltage[::-1], voltage, voltage])
+    currents = np.stack([reverse[::-1], -0.9 * reverse, reverse])
+    hysteresis = compute_hysteresis(voltages, currents, np.array([0, 0]), np.array([1, 2]))
+
+    np.testing.assert_allclose(hysteresis['hysteresis_index_pce'], [0.1, 0.0], atol=1e-12)
+    np.testing.assert_allclose(hysteresis['hysteresis_index_area'], [0.1, 0.0], atol=1e-12)
+
+
+def test_compare_jv_curves():
+    before = np.array([[20.0, 1.1], [18.0, 1.0], [0.0, 0.9]])
+    after = np.array([[0.0, 0.8], [19.0, 1.05], [17.0, 0.95]])
+    names, change, retention = compare_jv_curves(
+        ['Pixel_1_reverse', 'Pixel_1_forward', 'Pixel_2_reverse'],
+        before,
+        ['Pixel_3_reverse', 'Pixel_1_reverse', 'Pixel_2_reverse'],
+        after,
+    )
+    assert names == ['Pixel_1_reverse', 'Pixel_2_reverse']
+    np.testing.assert_allclose(change, [[-1.0, -0.05], [17.0, 0.05]])
+    np.testing.assert_allclose(retention, [[0.95, 1.05 / 1.1], [np.nan, 0.95 / 0.9]])
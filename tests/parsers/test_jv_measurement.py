@@ -1,5 +1,5 @@
 from nomad.client import normalize_all
-from utils import delete_json, get_archive
+from utils import delete_json, get_archive, get_upload_archive
 
 
 def test_jv_parser_hereon(monkeypatch):
@@ -32,7 +32,8 @@ def test_jv_parser_loc_1(monkeypatch):
     assert round(archive.data.jv_curve[3].current_density[0].magnitude, 5) == 18.50302
     assert round(archive.data.jv_curve[3].fill_factor, 2) == 0.41
     assert archive.data.jv_curve[3].efficiency == 8.3
-    assert round(archive.data.jv_curve[3].potential_at_maximum_power_point.magnitude, 5) == 1.08677
+    assert round(archive.data.jv_curve[3].potential_at_maximum_power_point.magnitude, 5) == 0.52014
+    assert round(archive.data.jv_curve[3].current_density_at_maximun_power_point.magnitude, 5) == 15.96638
     assert len(archive.data.jv_curve[3].voltage) == 66
     delete_json()
 
@@ -49,7 +50,8 @@ def test_jv_parser_loc_2(monkeypatch):
     # Check voltage and current density data
     assert archive.data.active_area.magnitude == 0.15
     assert archive.data.intensity.magnitude == 100
-    assert round(archive.data.jv_curve[3].voltage[0].magnitude, 5) == -0.2
+    # reverse sweep, the currents are listed from the highest voltage on
+    assert round(archive.data.jv_curve[3].voltage[0].magnitude, 5) == 1.2
     assert round(archive.data.jv_curve[3].current_density[0].magnitude, 5) == 6.31333
     assert round(archive.data.jv_curve[3].fill_factor, 4) == 0.6277
     assert archive.data.jv_curve[3].efficiency == 13.0256
@@ -97,3 +99,324 @@ def test_jv_parser_loc_2_format_2(monkeypatch):
     assert round(archive.data.jv_curve[3].voltage[0].magnitude, 5) == 1.2
     assert round(archive.data.jv_curve[3].current_density[0].magnitude, 5) == 50.744
     delete_json()
+
+
+def test_jv_parser_loc_1_incomplete_last_record():
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import get_jv_data_location_1
+
+    with open('tests/data/PERS_1_1_C-2.jv.IV', encoding='utf-8') as f:
+        filedata = f.read()
+    # a repetition that is still being written must not hide the last complete one
+    truncated = filedata.strip() + '\n' + filedata.strip().split('\n')[-1][:500] + '\n'
+    jv_dict = get_jv_data_location_1(truncated)
+    reference = get_jv_data_location_1(filedata)
+    assert jv_dict['datetime'] == reference['datetime']
+    assert jv_dict['Efficiency'] == reference['Efficiency']
+    assert len(jv_dict['jv_curve']) == 8
+    assert len(jv_dict['jv_curve'][3]['voltage']) == 66
+
+
+def test_jv_parser_loc_1_repetitions():
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
+        get_jv_data_location_1,
+        get_jv_data_location_1_repetitions,
+    )
+
+    with open('tests/data/PERS_1_1_C-2.jv.IV', encoding='utf-8') as f:
+        filedata = f.read()
+    repetitions = get_jv_data_location_1_repetitions(filedata)
+    last = get_jv_data_location_1(filedata)
+    assert repetitions['voltage'].shape == (3, 4, 132)
+    assert repetitions['current_density'].shape == (3, 4, 132)
+    assert list(repetitions['repetition']) == [1, 2, 3]
+    assert len(repetitions['datetime']) == 3
+    assert repetitions['datetime'][-1] == last['datetime']
+    assert list(repetitions['Efficiency'][-1]) == last['Efficiency']
+    assert list(repetitions['voltage'][-1, 1, 66:]) == list(last['jv_curve'][3]['voltage'])
+
+    # the maximum power point is the one of the reverse sweeps, the file reports its power rounded
+    for jv_dict in (last, repetitions):
+        p_mpp = np.asarray(jv_dict['P_MPP'])
+        np.testing.assert_allclose(p_mpp, np.asarray(jv_dict['U_MPP']) * np.asarray(jv_dict['J_MPP']))
+        np.testing.assert_allclose(p_mpp.reshape(-1, 4)[-1], [8.5, 8.3, 10.58, 11.11], atol=0.005)
+
+
+def test_jv_parser_loc_1_pixel_count():
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
+        get_jv_data_location_1,
+        get_jv_data_location_1_repetitions,
+    )
+
+    pixel_count = 8
+    voltage = np.concatenate([np.linspace(1.2, -0.1, 14), np.linspace(-0.1, 1.2, 14)])
+    records = []
+    for repetition in range(1, 3):
+        fields = [repetition, '15:18:25 jul 23 2025', 1.2, -0.1, 0.1, 0]
+        fields += [0.1] * pixel_count  # area
+        fields += [20 + pixel for pixel in range(pixel_count)] * 2  # Jsc
+        fields += [1000 + pixel for pixel in range(pixel_count)] * 2  # Voc
+        fields += [70] * pixel_count * 2  # FF
+        fields += [14] * pixel_count * 2  # MPP
+        fields += list(-20 + voltage) * pixel_count
+        fields += list(voltage) * pixel_count
+        records.append('\t'.join(str(val) for val in fields))
+    records[0] = records[0].replace('\t20\t', '\thysteresis$20\t', 1)
+    filedata = '\n'.join(records) + '\n'
+
+    jv_dict = get_jv_data_location_1(filedata)
+    assert len(jv_dict['jv_curve']) == 2 * pixel_count
+    assert jv_dict['jv_curve'][-1]['name'] == 'Pixel_8_forward'
+    assert len(jv_dict['jv_curve'][-1]['voltage']) == 14
+    assert jv_dict['V_oc'][7] == 1.007
+    assert jv_dict['J_sc'][7] == 27
+
+    repetitions = get_jv_data_location_1_repetitions(filedata)
+    assert repetitions['voltage'].shape == (2, pixel_count, 28)
+    assert repetitions['J_sc'].shape == (2, pixel_count)
+
+
+def test_jv_parser_loc_2_malformed_curve_block():
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import get_jv_data_location_2
+
+    with open('tests/data/PERS_1_1_C-1.jv.txt', encoding='utf-8') as f:
+        filedata = f.read()
+    reference = get_jv_data_location_2(filedata)
+    lines = filedata.splitlines()
+    # a non-numeric value is coerced to NaN and only drops that point of its curve
+    lines[-1] = lines[-1].replace('5.1333333333', 'n.a.', 1)
+    jv_dict = get_jv_data_location_2('\n'.join(lines))
+    assert len(jv_dict['jv_curve']) == len(reference['jv_curve'])
+    assert len(jv_dict['jv_curve'][0]['voltage']) == len(reference['jv_curve'][0]['voltage']) - 1
+    current_density = reference['jv_curve'][3]['current_density']
+    assert list(jv_dict['jv_curve'][3]['current_density']) == list(current_density)
+
+
+def test_jv_format_registry():
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
+        JV_FORMATS,
+        get_jv_data,
+        register_jv_format,
+    )
+
+    assert get_jv_data('some\tother\tfile\n1\t2\t3\n') == (None, 'Unknown format')
+    jv_format = register_jv_format(
+        'Test Format',
+        lambda prefix: prefix.startswith('#test'),
+        lambda filedata, filename: {'jv_curve': [], 'filename': filename},
+    )
+    try:
+        jv_dict, location = get_jv_data('#test\n1\t2\n', 'test.jv.txt')
+        assert location == 'Test Format'
+        assert jv_dict['filename'] == 'test.jv.txt'
+    finally:
+        JV_FORMATS.remove(jv_format)
+
+
+def test_jv_parser_stream():
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import get_jv_data
+
+    for file in ['PERS_1_1_C-2.jv.IV', 'PERS_1_1_C-1.jv.txt']:
+        with open(f'tests/data/{file}', encoding='utf-8') as f:
+            from_string, location = get_jv_data(f.read(), file)
+            f.seek(0)
+            from_stream, stream_location = get_jv_data(f, file)
+        assert stream_location == location
+        assert from_stream['Efficiency'] == from_string['Efficiency']
+        assert list(from_stream['jv_curve'][3]['voltage']) == list(from_string['jv_curve'][3]['voltage'])
+
+
+def test_jv_parser_loc_1_stream_tail(tmp_path):
+    import io
+
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
+        _read_lines_backwards,
+        read_last_location_1_record,
+    )
+
+    lines = ['first', '', 'second line', 'third\r']
+    for block_size in (1, 3, 7, 100):
+        stream = io.StringIO('\n'.join(lines))
+        assert list(_read_lines_backwards(stream, '\n', block_size)) == lines[::-1]
+
+    with open('tests/data/PERS_1_1_C-2.jv.IV', encoding='utf-8') as f:
+        filedata = f.read()
+    # a repetition that is still being written is skipped
+    filedata = filedata.strip() + '\n' + filedata.strip().split('\n')[-1][:500]
+    (tmp_path / 'loc_1.jv.IV').write_text(filedata, encoding='utf-8')
+    reference = read_last_location_1_record(filedata)
+    with open(tmp_path / 'loc_1.jv.IV', encoding='utf-8') as text:
+        assert read_last_location_1_record(text) == reference
+    assert read_last_location_1_record(io.StringIO(filedata)) == reference
+
+
+def test_jv_result_columnar():
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import get_jv_data, get_jv_result
+
+    with open('tests/data/PERS_1_1_C-2.jv.IV', encoding='utf-8') as f:
+        filedata = f.read()
+    jv_dict, _ = get_jv_data(filedata)
+    jv_result, location = get_jv_result(filedata)
+    assert location == 'Location 1 IV Format'
+    assert len(jv_result) == 8
+    assert list(jv_result.curve_lengths()) == [66] * 8
+    assert jv_result.offsets[-1] == len(jv_result.voltage)
+    voltage, current_density = jv_result.curve(3)
+    assert list(voltage) == list(jv_dict['jv_curve'][3]['voltage'])
+    assert list(current_density) == list(jv_dict['jv_curve'][3]['current_density'])
+    # Location 1 reports the figures of merit per pixel, curve 3 is the forward sweep of pixel 2
+    assert jv_result.figure_of_merit('Efficiency')[3] == jv_dict['Efficiency'][1]
+    assert jv_result.figure_of_merit('Efficiency')[2] == jv_dict['Efficiency'][1]
+
+
+def test_jv_parser_loc_1_appended_records():
+    import io
+
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
+        get_jv_result_location_1_repetitions,
+        location_1_ingested_size,
+        read_appended_location_1_records,
+    )
+
+    with open('tests/data/PERS_1_1_C-2.jv.IV', 'rb') as f:
+        data = f.read()
+    records = data.splitlines(keepends=True)
+    first_two = b''.join(records[:2])
+    # the third record is still being written
+    f = io.BytesIO(first_two + records[2][:1000])
+    ingested_size = location_1_ingested_size(f, window=1000)
+    assert ingested_size == len(first_two)
+
+    f = io.BytesIO(data + records[0][:1000])
+    appended, ingested_size = read_appended_location_1_records(f, ingested_size)
+    assert appended == records[2]
+    assert ingested_size == len(data)
+    jv_result = get_jv_result_location_1_repetitions(appended.decode())
+    assert len(jv_result) == 8
+    assert jv_result.names[3] == 'Pixel_2_forward_repetition_3'
+    assert len(jv_result.curve(3)[0]) == 66
+
+    # a rewritten file is not continued
+    assert read_appended_location_1_records(io.BytesIO(b'x' * len(data)), len(first_two)) is None
+
+
+def test_jv_parser_loc_1_appended_matches_full_parse():
+    import io
+
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import (
+        get_jv_result_location_1_repetitions,
+        location_1_ingested_size,
+        read_appended_location_1_records,
+    )
+
+    file = 'PERS_1_1_C-2.jv.IV'
+    with open(f'tests/data/{file}', 'rb') as f:
+        data = f.read()
+    full = get_jv_result_location_1_repetitions(data.decode())
+
+    first_two = b''.join(data.splitlines(keepends=True)[:2])
+    partial = get_jv_result_location_1_repetitions(first_two.decode())
+    ingested_size = location_1_ingested_size(io.BytesIO(first_two))
+    records, _ = read_appended_location_1_records(io.BytesIO(data), ingested_size)
+    appended = get_jv_result_location_1_repetitions(records.decode())
+
+    # the curves of the appended record continue the ones of the partial parse
+    assert partial.names + appended.names == full.names
+    assert appended.datetime == full.datetime
+    np.testing.assert_array_equal(np.concatenate([partial.voltage, appended.voltage]), full.voltage)
+    np.testing.assert_array_equal(
+        np.concatenate([partial.current_density, appended.current_density]), full.current_density
+    )
+    np.testing.assert_array_equal(
+        np.concatenate([partial.figure_of_merit('Efficiency'), appended.figure_of_merit('Efficiency')]),
+        full.figure_of_merit('Efficiency'),
+    )
+
+
+def test_jv_measurement_loc_1_appended_records(tmp_path, monkeypatch):
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser import jv_parser
+    from nomad_tfsc_general.schema_packages.tfsc_general_package import TFSC_General_JVmeasurement
+
+    file = 'PERS_1_1_C-2.jv.IV'
+    with open(f'tests/data/{file}', 'rb') as f:
+        data = f.read()
+    (tmp_path / file).write_bytes(b''.join(data.splitlines(keepends=True)[:2]))
+    archive = get_upload_archive(
+        tmp_path, TFSC_General_JVmeasurement(data_file=file, parse_all_repetitions=True), monkeypatch
+    )
+    assert len(archive.data.jv_curve) == 16
+    assert archive.data.ingested_curves == 16
+
+    # the third repetition is appended to the curves of the first two without parsing them again
+    (tmp_path / file).write_bytes(data)
+
+    def full_parse(*args):
+        raise AssertionError('the data file was parsed again')
+
+    with monkeypatch.context() as m:
+        m.setattr(jv_parser, 'location_1_ingested_size', full_parse)
+        normalize_all(archive)
+
+    (tmp_path / 'full').mkdir()
+    (tmp_path / 'full' / file).write_bytes(data)
+    full = get_upload_archive(
+        tmp_path / 'full', TFSC_General_JVmeasurement(data_file=file, parse_all_repetitions=True), monkeypatch
+    )
+    assert len(archive.data.jv_curve) == 24
+    assert archive.data.ingested_curves == 24
+    assert archive.data.ingested_bytes == len(data)
+    assert archive.data.datetime == full.data.datetime
+    for curve, reference in zip(archive.data.jv_curve, full.data.jv_curve):
+        assert curve.cell_name == reference.cell_name
+        assert curve.efficiency == reference.efficiency
+        np.testing.assert_array_equal(curve.voltage.magnitude, reference.voltage.magnitude)
+        np.testing.assert_array_equal(curve.current_density.magnitude, reference.current_density.magnitude)
+        assert (curve.diode_fit is None) == (reference.diode_fit is None)
+        if curve.diode_fit is not None:
+            assert curve.diode_fit.ideality_factor == reference.diode_fit.ideality_factor
+    assert [(pair.name, pair.hysteresis_index_pce) for pair in archive.data.hysteresis] == [
+        (pair.name, pair.hysteresis_index_pce) for pair in full.data.hysteresis
+    ]
+
+
+def test_jv_measurement_loc_1_all_repetitions(tmp_path, monkeypatch):
+    import shutil
+
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.tfsc_general_package import TFSC_General_JVmeasurement
+
+    file = 'PERS_1_1_C-2.jv.IV'
+    shutil.copy(f'tests/data/{file}', tmp_path)
+    last = get_upload_archive(tmp_path, TFSC_General_JVmeasurement(data_file=file), monkeypatch)
+    archive = get_upload_archive(
+        tmp_path, TFSC_General_JVmeasurement(data_file=file, parse_all_repetitions=True), monkeypatch
+    )
+
+    # 3 repetitions of 4 pixels with a reverse and a forward sweep each
+    assert len(archive.data.jv_curve) == 24
+    assert archive.data.jv_curve[0].cell_name == 'Pixel_1_reverse_repetition_1'
+    assert archive.data.jv_curve[-1].cell_name == 'Pixel_4_forward_repetition_3'
+    assert len(archive.data.hysteresis) == 12
+    assert archive.data.hysteresis[0].name == 'Pixel_1_repetition_1'
+    assert archive.data.datetime == last.data.datetime
+    # the last repetition holds the curves of the default mode
+    assert len(last.data.jv_curve) == 8
+    for curve, reference in zip(archive.data.jv_curve[16:], last.data.jv_curve):
+        assert curve.cell_name.startswith(f'{reference.cell_name}_repetition_')
+        assert curve.efficiency == reference.efficiency
+        np.testing.assert_array_equal(curve.voltage.magnitude, reference.voltage.magnitude)
+
+    # switching the mode back parses the unchanged file again
+    archive.data.parse_all_repetitions = False
+    normalize_all(archive)
+    assert [curve.cell_name for curve in archive.data.jv_curve] == [
+        curve.cell_name for curve in last.data.jv_curve
+    ]
@@ -1,6 +1,10 @@
+import os
+
+import h5py
+import pytest
 from nomad.client import normalize_all
 from nomad.units import ureg
-from utils import delete_json, get_archive
+from utils import delete_json, get_archive, get_upload_archive
 
 
 def test_mppt_parser_loc_1(monkeypatch):
@@ -45,3 +49,411 @@ def test_mppt_parser_loc_2_debug(monkeypatch):
     assert round(archive.data.properties.perturbation_voltage, 2) == 0.01 * ureg('volt')
 
     delete_json()
+
+
+def test_mppt_parser_stream():
+    from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import read_mppt_file
+
+    for file in ['PERS_loc1_mppt.MPP', 'PERS_loc2_mppt_20260204_093607.mpp.txt']:
+        with open(f'tests/data/{file}', encoding='utf-8') as f:
+            from_string = read_mppt_file(f.read(), file)
+            f.seek(0)
+            from_stream = read_mppt_file(f, file)
+        assert from_stream['datetime'] == from_string['datetime']
+        assert list(from_stream['power_data']) == list(from_string['power_data'])
+        assert from_stream['step_size'] == from_string['step_size']
+
+
+def test_mppt_numeric_columns_chunked():
+    from io import StringIO
+
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import read_numeric_columns
+
+    rows = np.arange(2500 * 3, dtype=float).reshape(2500, 3) / 8
+    text = '\n'.join('\t'.join(repr(value) for value in row) for row in rows.tolist())
+    columns = read_numeric_columns(StringIO(text), [2, 0], chunk_rows=300)
+
+    assert columns.shape == (2, 2500)
+    assert columns[0].flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(columns[0], rows[:, 2])
+    np.testing.assert_array_equal(columns[1], rows[:, 0])
+
+
+def test_mppt_appended_rows():
+    import io
+
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import (
+        read_appended_mppt_file,
+        read_mppt_file,
+    )
+
+    file = 'PERS_loc2_mppt_20260204_093607.mpp.txt'
+    with open(f'tests/data/{file}', 'rb') as f:
+        data = f.read()
+    full = read_mppt_file(data.decode(), file)
+    lines = data.splitlines(keepends=True)
+    ingested_size = len(b''.join(lines[:41]))
+
+    # the last row is still being written
+    f = io.BytesIO(data[: len(data) - 10])
+    rows, new_size = read_appended_mppt_file(f, ingested_size, file)
+    assert new_size == len(b''.join(lines[:-1]))
+    np.testing.assert_array_equal(rows[0], full['time_data'][40:-1])
+    np.testing.assert_array_equal(rows[3], full['power_data'][40:-1])
+
+    rows, new_size = read_appended_mppt_file(io.BytesIO(data), new_size, file)
+    assert new_size == len(data)
+    assert list(rows[1]) == [full['voltage_data'][-1]]
+
+    # a rewritten file is not continued
+    assert read_appended_mppt_file(io.BytesIO(b'x' * len(data)), ingested_size, file) is None
+
+
+def test_mppt_stitch_files():
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import (
+        mppt_file_start,
+        read_mppt_file,
+        stitch_mppt_data,
+    )
+
+    file = 'PERS_loc2_mppt_20260204_093607.mpp.txt'
+    with open(f'tests/data/{file}', encoding='utf-8') as f:
+        data = read_mppt_file(f, file)
+    restarted = 'PERS_loc2_mppt_20260204_100000.mpp.txt'
+    assert mppt_file_start('PERS_loc1_mppt.MPP') is None
+    assert (mppt_file_start(restarted) - mppt_file_start(file)).total_seconds() == 1433
+
+    stitched = stitch_mppt_data([(restarted, data), (file, data)])
+    assert stitched['files'] == [file, restarted]
+    assert stitched['datetime'] == data['datetime']
+    assert list(stitched['restart_index']) == [103]
+    assert list(stitched['restart_time']) == [1433]
+    np.testing.assert_array_equal(stitched['time_data'][103:], data['time_data'] + 1433)
+    np.testing.assert_array_equal(stitched['power_data'][:103], data['power_data'])
+    assert stitched['total_time'] == 1433 + 204
+
+
+def test_mppt_protocol_runs():
+    from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import group_protocol_runs
+
+    jv_files = [f'S1_20260204_{time}.jv.txt' for time in ('090000', '091000', '120000', '130000', '140000')]
+    mppt_files = ['S1_20260204_092000.mpp.txt', 'S1_20260204_135000.mpp.txt']
+    runs = group_protocol_runs(jv_files, mppt_files)
+
+    assert runs == [
+        {
+            'jv_all_pixels': 'S1_20260204_090000.jv.txt',
+            'jv_before': 'S1_20260204_091000.jv.txt',
+            'mppt': 'S1_20260204_092000.mpp.txt',
+            'jv_after': 'S1_20260204_120000.jv.txt',
+        },
+        {
+            'jv_all_pixels': None,
+            'jv_before': 'S1_20260204_130000.jv.txt',
+            'mppt': 'S1_20260204_135000.mpp.txt',
+            'jv_after': 'S1_20260204_140000.jv.txt',
+        },
+    ]
+
+
+def test_mppt_without_voltage_steps():
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import read_mppt_file, stitch_mppt_data
+
+    header = 'Time (s)\tVoltage (V)\tCurrent (A)\tCurrent density (mA/cm2)\tPower (mW/cm2)\n'
+    held = header + ''.join(f'{2.0 * i}\t0.85\t-0.0024\t-16.0\t-13.6\n' for i in range(20))
+    started = header + '0.0\t0.85\t-0.0027\t-18.1\t-15.4\n'
+
+    # a held voltage and a run that just started are parsed, the step size is undefined
+    for filedata in (held, started):
+        data = read_mppt_file(filedata, 'PERS_loc2_mppt_20260204_093607.mpp.txt')
+        assert np.isnan(data['step_size'])
+    assert len(data['time_data']) == 1
+
+    file = 'PERS_loc2_mppt_20260204_093607.mpp.txt'
+    with open(f'tests/data/{file}', encoding='utf-8') as f:
+        stepped = read_mppt_file(f, file)
+    stitched = stitch_mppt_data([(file, stepped), ('PERS_loc2_mppt_20260204_100000.mpp.txt', data)])
+    assert len(stitched['time_data']) == 104
+    assert np.isclose(stitched['step_size'], 0.01)
+
+
+def test_mppt_series_without_protocol_runs(tmp_path):
+    from nomad_tfsc_general.parsers.tfsc_general_measurement_parser import (
+        get_mppt_series_files,
+        get_protocol_run,
+    )
+
+    files = [
+        'S1_20260204_090000.jv.txt',
+        'S1_20260204_091000.jv.txt',
+        'S1_20260204_092000.mpp.txt',
+        'S1_20260204_120000.jv.txt',
+        'S1_20260205_080000.mpp.txt',
+        'S2_20260204_092000.mpp.txt',
+    ]
+    for file_name in files:
+        (tmp_path / file_name).touch()
+    mainfile = str(tmp_path / 'S1_20260205_080000.mpp.txt')
+
+    assert get_mppt_series_files(mainfile) == ['S1_20260204_092000.mpp.txt', 'S1_20260205_080000.mpp.txt']
+    # the MPPT file of the protocol run is bundled into the protocol entry instead
+    assert get_mppt_series_files(mainfile, exclude_protocol_runs=True) == ['S1_20260205_080000.mpp.txt']
+    run = get_protocol_run(str(tmp_path / 'S1_20260204_120000.jv.txt'))
+    assert run['mppt'] == 'S1_20260204_092000.mpp.txt'
+
+
+def test_mppt_hdf5_file_not_matched(tmp_path, monkeypatch):
+    import re
+    import shutil
+
+    from nomad_tfsc_general.parsers import tfsc_general_parser
+    from nomad_tfsc_general.schema_packages.tfsc_general_package import (
+        TFSC_General_JVmeasurement,
+        TFSC_General_SimpleMPPTracking,
+    )
+
+    files = ['PERS_1_1_C-2.jv.IV', 'PERS_loc1_mppt.MPP']
+    for file in files:
+        shutil.copy(f'tests/data/{file}', tmp_path)
+    jv = get_upload_archive(
+        tmp_path, TFSC_General_JVmeasurement(data_file=files[0], store_arrays_in_hdf5=True), monkeypatch
+    )
+    mppt = get_upload_archive(
+        tmp_path, TFSC_General_SimpleMPPTracking(data_file=files[1], store_arrays_in_hdf5=True), monkeypatch
+    )
+    assert mppt.data.time_hdf5
+    assert jv.data.jv_curve[0].voltage_hdf5
+
+    # the HDF5 files written next to the data files are not parsed as measurements
+    hdf5_files = sorted(set(os.listdir(tmp_path)) - set(files))
+    assert len(hdf5_files) == 2
+    mainfile_re = re.compile(tfsc_general_parser.mainfile_name_re)
+    assert sorted(file for file in os.listdir(tmp_path) if mainfile_re.match(file)) == files
+
+
+@pytest.mark.parametrize('store_arrays_in_hdf5', [False, True])
+def test_mppt_appended_rows_match_full_parse(tmp_path, monkeypatch, store_arrays_in_hdf5):
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser import mppt_parser
+    from nomad_tfsc_general.schema_packages.tfsc_general_package import TFSC_General_SimpleMPPTracking
+
+    # a long run, so the previews and the change points are taken from the pyramid
+    rng = np.random.default_rng(0)
+    n = 20_000
+    time = 2.0 * np.arange(n)
+    voltage = 0.85 + 0.01 * np.tile([0, 1, 0, -1], n // 4)
+    voltage[5000:5100] = 0.85
+    power = -(np.where(time < 600, 15 + time / 100, 21 - 1e-4 * (time - 600)) + rng.normal(0, 0.05, n))
+    lines = [
+        'Time (s)\tVoltage (V)\tCurrent (A)\tCurrent density (mA/cm2)\tPower (mW/cm2)\n',
+        *(
+            f'{t:.5f}\t{v:.5f}\t{p / v * 1.5e-4:.5f}\t{p / v:.5f}\t{p:.5f}\n'
+            for t, v, p in zip(time, voltage, power)
+        ),
+    ]
+    file = 'PERS_loc2_mppt_20260204_093607.mpp.txt'
+    full_path = tmp_path / 'full'
+    full_path.mkdir()
+    (full_path / file).write_text(''.join(lines))
+    full = get_upload_archive(
+        full_path,
+        TFSC_General_SimpleMPPTracking(data_file=file, store_arrays_in_hdf5=store_arrays_in_hdf5),
+        monkeypatch,
+    ).data
+
+    (tmp_path / file).write_text(''.join(lines[:1500]))
+    archive = get_upload_archive(
+        tmp_path,
+        TFSC_General_SimpleMPPTracking(data_file=file, store_arrays_in_hdf5=store_arrays_in_hdf5),
+        monkeypatch,
+    )
+    assert archive.data.ingested_rows == 1499
+
+    # the appended rows extend the traces without parsing the file again
+    def read_mppt_file(*args):
+        raise AssertionError('the whole file was parsed again')
+
+    monkeypatch.setattr(mppt_parser, 'read_mppt_file', read_mppt_file)
+    for stop in [1501, 9000, 16_001, len(lines)]:
+        (tmp_path / file).write_text(''.join(lines[:stop]))
+        normalize_all(archive)
+    mppt = archive.data
+    assert mppt.ingested_rows == n
+
+    def values(section, name, upload_path):
+        reference = getattr(section, f'{name}_hdf5')
+        if reference:
+            file_name, path = reference.split('#')
+            with h5py.File(upload_path / file_name, 'r') as f:
+                return f[path][()]
+        return getattr(section, name).magnitude
+
+    names = ['time', 'voltage', 'current_density', 'power_density']
+    for name in names:
+        np.testing.assert_array_equal(values(mppt, name, tmp_path), values(full, name, full_path))
+    assert [level.bucket_size for level in mppt.pyramid] == [level.bucket_size for level in full.pyramid]
+    for level, full_level in zip(mppt.pyramid, full.pyramid):
+        for name in names:
+            np.testing.assert_allclose(values(level, name, tmp_path), values(full_level, name, full_path))
+    for name in ['preview_time', 'preview_voltage', 'preview_power_density']:
+        np.testing.assert_allclose(getattr(mppt, name).magnitude, getattr(full, name).magnitude, rtol=1e-12)
+    for section in ['stability', 'tracking_quality', 'change_points']:
+        metrics, expected = getattr(mppt, section).m_to_dict(), getattr(full, section).m_to_dict()
+        assert metrics.keys() == expected.keys()
+        for key, value in expected.items():
+            np.testing.assert_allclose(metrics[key], value, rtol=1e-7, atol=1e-12, err_msg=key)
+    assert mppt.properties.time == full.properties.time
+
+
+def test_mppt_series(tmp_path, monkeypatch):
+    import shutil
+
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import read_mppt_file
+    from nomad_tfsc_general.schema_packages.tfsc_general_package import TFSC_General_MPPTSeries
+
+    # the Location 1 file is restarted 1433 s after the start of the Location 2 file
+    files = {
+        'PERS_loc2_mppt_20260204_093607.mpp.txt': 'PERS_loc2_mppt_20260204_093607.mpp.txt',
+        'PERS_loc1_mppt.MPP': 'PERS_loc2_mppt_20260204_100000.MPP',
+    }
+    data = {}
+    for fixture, file in files.items():
+        shutil.copy(f'tests/data/{fixture}', tmp_path / file)
+        with open(f'tests/data/{fixture}', encoding='utf-8') as f:
+            data[file] = read_mppt_file(f, file)
+    first, restarted = files.values()
+
+    series = get_upload_archive(
+        tmp_path, TFSC_General_MPPTSeries(data_files=[restarted, first]), monkeypatch
+    ).data
+    assert series.data_files == [first, restarted]
+    length = len(data[first]['time_data'])
+    assert series.restart_index.tolist() == [length]
+    assert series.restart_time.to('s').magnitude.tolist() == [1433]
+    time = series.time.to('s').magnitude
+    np.testing.assert_array_equal(time[:length], data[first]['time_data'])
+    np.testing.assert_array_equal(time[length:], data[restarted]['time_data'] + 1433)
+    assert series.properties.time.to('s').magnitude == time[-1]
+    assert series.ingested_rows is None
+    # the restart is not counted as a hold of the voltage
+    assert series.tracking_quality.stuck_time.to('s').magnitude < 1433 - time[length - 1]
+
+
+def test_mppt_series_entry_written_once(tmp_path, monkeypatch):
+    from nomad.datamodel import EntryArchive, EntryMetadata
+
+    from nomad_tfsc_general.parsers import tfsc_general_measurement_parser
+    from nomad_tfsc_general.parsers.tfsc_general_measurement_parser import TFSCGeneralParser
+
+    files = ['S1_20260204_092000.mpp.txt', 'S1_20260205_080000.mpp.txt', 'S1_20260204_180000.mpp.txt']
+    for file_name in files:
+        (tmp_path / file_name).touch()
+    created = []
+    monkeypatch.setattr(tfsc_general_measurement_parser, 'set_sample_reference', lambda *args: None)
+    monkeypatch.setattr(tfsc_general_measurement_parser, 'get_entry_id_from_file_name', lambda *args: 'eid')
+    monkeypatch.setattr(
+        tfsc_general_measurement_parser,
+        'create_archive',
+        lambda entry, archive, file_name, overwrite=False: created.append((file_name, entry.data_files)),
+    )
+
+    # every file links to the series entry, only the one that started last writes it
+    parser = TFSCGeneralParser(stitch_mppt_files=True)
+    for file_name in files:
+        archive = EntryArchive(metadata=EntryMetadata(upload_id='test_upload'))
+        parser.parse(str(tmp_path / file_name), archive, None)
+        assert archive.data.processed_archive is not None
+    assert created == [('S1.mpp_series.archive.json', sorted(files))]
+
+
+def test_mppt_protocol_run_files(tmp_path, monkeypatch):
+    from nomad.datamodel import EntryArchive, EntryMetadata
+
+    from nomad_tfsc_general.parsers import tfsc_general_measurement_parser
+    from nomad_tfsc_general.parsers.tfsc_general_measurement_parser import (
+        TFSCGeneralParser,
+        get_protocol_run,
+    )
+
+    run = {
+        'jv_all_pixels': 'S1_20260204_090000.jv.txt',
+        'jv_before': 'S1_20260204_091000.jv.txt',
+        'mppt': 'S1_20260204_092000.mpp.txt',
+        'jv_after': 'S1_20260204_120000.jv.txt',
+    }
+    for file_name in [*run.values(), 'S1_20260205_080000.mpp.txt']:
+        (tmp_path / file_name).touch()
+    for file_name in run.values():
+        assert get_protocol_run(str(tmp_path / file_name)) == run
+    assert get_protocol_run(str(tmp_path / 'S1_20260205_080000.mpp.txt')) is None
+
+    created = []
+    monkeypatch.setattr(tfsc_general_measurement_parser, 'set_sample_reference', lambda *args: None)
+    monkeypatch.setattr(tfsc_general_measurement_parser, 'get_entry_id_from_file_name', lambda *args: 'eid')
+    monkeypatch.setattr(
+        tfsc_general_measurement_parser,
+        'create_archive',
+        lambda entry, archive, file_name, overwrite=False: created.append((file_name, entry)),
+    )
+
+    # all files of the run link to the protocol entry, only the MPPT file writes it
+    parser = TFSCGeneralParser(bundle_mppt_protocols=True)
+    for file_name in run.values():
+        archive = EntryArchive(metadata=EntryMetadata(upload_id='test_upload'))
+        parser.parse(str(tmp_path / file_name), archive, None)
+        assert archive.data.processed_archive is not None
+    assert [file_name for file_name, _ in created] == ['S1_20260204_092000.protocol.archive.json']
+    entry = created[0][1]
+    assert {key: getattr(entry, key).data_file for key in run} == run
+    assert entry.name == 'S1 protocol 20260204_092000'
+
+
+def test_mppt_protocol(tmp_path, monkeypatch):
+    import shutil
+
+    import numpy as np
+
+    from nomad_tfsc_general.schema_packages.tfsc_general_package import (
+        TFSC_General_JVmeasurement,
+        TFSC_General_MPPTProtocol,
+        TFSC_General_SimpleMPPTracking,
+    )
+
+    # the same sweeps before and after the tracking
+    jv_before, mppt, jv_after = (
+        'PERS_loc2_mppt_20260204_090000.jv.txt',
+        'PERS_loc2_mppt_20260204_093607.mpp.txt',
+        'PERS_loc2_mppt_20260204_100000.jv.txt',
+    )
+    shutil.copy('tests/data/PERS_1_1_C-1.jv.txt', tmp_path / jv_before)
+    shutil.copy(f'tests/data/{mppt}', tmp_path / mppt)
+    shutil.copy('tests/data/PERS_1_1_C-1.jv.txt', tmp_path / jv_after)
+    protocol = get_upload_archive(
+        tmp_path,
+        TFSC_General_MPPTProtocol(
+            jv_before=TFSC_General_JVmeasurement(data_file=jv_before),
+            mppt=TFSC_General_SimpleMPPTracking(data_file=mppt),
+            jv_after=TFSC_General_JVmeasurement(data_file=jv_after),
+        ),
+        monkeypatch,
+    ).data
+
+    assert protocol.datetime.isoformat() == '2026-02-04T09:36:07+00:00'
+    assert len(protocol.mppt.time) == 103
+    cell_names = [jv_curve.cell_name for jv_curve in protocol.jv_before.jv_curve]
+    assert len(cell_names) == 12
+    assert protocol.jv_changes.cell_name == cell_names
+    np.testing.assert_array_equal(protocol.jv_changes.efficiency_change, 0)
+    np.testing.assert_array_equal(protocol.jv_changes.efficiency_retention, 1)
+    np.testing.assert_array_equal(protocol.jv_changes.fill_factor_retention, 1)
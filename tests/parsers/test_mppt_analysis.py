@@ -0,0 +1,130 @@
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.mppt_analysis import (
+    compute_stability_metrics,
+    compute_tracking_metrics,
+    detect_change_points,
+    find_step_size,
+    rolling_max,
+    rolling_mean,
+    stability_metrics,
+    tracking_metrics,
+    update_stability_state,
+    update_tracking_state,
+)
+
+
+def test_rolling_windows():
+    values = np.random.default_rng(0).normal(size=1003)
+    for window in [1, 2, 7, 100, 2000]:
+        expected_max = [values[i : i + window].max() for i in range(len(values))]
+        expected_mean = [values[max(i - window + 1, 0) : i + 1].mean() for i in range(len(values))]
+        np.testing.assert_array_equal(rolling_max(values, window), expected_max)
+        np.testing.assert_allclose(rolling_mean(values, window), expected_mean)
+
+
+def test_stability_metrics():
+    # the power rises for 10 minutes, then decays linearly by 2 % of the peak per hour
+    time = np.arange(0, 40 * 3600, 2.0)
+    hours = time / 3600
+    power = np.where(hours < 1 / 6, 15 + 30 * hours, 20 - 0.4 * (hours - 1 / 6))
+    power += np.random.default_rng(1).normal(0, 0.05, len(time))
+    metrics = compute_stability_metrics(time, -power, window=600)
+
+    assert np.isclose(metrics['peak_power_density'], 20, atol=0.05)
+    assert np.isclose(metrics['time_to_peak'], 600, atol=600)
+    assert np.isclose(metrics['initial_power_density'], 15 + 30 * 300 / 3600, atol=0.1)
+    assert np.isclose(metrics['t95'], (1 / 6 + 2.5) * 3600, atol=600)
+    assert np.isclose(metrics['t90'], (1 / 6 + 5) * 3600, atol=600)
+    assert np.isclose(metrics['t80'], (1 / 6 + 10) * 3600, atol=600)
+    assert np.isclose(metrics['degradation_rate'] * 3600, -0.02, atol=1e-3)
+    assert abs(metrics['burn_in_loss']) < 0.01
+    assert np.isclose(metrics['stabilized_efficiency'], 20 - 0.4 * (40 - 1 / 6), atol=0.1)
+
+
+def test_stability_metrics_short_run():
+    metrics = compute_stability_metrics([0.0], [10.0])
+    assert np.isnan(metrics['t80']) and metrics['window'] == 60
+
+
+def test_tracking_metrics():
+    # perturb and observe around 0.8 V with 10 mV steps every 2 s, the voltage is held from
+    # 200 s to 300 s and walks off after 498 s
+    oscillation = 0.8 + 0.01 * np.tile([0, 1, 0, -1], 25)
+    voltage = np.concatenate([oscillation, np.full(50, 0.8), oscillation, 0.79 + 0.01 * np.arange(1, 21)])
+    time = 2.0 * np.arange(len(voltage))
+    metrics = compute_tracking_metrics(time, voltage)
+
+    assert np.isclose(metrics['step_size'], 0.01)
+    assert np.isclose(metrics['step_size_std'], 0, atol=1e-12)
+    assert metrics['step_interval'] == 2
+    assert np.isclose(metrics['oscillation_amplitude'], 0.01)
+    assert metrics['stuck_start'].tolist() == [200.0]
+    assert metrics['stuck_end'].tolist() == [302.0]
+    assert metrics['lost_track_start'].tolist() == [498.0]
+    assert metrics['lost_track_end'].tolist() == [538.0]
+    assert metrics['lost_track_time'] == 40
+
+    # a restart after the hold, the gap before it is neither stuck nor part of a run
+    restarted = compute_tracking_metrics(np.concatenate([time[:150], time[150:] + 1e4]), voltage, [150])
+    assert restarted['stuck_start'].tolist() == [200.0]
+    assert restarted['stuck_end'].tolist() == [298.0]
+    assert restarted['lost_track_start'].tolist() == [498.0 + 1e4]
+
+    assert np.isnan(find_step_size(np.full(10, 0.8)))
+    held = compute_tracking_metrics([0, 1, 2], [0.8, 0.8, 0.8])
+    assert np.isnan(held['step_size'])
+    assert held['stuck_time'] == 2
+
+
+def test_metrics_of_growing_runs():
+    # a run that is analysed whenever new points arrived gives the metrics of the whole run
+    rng = np.random.default_rng(2)
+    n = 20_000
+    time = np.arange(n) * 2.0 + rng.normal(0, 0.01, n)
+    voltage = 0.8 + 0.01 * np.tile([0, 1, 0, -1], n // 4)
+    voltage[n // 3 : n // 3 + 200] = 0.8
+    voltage[n // 2 : n // 2 + 30] = 0.8 + 0.01 * np.arange(30)
+    power = -(np.where(time < 600, 15 + time / 100, 21 - 1e-4 * (time - 600)) + rng.normal(0, 0.05, n))
+    stability = compute_stability_metrics(time, power)
+    tracking = compute_tracking_metrics(time, voltage)
+
+    stability_state = tracking_state = None
+    bounds = [0, 500, 1001, 1002, 6000, 6666, 15_000, n]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        stability_state = update_stability_state(
+            stability_state, lambda start, stop: (time[start:stop], power[start:stop]), stop
+        )
+        tracking_state = update_tracking_state(tracking_state, time[start:stop], voltage[start:stop])
+    for expected, metrics in [
+        (stability, stability_metrics(stability_state)),
+        (tracking, tracking_metrics(tracking_state)),
+    ]:
+        assert expected.keys() == metrics.keys()
+        for key, value in expected.items():
+            np.testing.assert_allclose(metrics[key], value, rtol=1e-7, atol=1e-9, err_msg=key)
+
+
+def test_change_points():
+    rng = np.random.default_rng(0)
+    time = np.linspace(0, 1000, 200_000)
+    # burn-in, plateau, drop-out of the setup and linear degradation
+    power = np.where(time < 100, 15 + 0.03 * time, 18.0)
+    power = np.where(time >= 600, 18 - 0.01 * (time - 600), power)
+    power = np.where((time >= 400) & (time < 420), 0.0, power) + rng.normal(0, 0.2, len(time))
+    power[1000] = np.nan
+
+    segments = detect_change_points(time, power)
+    # jumps are located to a point, kinks in the trend less sharply
+    assert np.allclose(segments['segment_start'], [0, 100, 400, 420, 600], atol=5)
+    assert np.allclose(segments['segment_start'][2:4], [400, 420], atol=0.01)
+    assert np.allclose(segments['segment_end'][:-1], segments['segment_start'][1:], atol=0.01)
+    assert segments['segment_end'][-1] == 1000
+    assert np.allclose(segments['slope'], [0.03, 0, 0, 0, -0.01], atol=2e-3)
+    assert np.allclose(segments['mean_power_density'][2], 0, atol=0.02)
+
+    # noise without a trend is one segment, short traces are not split
+    assert len(detect_change_points(time, rng.normal(10, 1, len(time)))['slope']) == 1
+    short = detect_change_points([0, 1, 2], [1, 2, 3])
+    assert short['slope'].tolist() == [1.0]
+    assert len(detect_change_points([], [])['slope']) == 0
@@ -0,0 +1,82 @@
+import io
+import os
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import read_mppt_file
+from nomad_tfsc_general.schema_packages.file_parser.parse_cache import (
+    ParseCache,
+    cached_parse,
+    hash_file,
+)
+
+
+def test_parse_cache_round_trip(tmp_path):
+    file = 'PERS_loc2_mppt_20260204_093607.mpp.txt'
+    with open(os.path.join('tests', 'data', file), 'rb') as f:
+        content_hash = hash_file(f)
+        filedata = f.read().decode()
+
+    calls = []
+
+    def parse():
+        calls.append(file)
+        return read_mppt_file(filedata, file)
+
+    parse_cache = ParseCache(str(tmp_path), 1024**2)
+    parsed = cached_parse(parse_cache, parse, content_hash, 'mppt', 1, file)
+    cached = cached_parse(parse_cache, parse, content_hash, 'mppt', 1, file)
+    assert len(calls) == 1
+    assert cached['datetime'] == parsed['datetime']
+    assert cached['step_size'] == parsed['step_size']
+    assert np.array_equal(cached['power_data'], parsed['power_data'])
+
+    # a new parser version misses the cache
+    cached_parse(parse_cache, parse, content_hash, 'mppt', 2, file)
+    assert len(calls) == 2
+
+
+def test_parse_cache_eviction(tmp_path):
+    parse_cache = ParseCache(str(tmp_path), 3000)
+    for i in range(5):
+        content_hash = hash_file(io.BytesIO(str(i).encode()))
+        parse_cache.put(parse_cache.key(content_hash, 'test', 1), {'data': np.zeros(100)})
+    entries = [name for name in os.listdir(tmp_path) if name.endswith('.npz')]
+    assert 0 < len(entries) < 5
+
+
+def test_parse_cache_corrupt_entry(tmp_path):
+    parse_cache = ParseCache(str(tmp_path), 1024**2)
+    truncated = parse_cache.key('truncated', 'test', 1)
+    parse_cache.put(truncated, {'data': np.arange(100.0)})
+    path = os.path.join(tmp_path, f'{truncated}.npz')
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[: len(data) // 2])
+    without_meta = parse_cache.key('without_meta', 'test', 1)
+    np.savez(os.path.join(tmp_path, f'{without_meta}.npz'), a0=np.zeros(3))
+
+    for key in (truncated, without_meta):
+        assert parse_cache.get(key) is None
+        assert not os.path.exists(os.path.join(tmp_path, f'{key}.npz'))
+    assert parse_cache.get(parse_cache.key('missing', 'test', 1)) is None
+
+
+def test_parse_cache_jv_result(tmp_path):
+    from nomad_tfsc_general.schema_packages.file_parser.jv_parser import get_jv_result
+
+    file = 'PERS_1_1_C-1.jv.txt'
+    with open(os.path.join('tests', 'data', file), encoding='utf-8') as f:
+        filedata = f.read()
+    parse_cache = ParseCache(str(tmp_path), 1024**2)
+    key = parse_cache.key(hash_file(io.BytesIO(filedata.encode())), 'jv', 1, file)
+    jv_result, location = get_jv_result(filedata, file)
+    assert parse_cache.put(key, (jv_result, location))
+    cached, cached_location = parse_cache.get(key)
+    assert cached_location == location
+    assert cached.names == jv_result.names
+    assert cached.datetime == jv_result.datetime
+    assert np.array_equal(cached.offsets, jv_result.offsets)
+    assert np.array_equal(cached.voltage, jv_result.voltage)
+    assert np.array_equal(cached.figure_of_merit('V_oc'), jv_result.figure_of_merit('V_oc'))
@@ -0,0 +1,112 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from nomad_tfsc_general.schema_packages.file_parser.jv_parser import get_jv_result
+from nomad_tfsc_general.schema_packages.file_parser.mppt_parser import read_mppt_file
+from nomad_tfsc_general.schema_packages.file_parser.parse_cache import hash_file
+from nomad_tfsc_general.schema_packages.file_parser.raw_file import (
+    MappedFile,
+    MappedText,
+    decode_raw_file,
+    detect_encoding,
+    open_raw_file,
+)
+
+
+def upload_archive(upload_path):
+    def raw_file(name, mode):
+        return open(os.path.join(upload_path, name), mode)
+
+    return SimpleNamespace(m_context=SimpleNamespace(raw_file=raw_file))
+
+
+def test_raw_file_mapped():
+    archive = upload_archive(os.path.join('tests', 'data'))
+    file = 'PERS_loc1_mppt.MPP'
+    with open_raw_file(archive, file, threshold=0) as f:
+        assert isinstance(f, MappedFile)
+        assert f.seek(0, os.SEEK_END) == os.path.getsize(os.path.join('tests', 'data', file))
+    with open_raw_file(archive, file, threshold=1024**3) as f:
+        assert not isinstance(f, MappedFile)
+
+
+def test_raw_file_mapped_parsers():
+    archive = upload_archive(os.path.join('tests', 'data'))
+    for file in ['PERS_loc1_mppt.MPP', 'PERS_loc2_mppt_20260204_093607.mpp.txt']:
+        with open_raw_file(archive, file, threshold=0) as f, decode_raw_file(f, 'utf-8') as text:
+            assert isinstance(text, MappedText)
+            mapped = read_mppt_file(text, file)
+        with open_raw_file(archive, file, threshold=1024**3) as f, decode_raw_file(f, 'utf-8') as text:
+            streamed = read_mppt_file(text, file)
+        assert mapped['datetime'] == streamed['datetime']
+        for key in ['time_data', 'voltage_data', 'current_density_data', 'power_data']:
+            np.testing.assert_array_equal(mapped[key], streamed[key])
+
+    for file in ['PERS_1_1_C-2.jv.IV', 'PERS_1_1_C-1.jv.txt']:
+        with open_raw_file(archive, file, threshold=0) as f, decode_raw_file(f, 'utf-8') as text:
+            mapped, mapped_location = get_jv_result(text, file)
+        with open_raw_file(archive, file, threshold=1024**3) as f, decode_raw_file(f, 'utf-8') as text:
+            streamed, location = get_jv_result(text, file)
+        assert mapped_location == location
+        assert mapped.names == streamed.names
+        np.testing.assert_array_equal(mapped.current_density, streamed.current_density)
+
+
+def test_raw_file_single_pass(tmp_path, monkeypatch):
+    import baseclasses.helper.utilities
+
+    samples = []
+
+    def get_encoding(f):
+        samples.append(f.read())
+        return 'ascii'
+
+    monkeypatch.setattr(baseclasses.helper.utilities, 'get_encoding', get_encoding)
+    (tmp_path / 'mppt.txt').write_bytes(b'V\tJ\n' * 10 + 'µ\n'.encode())
+    archive = upload_archive(tmp_path)
+    for threshold in (0, 1024**3):
+        with open_raw_file(archive, 'mppt.txt', threshold) as f:
+            # ascii is widened, a cut line at the end of the sample is not detected from
+            assert detect_encoding(f, sample_size=10) == 'utf-8'
+            content_hash = hash_file(f)
+            with decode_raw_file(f, 'utf-8') as text:
+                assert text.read().endswith('µ\n')
+            assert not f.closed
+        with open(tmp_path / 'mppt.txt', 'rb') as f:
+            assert content_hash == hash_file(f)
+    # the encoding is remembered for the unchanged file, mapped or not
+    assert samples == [b'V\tJ\nV\tJ\n']
+
+
+def test_raw_file_unchanged(tmp_path):
+    from nomad_tfsc_general.schema_packages.file_parser.raw_file import check_raw_file
+
+    path = tmp_path / 'mppt.txt'
+    path.write_bytes(b'V\tJ\n0.5\t1\n')
+    archive = upload_archive(tmp_path)
+    state, unchanged = check_raw_file(archive, 'mppt.txt', None, 3)
+    assert not unchanged
+    assert state['size'] == 10
+    assert state['content_hash'] is None
+
+    with open(path, 'rb') as f:
+        state['content_hash'] = hash_file(f)
+    stored = SimpleNamespace(**state)
+    assert check_raw_file(archive, 'mppt.txt', stored, 3) == (state, True)
+    assert not check_raw_file(archive, 'mppt.txt', stored, 4)[1]
+    # the parsers of uninstalled packages have no version, their files are always parsed
+    unversioned = SimpleNamespace(**dict(state, parser_version=None))
+    unknown, unchanged = check_raw_file(archive, 'mppt.txt', unversioned, None)
+    assert not unchanged
+    assert unknown['parser_version'] is None
+
+    # a touched file is hashed, a rewritten one of the same size is changed
+    os.utime(path, ns=(0, 0))
+    touched, unchanged = check_raw_file(archive, 'mppt.txt', stored, 3)
+    assert unchanged
+    assert touched['modification_time'] == 0
+    assert touched['content_hash'] == state['content_hash']
+    path.write_bytes(b'V\tJ\n0.6\t1\n')
+    assert not check_raw_file(archive, 'mppt.txt', stored, 3)[1]
@@ -1,6 +1,8 @@
 import os
 
-from nomad.client import parse
+from nomad.client import normalize_all, parse
+from nomad.datamodel import EntryArchive, EntryMetadata
+from nomad.datamodel.context import ClientContext
 
 
 def set_monkey_patch(monkeypatch):
@@ -44,3 +46,15 @@ def get_archive(file_base, monkeypatch):
         measurement_archive = parse(measurement_path)[0]
 
     return measurement_archive
+
+
+def get_upload_archive(upload_path, data, monkeypatch):
+    """Returns a normalized archive of the entry `data` in an upload at `upload_path`."""
+    set_monkey_patch(monkeypatch)
+    archive = EntryArchive(
+        data=data,
+        m_context=ClientContext(local_dir=str(upload_path)),
+        metadata=EntryMetadata(upload_id='test_upload'),
+    )
+    normalize_all(archive)
+    return archive